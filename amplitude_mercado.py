@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Amplitude de Mercado por Categoria
+Indicadores de amplitude (breadth) de cada categoria de `lista_ativos` a
+partir da matriz de fechamentos alinhada do universo: linha de avanços e
+declínios, % de membros acima das médias de 50 e 200 pregões, % com RSI
+acima de 70 ou abaixo de 30, novas máximas/mínimas de 52 semanas e o score
+final médio. O estado (buffers circulares e somas móveis por símbolo) é
+atualizado a cada nova barra, sem recalcular o histórico; a última barra
+(possivelmente parcial, com o pregão em andamento) pode ser refeita a partir
+do estado anterior a ela.
+"""
+
+import copy
+import numpy as np
+import pandas as pd
+from universo import simbolos_por_categoria
+
+METRICAS = [
+    'membros', 'avancos', 'declinios', 'linha_ad', 'pct_acima_sma50', 'pct_acima_sma200',
+    'pct_rsi_acima_70', 'pct_rsi_abaixo_30', 'novas_maximas', 'novas_minimas', 'score_medio'
+]
+
+
+def score_amplitude(metricas):
+    """
+    Contexto da categoria como score em [-1, 1]: tendência ampla (membros acima da
+    média de 200 pregões) e leitura contrária dos extremos de RSI (grupo sobrecomprado
+    pesa contra compras, sobrevendido a favor). None sem dados suficientes
+    """
+    if metricas is None:
+        return None
+    tendencia = 2 * metricas['pct_acima_sma200'] - 1
+    extremos = metricas['pct_rsi_abaixo_30'] - metricas['pct_rsi_acima_70']
+    componentes = [c for c in (tendencia, extremos) if pd.notna(c)]
+    if not componentes:
+        return None
+    return float(np.clip(np.mean(componentes), -1, 1))
+
+
+class AmplitudeMercado:
+    """
+    Amplitude incremental de um conjunto de categorias sobre a matriz de fechamentos
+    Cada chamada de `atualizar` custa O(símbolos x janela de máximas) e não depende
+    do tamanho do histórico já processado
+    """
+
+    def __init__(self, categorias=None, media_curta=50, media_longa=200, periodo_rsi=14, janela_maximas=252):
+        self.categorias = categorias if categorias is not None else simbolos_por_categoria()
+        self.media_curta = media_curta
+        self.media_longa = media_longa
+        self.periodo_rsi = periodo_rsi
+        self.janela_maximas = janela_maximas
+        self.simbolos = list(dict.fromkeys(s for ativos in self.categorias.values() for s in ativos))
+        self.nomes_categorias = list(self.categorias)
+
+        # Pertinência símbolo x categoria (um símbolo pode estar em mais de uma)
+        posicao = {s: i for i, s in enumerate(self.simbolos)}
+        self._pertinencia = np.zeros((len(self.simbolos), len(self.nomes_categorias)))
+        for j, ativos in enumerate(self.categorias.values()):
+            self._pertinencia[[posicao[s] for s in ativos], j] = 1.0
+
+        n = len(self.simbolos)
+        self._tamanho = max(media_longa, janela_maximas)
+        self._fechamentos = np.full((self._tamanho, n), np.nan)  # buffer circular
+        self._posicao = 0
+        self._ultimo = np.full(n, np.nan)
+        self._somas = {media_curta: np.zeros(n), media_longa: np.zeros(n)}
+        self._validos = {media_curta: np.zeros(n, dtype=int), media_longa: np.zeros(n, dtype=int)}
+        self._ganhos = np.full((periodo_rsi, n), np.nan)
+        self._perdas = np.full((periodo_rsi, n), np.nan)
+        self._posicao_rsi = 0
+        self._linha_ad = np.zeros(len(self.nomes_categorias))
+        self._datas, self._linhas = [], []
+        self.ultima_data = None
+        # Estado antes da última barra e a entrada dela, para refazê-la se o fechamento mudar
+        self._estado_anterior = None
+        self._ultima_entrada = None
+
+    # --- ATUALIZAÇÃO ---
+
+    _ESTADO = ('_fechamentos', '_posicao', '_ultimo', '_somas', '_validos',
+               '_ganhos', '_perdas', '_posicao_rsi', '_linha_ad')
+
+    def _salvar_estado(self):
+        self._estado_anterior = {nome: copy.deepcopy(getattr(self, nome)) for nome in self._ESTADO}
+
+    def _restaurar_ultima(self):
+        """Desfaz a última barra, voltando ao estado salvo antes dela"""
+        for nome, valor in self._estado_anterior.items():
+            setattr(self, nome, valor)
+        self._estado_anterior = None
+        self._datas.pop()
+        self._linhas.pop()
+        self.ultima_data = self._datas[-1] if self._datas else None
+
+    def _media_movel(self, periodo, novo):
+        """Soma móvel do período: entra o fechamento novo, sai o de `periodo` barras atrás"""
+        saindo = self._fechamentos[(self._posicao - periodo) % self._tamanho]
+        self._somas[periodo] += np.nan_to_num(novo) - np.nan_to_num(saindo)
+        self._validos[periodo] += ~np.isnan(novo)
+        self._validos[periodo] -= ~np.isnan(saindo)
+        with np.errstate(invalid='ignore'):
+            return np.where(self._validos[periodo] == periodo, self._somas[periodo] / periodo, np.nan)
+
+    def _rsi(self, delta):
+        """RSI de médias simples (como IndicadoresTecnicos.calcular_rsi) nas últimas `periodo_rsi` variações"""
+        # Como no indicador original, variações indefinidas contam como zero
+        with np.errstate(invalid='ignore'):
+            self._ganhos[self._posicao_rsi] = np.where(delta > 0, delta, 0.0)
+            self._perdas[self._posicao_rsi] = np.where(delta < 0, -delta, 0.0)
+        self._posicao_rsi = (self._posicao_rsi + 1) % self.periodo_rsi
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rs = self._ganhos.sum(axis=0) / self._perdas.sum(axis=0)
+            return 100 - 100 / (1 + rs)
+
+    def _por_categoria(self, condicao, base):
+        """Fração dos membros com dados (`base`) que atendem à condição, por categoria"""
+        contagem = (condicao & base) @ self._pertinencia
+        total = base @ self._pertinencia
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(total > 0, contagem / total, np.nan)
+
+    def atualizar(self, data, fechamentos, scores=None):
+        """
+        Processa uma nova barra do universo
+        `fechamentos`/`scores`: Series indexadas por símbolo (ou arrays na ordem de `simbolos`);
+        símbolos ausentes ou NaN não contam na barra. Repetir a data da última barra a substitui
+        (barra parcial do dia). Retorna as métricas da barra por categoria
+        """
+        fechamentos = self._vetor(fechamentos)
+        scores = self._vetor(scores) if scores is not None else np.full(len(self.simbolos), np.nan)
+        if self.ultima_data is not None and data == self.ultima_data and self._estado_anterior is not None:
+            self._restaurar_ultima()
+        self._salvar_estado()
+        self._ultima_entrada = (fechamentos, scores)
+        validos = ~np.isnan(fechamentos)
+
+        sma_curta = self._media_movel(self.media_curta, fechamentos)
+        sma_longa = self._media_movel(self.media_longa, fechamentos)
+        self._fechamentos[self._posicao] = fechamentos
+        self._posicao = (self._posicao + 1) % self._tamanho
+
+        delta = fechamentos - self._ultimo
+        rsi = self._rsi(delta)
+        self._ultimo = fechamentos
+
+        # Novas máximas/mínimas: o fechamento é o extremo da janela (completa) que o inclui
+        janela = self._fechamentos if self._tamanho == self.janela_maximas else self._fechamentos[
+            (self._posicao - self.janela_maximas + np.arange(self.janela_maximas)) % self._tamanho]
+        completa = ~np.isnan(janela).any(axis=0)
+        with np.errstate(invalid='ignore'):
+            nova_maxima = completa & (fechamentos >= np.where(completa, janela, 0.0).max(axis=0))
+            nova_minima = completa & (fechamentos <= np.where(completa, janela, 0.0).min(axis=0))
+
+            avancos = (delta > 0) @ self._pertinencia
+            declinios = (delta < 0) @ self._pertinencia
+        self._linha_ad += avancos - declinios
+
+        tem_score = ~np.isnan(scores)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            total_scores = tem_score @ self._pertinencia
+            score_medio = np.where(total_scores > 0, np.nan_to_num(scores) @ self._pertinencia / total_scores, np.nan)
+            linha = np.vstack([
+                validos @ self._pertinencia,
+                avancos,
+                declinios,
+                self._linha_ad,
+                self._por_categoria(fechamentos > sma_curta, ~np.isnan(sma_curta) & validos),
+                self._por_categoria(fechamentos > sma_longa, ~np.isnan(sma_longa) & validos),
+                self._por_categoria(rsi > 70, ~np.isnan(rsi) & validos),
+                self._por_categoria(rsi < 30, ~np.isnan(rsi) & validos),
+                nova_maxima @ self._pertinencia,
+                nova_minima @ self._pertinencia,
+                score_medio
+            ])  # métricas x categorias
+        self._datas.append(data)
+        self._linhas.append(linha)
+        self.ultima_data = data
+        return pd.DataFrame(linha.T, index=self.nomes_categorias, columns=METRICAS)
+
+    def _vetor(self, valores):
+        if isinstance(valores, pd.Series):
+            return valores.reindex(self.simbolos).to_numpy(dtype=float)
+        return np.asarray(valores, dtype=float)
+
+    def acompanhar(self, matriz, scores=None):
+        """
+        Processa apenas as datas da matriz (datas x símbolos) posteriores à última já vista;
+        a última vista é refeita se o fechamento (ou score) dela mudou, como numa barra parcial
+        `scores`: matriz opcional de score final alinhada à de fechamentos
+        Retorna o número de barras processadas
+        """
+        matriz = matriz.reindex(columns=self.simbolos)
+        if self.ultima_data is not None:
+            matriz = matriz[matriz.index >= self.ultima_data]
+        if scores is not None:
+            scores = scores.reindex(index=matriz.index, columns=self.simbolos).to_numpy(dtype=float)
+        valores = matriz.to_numpy(dtype=float)
+        inicio = 0
+        if len(matriz) and matriz.index[0] == self.ultima_data:
+            fechamentos_vistos, scores_vistos = self._ultima_entrada
+            novos_scores = scores[0] if scores is not None else np.full(len(self.simbolos), np.nan)
+            if (np.array_equal(valores[0], fechamentos_vistos, equal_nan=True)
+                    and np.array_equal(novos_scores, scores_vistos, equal_nan=True)):
+                inicio = 1
+        for i in range(inicio, len(matriz)):
+            self.atualizar(matriz.index[i], valores[i], scores[i] if scores is not None else None)
+        return len(matriz) - inicio
+
+    # --- CONSULTA ---
+
+    def historico(self, categoria=None):
+        """
+        Série histórica das métricas: colunas (categoria, métrica) ou, com `categoria`,
+        apenas as métricas daquela categoria
+        """
+        if not self._linhas:
+            return pd.DataFrame()
+        dados = np.stack(self._linhas)  # datas x métricas x categorias
+        colunas = pd.MultiIndex.from_product([METRICAS, self.nomes_categorias], names=['metrica', 'categoria'])
+        quadro = pd.DataFrame(dados.reshape(len(self._datas), -1), index=pd.Index(self._datas, name='Date'),
+                              columns=colunas).swaplevel(axis=1).sort_index(axis=1)
+        return quadro[categoria][METRICAS] if categoria is not None else quadro
+
+    def atual(self):
+        """Métricas da última barra (categorias x métricas)"""
+        if not self._linhas:
+            return pd.DataFrame(columns=METRICAS)
+        return pd.DataFrame(self._linhas[-1].T, index=self.nomes_categorias, columns=METRICAS)
+
+    def metricas_categoria(self, categoria):
+        """Métricas atuais de uma categoria como dicionário (entrada do score_amplitude)"""
+        atual = self.atual()
+        return atual.loc[categoria].to_dict() if categoria in atual.index else None
+
+
+def exemplo_amplitude_mercado():
+    """Exemplo: amplitude de ações brasileiras e ETFs americanos, com atualização incremental"""
+    import time
+    from universo import carregar_matriz_fechamentos
+
+    categorias = simbolos_por_categoria(['acoes_brasileiras', 'etfs_americanos'])
+    simbolos = [s for ativos in categorias.values() for s in ativos]
+    matriz, _ = carregar_matriz_fechamentos(simbolos, periodo='2y')
+
+    amplitude = AmplitudeMercado(categorias)
+    inicio = time.perf_counter()
+    amplitude.acompanhar(matriz.iloc[:-1])
+    print(f"{len(matriz) - 1} barras processadas em {time.perf_counter() - inicio:.2f}s")
+
+    # Nova barra: apenas ela é processada
+    inicio = time.perf_counter()
+    amplitude.acompanhar(matriz)
+    print(f"Atualização incremental em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    print(amplitude.atual().round(2).T)
+    for categoria in categorias:
+        print(f"{categoria}: score de amplitude {score_amplitude(amplitude.metricas_categoria(categoria))}")
+
+
+if __name__ == "__main__":
+    exemplo_amplitude_mercado()
@@ -5,12 +5,15 @@ Inclui indicadores técnicos e sistema de recomendações de compra/venda
 Baseado na estrutura do simulador existente
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from cliente_dados import ClienteDados, ErroDados
+from registro_indicadores import RegistroIndicadores
+from cache_compartilhado import obter_cache_padrao
+from perfil_volume import PerfilVolume, alvos_perfil_volume
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -60,6 +63,11 @@ class IndicadoresTecnicos:
         Preço próximo à banda inferior: possível sobrevenda
         """
         media_movel = precos.rolling(window=periodo).mean()
+        return IndicadoresTecnicos.calcular_bollinger_de_media(precos, media_movel, periodo, desvios)
+    
+    @staticmethod
+    def calcular_bollinger_de_media(precos, media_movel, periodo=20, desvios=2):
+        """Bandas de Bollinger a partir de uma média móvel já calculada"""
         desvio_padrao = precos.rolling(window=periodo).std()
         
         banda_superior = media_movel + (desvios * desvio_padrao)
@@ -78,9 +86,22 @@ class IndicadoresTecnicos:
         """
         medias = {}
         for periodo in periodos:
-            medias[f'sma_{periodo}'] = precos.rolling(window=periodo).mean()
+            medias[f'sma_{periodo}'] = IndicadoresTecnicos.calcular_media_movel(precos, periodo)
         return medias
     
+    @staticmethod
+    def calcular_media_movel(precos, periodo):
+        """Média móvel simples de um único período"""
+        return precos.rolling(window=periodo).mean()
+    
+    @staticmethod
+    def calcular_extremos(high, low, periodo=14):
+        """Máxima e mínima móveis, compartilhadas pelo Estocástico e pelo Williams %R"""
+        return {
+            'maxima': high.rolling(window=periodo).max(),
+            'minima': low.rolling(window=periodo).min()
+        }
+    
     @staticmethod
     def calcular_estocastico(high, low, close, k_periodo=14, d_periodo=3):
         """
@@ -88,9 +109,14 @@ class IndicadoresTecnicos:
         %K > 80: Sobrecomprado
         %K < 20: Sobrevendido
         """
-        lowest_low = low.rolling(window=k_periodo).min()
-        highest_high = high.rolling(window=k_periodo).max()
-        
+        extremos = IndicadoresTecnicos.calcular_extremos(high, low, k_periodo)
+        return IndicadoresTecnicos.calcular_estocastico_de_extremos(
+            close, extremos['maxima'], extremos['minima'], d_periodo
+        )
+    
+    @staticmethod
+    def calcular_estocastico_de_extremos(close, highest_high, lowest_low, d_periodo=3):
+        """Oscilador Estocástico a partir das máximas/mínimas móveis já calculadas"""
         k_percent = 100 * ((close - lowest_low) / (highest_high - lowest_low))
         d_percent = k_percent.rolling(window=d_periodo).mean()
         
@@ -106,116 +132,463 @@ class IndicadoresTecnicos:
         %R > -20: Sobrecomprado
         %R < -80: Sobrevendido
         """
-        highest_high = high.rolling(window=periodo).max()
-        lowest_low = low.rolling(window=periodo).min()
-        
+        extremos = IndicadoresTecnicos.calcular_extremos(high, low, periodo)
+        return IndicadoresTecnicos.calcular_williams_r_de_extremos(close, extremos['maxima'], extremos['minima'])
+    
+    @staticmethod
+    def calcular_williams_r_de_extremos(close, highest_high, lowest_low):
+        """Williams %R a partir das máximas/mínimas móveis já calculadas"""
         williams_r = -100 * ((highest_high - close) / (highest_high - lowest_low))
         return williams_r
 
+    # --- PRIMITIVAS COMPARTILHADAS (VOLUME E VOLATILIDADE) ---
+    
+    @staticmethod
+    def calcular_true_range(high, low, close):
+        """True Range: maior entre a amplitude da barra e os gaps contra o fechamento anterior"""
+        fechamento_anterior = close.shift(1)
+        return pd.concat([
+            high - low,
+            (high - fechamento_anterior).abs(),
+            (low - fechamento_anterior).abs()
+        ], axis=1).max(axis=1)
+    
+    @staticmethod
+    def calcular_preco_tipico(high, low, close):
+        """Preço típico (high + low + close) / 3, base do VWAP e do MFI"""
+        return (high + low + close) / 3
+    
+    @staticmethod
+    def suavizar_wilder(serie, periodo=14):
+        """Média móvel de Wilder (exponencial com alfa = 1 / periodo)"""
+        return serie.ewm(alpha=1 / periodo, adjust=False, min_periods=periodo).mean()
+    
+    # --- VOLUME E VOLATILIDADE ---
+    
+    @staticmethod
+    def calcular_atr(true_range, periodo=14):
+        """
+        Calcula o ATR (Average True Range)
+        Mede a volatilidade absoluta; base para stops dimensionados pela volatilidade
+        """
+        return IndicadoresTecnicos.suavizar_wilder(true_range, periodo)
+    
+    @staticmethod
+    def calcular_stop_atr(high, low, atr, periodo=22, multiplicador=3.0):
+        """
+        Stops por ATR (Chandelier Exit)
+        Comprado: máxima do período - multiplicador x ATR; vendido: mínima + multiplicador x ATR
+        """
+        return {
+            'stop_atr_comprado': high.rolling(window=periodo).max() - multiplicador * atr,
+            'stop_atr_vendido': low.rolling(window=periodo).min() + multiplicador * atr
+        }
+    
+    @staticmethod
+    def calcular_obv(close, volume):
+        """
+        Calcula o OBV (On-Balance Volume)
+        Volume acumulado com o sinal da variação do fechamento; confirma ou diverge da tendência
+        """
+        return (np.sign(close.diff()).fillna(0) * volume).cumsum()
+    
+    @staticmethod
+    def calcular_vwap_movel(preco_tipico, volume, periodo=20):
+        """VWAP móvel: preço típico ponderado pelo volume nas últimas `periodo` barras"""
+        volume_total = volume.rolling(window=periodo).sum()
+        return (preco_tipico * volume).rolling(window=periodo).sum() / volume_total.replace(0, np.nan)
+    
+    @staticmethod
+    def calcular_vwap_ancorado(preco_tipico, volume, ancora=None):
+        """VWAP ancorado: acumulado a partir de `ancora` (data; padrão: primeira barra)"""
+        if ancora is not None:
+            depois = preco_tipico.index >= ancora
+            preco_tipico, volume = preco_tipico.where(depois), volume.where(depois)
+        volume_acumulado = volume.cumsum()
+        return (preco_tipico * volume).cumsum() / volume_acumulado.replace(0, np.nan)
+    
+    @staticmethod
+    def calcular_mfi(preco_tipico, volume, periodo=14):
+        """
+        Calcula o MFI (Money Flow Index), um "RSI ponderado pelo volume"
+        MFI > 80: Sobrecomprado
+        MFI < 20: Sobrevendido
+        """
+        fluxo = preco_tipico * volume
+        variacao = preco_tipico.diff()
+        positivo = fluxo.where(variacao > 0, 0).rolling(window=periodo).sum()
+        negativo = fluxo.where(variacao < 0, 0).rolling(window=periodo).sum()
+        total = (positivo + negativo).replace(0, np.nan)
+        return 100 * positivo / total
+    
+    @staticmethod
+    def calcular_dmi(high, low, true_range, periodo=14):
+        """
+        Calcula o DMI/ADX (Directional Movement Index)
+        ADX > 25: tendência forte, na direção do maior entre +DI e -DI
+        """
+        subida = high.diff()
+        descida = -low.diff()
+        dm_mais = subida.where((subida > descida) & (subida > 0), 0.0)
+        dm_menos = descida.where((descida > subida) & (descida > 0), 0.0)
+        
+        atr = IndicadoresTecnicos.suavizar_wilder(true_range, periodo).replace(0, np.nan)
+        di_mais = 100 * IndicadoresTecnicos.suavizar_wilder(dm_mais, periodo) / atr
+        di_menos = 100 * IndicadoresTecnicos.suavizar_wilder(dm_menos, periodo) / atr
+        dx = 100 * (di_mais - di_menos).abs() / (di_mais + di_menos).replace(0, np.nan)
+        
+        return {
+            'adx': IndicadoresTecnicos.suavizar_wilder(dx, periodo),
+            'di_mais': di_mais,
+            'di_menos': di_menos
+        }
+    
+    @staticmethod
+    def calcular_cmf(high, low, close, volume, periodo=20):
+        """
+        Calcula o CMF (Chaikin Money Flow)
+        CMF > 0: pressão compradora; CMF < 0: pressão vendedora
+        """
+        amplitude = (high - low).replace(0, np.nan)
+        multiplicador = ((close - low) - (high - close)) / amplitude
+        volume_total = volume.rolling(window=periodo).sum().replace(0, np.nan)
+        return (multiplicador.fillna(0) * volume).rolling(window=periodo).sum() / volume_total
+
+def sinal_compacto(compra, venda):
+    """Sinal int8: 1 onde `compra`, -1 onde `venda` (prevalece sobre compra), 0 nos demais"""
+    return np.select([np.asarray(venda), np.asarray(compra)], [-1, 1], 0).astype(np.int8)
+
+def medir_memoria_resultado(resultado):
+    """
+    Relatório de memória de um resultado de análise (bytes)
+    Percorre DataFrames, Series e dicts de Series; índices compartilhados
+    (mesmo buffer de timestamps em vários quadros) são contados uma única vez
+    """
+    por_chave, indices = {}, {}
+    
+    def chave_indice(indice):
+        if isinstance(indice, pd.DatetimeIndex):
+            return (indice.asi8.__array_interface__['data'][0], len(indice))
+        return id(indice)
+    
+    def medir(valor):
+        if isinstance(valor, (pd.DataFrame, pd.Series)):
+            indices.setdefault(chave_indice(valor.index), valor.index.memory_usage(deep=True))
+            uso = valor.memory_usage(index=False, deep=True)
+            return int(uso.sum()) if isinstance(uso, pd.Series) else int(uso)
+        if isinstance(valor, dict):
+            return sum(medir(v) for v in valor.values())
+        if isinstance(valor, (list, tuple)):
+            return sum(medir(v) for v in valor)
+        return 0
+    
+    for chave, valor in (resultado or {}).items():
+        bytes_chave = medir(valor)
+        if bytes_chave:
+            por_chave[chave] = bytes_chave
+    
+    total_dados = sum(por_chave.values())
+    total_indices = int(sum(indices.values()))
+    return {
+        'por_chave': dict(sorted(por_chave.items(), key=lambda item: -item[1])),
+        'indices_distintos': len(indices),
+        'bytes_indices': total_indices,
+        'bytes_total': total_dados + total_indices
+    }
+
+def criar_registro_padrao():
+    """
+    Registro com os indicadores padrão, na ordem de `calcular_todos_indicadores`
+    Blocos comuns (SMA 20 das Bollinger, extremos de 14 períodos) são nós compartilhados
+    """
+    ind = IndicadoresTecnicos
+    registro = RegistroIndicadores()
+    
+    registro.registrar('rsi', ind.calcular_rsi, parametros={'periodo': 14})
+    registro.registrar('macd', ind.calcular_macd, saidas=['macd', 'sinal', 'histograma'])
+    registro.registrar(
+        'bollinger',
+        lambda precos, media, **p: {
+            f'bb_{chave}': serie for chave, serie in ind.calcular_bollinger_de_media(precos, media, **p).items()
+        },
+        saidas=['bb_media', 'bb_superior', 'bb_inferior'],
+        dependencias=['sma_20'], parametros={'periodo': 20, 'desvios': 2}
+    )
+    for periodo in (20, 50, 200):
+        registro.registrar(f'sma_{periodo}', ind.calcular_media_movel, parametros={'periodo': periodo})
+    registro.registrar(
+        'extremos_14', ind.calcular_extremos, saidas=['maxima', 'minima'],
+        entradas=['high', 'low'], parametros={'periodo': 14}, interno=True
+    )
+    registro.registrar(
+        'estocastico',
+        lambda close, maxima, minima, **p: dict(zip(
+            ('estocastico_k', 'estocastico_d'),
+            ind.calcular_estocastico_de_extremos(close, maxima, minima, **p).values()
+        )),
+        saidas=['estocastico_k', 'estocastico_d'],
+        dependencias=['maxima', 'minima'], parametros={'d_periodo': 3}
+    )
+    registro.registrar(
+        'williams_r', ind.calcular_williams_r_de_extremos, dependencias=['maxima', 'minima']
+    )
+    
+    # Família de volume e volatilidade, sobre as primitivas compartilhadas
+    registro.registrar(
+        'true_range', ind.calcular_true_range, entradas=['high', 'low', 'close'], interno=True
+    )
+    registro.registrar(
+        'preco_tipico', ind.calcular_preco_tipico, entradas=['high', 'low', 'close'], interno=True
+    )
+    registro.registrar('atr', ind.calcular_atr, entradas=[], dependencias=['true_range'], parametros={'periodo': 14})
+    registro.registrar(
+        'stop_atr', ind.calcular_stop_atr, saidas=['stop_atr_comprado', 'stop_atr_vendido'],
+        entradas=['high', 'low'], dependencias=['atr'], parametros={'periodo': 22, 'multiplicador': 3.0}
+    )
+    registro.registrar('obv', ind.calcular_obv, entradas=['close', 'volume'])
+    registro.registrar(
+        'vwap', lambda volume, preco_tipico, **p: ind.calcular_vwap_movel(preco_tipico, volume, **p),
+        entradas=['volume'], dependencias=['preco_tipico'], parametros={'periodo': 20}
+    )
+    registro.registrar(
+        'vwap_ancorado', lambda volume, preco_tipico, **p: ind.calcular_vwap_ancorado(preco_tipico, volume, **p),
+        entradas=['volume'], dependencias=['preco_tipico']
+    )
+    registro.registrar(
+        'mfi', lambda volume, preco_tipico, **p: ind.calcular_mfi(preco_tipico, volume, **p),
+        entradas=['volume'], dependencias=['preco_tipico'], parametros={'periodo': 14}
+    )
+    registro.registrar(
+        'dmi', ind.calcular_dmi, saidas=['adx', 'di_mais', 'di_menos'],
+        entradas=['high', 'low'], dependencias=['true_range'], parametros={'periodo': 14}
+    )
+    registro.registrar(
+        'cmf', ind.calcular_cmf, entradas=['high', 'low', 'close', 'volume'], parametros={'periodo': 20}
+    )
+    return registro
+
+# Registro padrão compartilhado; indicadores customizados podem ser registrados nele
+REGISTRO_INDICADORES = criar_registro_padrao()
+
 class AnalisePreditiva:
     """Classe principal para análise preditiva"""
     
-    def __init__(self):
+    # Agrupamento de cada timeframe (períodos do pandas); semanas terminam na sexta-feira
+    TIMEFRAMES = {
+        'diario': None,
+        'semanal': 'W-FRI',
+        'mensal': 'M'
+    }
+    
+    # Peso de cada timeframe no score de confluência
+    PESOS_TIMEFRAME = {
+        'diario': 0.5,
+        'semanal': 0.3,
+        'mensal': 0.2
+    }
+    
+    # Mínimo de barras para que os indicadores de um timeframe sejam considerados
+    MIN_BARRAS_TIMEFRAME = 30
+    
+    # Saídas necessárias para os sinais e para a recomendação básica
+    SAIDAS_SINAIS = ['rsi', 'macd', 'sinal', 'bb_superior', 'bb_inferior', 'estocastico_k', 'williams_r']
+    SAIDAS_RECOMENDACAO = SAIDAS_SINAIS + ['histograma', 'bb_media']
+    
+    COLUNAS_SINAIS = ['sinal_rsi', 'sinal_macd', 'sinal_bb', 'sinal_estocastico', 'sinal_williams']
+    
+    def __init__(self, cliente=None, registro=None, cache=None):
         self.indicadores = IndicadoresTecnicos()
+        self.registro = registro or REGISTRO_INDICADORES
+        self.cliente = cliente or ClienteDados()
+        # Históricos compartilhados entre sessões (cache_compartilhado); False desativa
+        self.cache = obter_cache_padrao() if cache is None else cache
+        self.ultimo_erro = None
+    
+    def obter_historico(self, symbol, periodo='1y', interval='1d'):
+        """
+        Busca dados históricos levantando erros tipados (ErroDados)
+        Indicado para jobs em lote que precisam distinguir as falhas
+        Buscas simultâneas do mesmo histórico resultam em uma única requisição;
+        cada chamada recebe sua própria cópia do DataFrame em cache
+        """
+        if not self.cache:
+            return self.cliente.buscar_historico(symbol, periodo, interval)
+        chave = ('historico', self.cliente.provedor.nome, symbol, periodo, interval)
+        return self.cache.obter(chave, lambda: self.cliente.buscar_historico(symbol, periodo, interval))
+    
+    def invalidar_historico(self, symbol, periodo='1y', interval='1d'):
+        """Descarta o histórico em cache para que a próxima busca consulte o provedor"""
+        if self.cache:
+            self.cache.invalidar(('historico', self.cliente.provedor.nome, symbol, periodo, interval))
     
     def buscar_dados_completos(self, symbol, periodo='1y', interval='1d'):
-        """Busca dados históricos completos para análise"""
+        """Busca dados históricos completos para análise (None em caso de erro, ver `ultimo_erro`)"""
+        self.ultimo_erro = None
         try:
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(period=periodo, interval=interval)
-            
-            if df.empty:
-                return None
-            
-            # Padronizar nomes das colunas
-            df.columns = [col.lower() for col in df.columns]
-            return df
-        except Exception as e:
+            return self.obter_historico(symbol, periodo, interval)
+        except ErroDados as e:
+            self.ultimo_erro = e
             print(f"Erro ao buscar dados para {symbol}: {str(e)}")
             return None
     
-    def calcular_todos_indicadores(self, df):
-        """Calcula todos os indicadores técnicos"""
+    @staticmethod
+    def recortar_periodo(df, periodo):
+        """
+        Recorta um histórico base para um período no formato do yfinance
+        ('1mo', '6mo', '1y', '5y', 'ytd', 'max', '30d'...), sem nova busca
+        """
+        if df is None or df.empty or periodo in (None, 'max'):
+            return df
+        
+        fim = df.index[-1]
+        if periodo == 'ytd':
+            inicio = fim.normalize() - pd.offsets.YearBegin(1)
+        elif periodo.endswith('mo'):
+            inicio = fim - pd.DateOffset(months=int(periodo[:-2]))
+        elif periodo.endswith('y'):
+            inicio = fim - pd.DateOffset(years=int(periodo[:-1]))
+        elif periodo.endswith('d'):
+            inicio = fim - pd.DateOffset(days=int(periodo[:-1]))
+        else:
+            raise ValueError(f"Período não suportado: {periodo}")
+        # Recorte posicional: também funciona com visões memmap (armazem_ohlcv.VisaoOHLCV)
+        return df.iloc[df.index.searchsorted(inicio, side='right'):]
+    
+    @staticmethod
+    def reamostrar_ohlcv(df, timeframe):
+        """
+        Converte um histórico para um timeframe maior (open=first, high=max,
+        low=min, close=last, volume=sum). Os grupos seguem o calendário do
+        próprio pregão: semanas/meses sem negociação não geram barras e cada
+        barra é rotulada com o último dia efetivamente negociado no grupo.
+        """
+        regra = AnalisePreditiva.TIMEFRAMES.get(timeframe, timeframe)
+        if df is None or df.empty or regra is None:
+            return df
+        
+        agregacoes = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+        if 'dividends' in df.columns:
+            agregacoes['dividends'] = 'sum'
+        
+        indice = df.index.tz_localize(None) if df.index.tz is not None else df.index
+        grupos = indice.to_period(regra)
+        reamostrado = df.groupby(grupos).agg(agregacoes)
+        reamostrado.index = pd.DatetimeIndex(df.index.to_series().groupby(grupos).last())
+        reamostrado.index.name = df.index.name
+        return reamostrado
+    
+    def analisar_multiplos_timeframes(self, df, timeframes=('diario', 'semanal', 'mensal'), sistema=None):
+        """
+        Executa os dois sistemas de pontuação (score consolidado e score final
+        ponderado) em cada timeframe derivado de um único histórico base e
+        combina os resultados em um score de confluência
+        """
         if df is None or df.empty:
             return None
         
-        indicadores = {}
+        if sistema is None:
+            # Import local: sistema_recomendacoes depende deste módulo
+            from sistema_recomendacoes import SistemaRecomendacoes
+            sistema = SistemaRecomendacoes()
+        
+        analises = {}
+        for timeframe in timeframes:
+            dados = self.reamostrar_ohlcv(df, timeframe)
+            if len(dados) < self.MIN_BARRAS_TIMEFRAME:
+                analises[timeframe] = {'barras': len(dados), 'suficiente': False}
+                continue
+            
+            indicadores = self.calcular_todos_indicadores(dados)
+            sinais = self.gerar_sinais_trading(dados, indicadores)
+            scores = sistema.calcular_score_detalhado(dados, indicadores)
+            
+            score_consolidado = self.score_consolidado_atual(sinais)
+            score_final = scores['score_final'].iloc[-1]
+            analises[timeframe] = {
+                'barras': len(dados),
+                'suficiente': True,
+                'dados': dados,
+                'score_consolidado': score_consolidado,
+                'score_final': score_final,
+                'score_combinado': (score_consolidado + score_final) / 2,
+                'rsi_atual': indicadores['rsi'].iloc[-1]
+            }
+        
+        validos = {tf: a for tf, a in analises.items() if a['suficiente']}
+        if not validos:
+            return {'timeframes': analises, 'score_confluencia': None, 'alinhamento': None}
         
-        # RSI
-        indicadores['rsi'] = self.indicadores.calcular_rsi(df['close'])
+        pesos = {tf: self.PESOS_TIMEFRAME.get(tf, 1.0 / len(validos)) for tf in validos}
+        soma_pesos = sum(pesos.values())
+        score_confluencia = sum(validos[tf]['score_combinado'] * p for tf, p in pesos.items()) / soma_pesos
         
-        # MACD
-        macd_data = self.indicadores.calcular_macd(df['close'])
-        indicadores.update(macd_data)
-        
-        # Bollinger Bands
-        bb_data = self.indicadores.calcular_bollinger_bands(df['close'])
-        indicadores['bb_media'] = bb_data['media']
-        indicadores['bb_superior'] = bb_data['superior']
-        indicadores['bb_inferior'] = bb_data['inferior']
-        
-        # Médias Móveis
-        medias = self.indicadores.calcular_medias_moveis(df['close'])
-        indicadores.update(medias)
-        
-        # Estocástico
-        estocastico = self.indicadores.calcular_estocastico(
-            df['high'], df['low'], df['close']
-        )
-        indicadores['estocastico_k'] = estocastico['k_percent']
-        indicadores['estocastico_d'] = estocastico['d_percent']
+        # Fração dos timeframes que apontam na mesma direção do score de confluência
+        direcao = np.sign(score_confluencia)
+        alinhamento = np.mean([np.sign(a['score_combinado']) == direcao for a in validos.values()])
         
-        # Williams %R
-        indicadores['williams_r'] = self.indicadores.calcular_williams_r(
-            df['high'], df['low'], df['close']
-        )
+        return {
+            'timeframes': analises,
+            'score_confluencia': score_confluencia,
+            'alinhamento': alinhamento
+        }
+    
+    def calcular_todos_indicadores(self, df, saidas=None):
+        """
+        Calcula os indicadores técnicos
+        Com `saidas`, apenas os indicadores necessários (e suas dependências) são calculados
+        """
+        if df is None or df.empty:
+            return None
         
-        return indicadores
+        return self.registro.calcular(df, saidas)
     
     def gerar_sinais_trading(self, df, indicadores):
-        """Gera sinais de compra e venda baseados nos indicadores"""
+        """
+        Gera sinais de compra e venda baseados nos indicadores
+        Sinais em int8 (-1, 0, 1) e score consolidado em float32, sobre o mesmo índice de `df`
+        """
         if df is None or indicadores is None:
             return None
         
-        sinais = pd.DataFrame(index=df.index)
-        sinais['preco'] = df['close']
+        preco = df['close']
+        sinais = pd.DataFrame({'preco': preco}, index=df.index)
         
         # Sinais baseados no RSI
-        sinais['sinal_rsi'] = 0
-        sinais.loc[indicadores['rsi'] < 30, 'sinal_rsi'] = 1  # Compra
-        sinais.loc[indicadores['rsi'] > 70, 'sinal_rsi'] = -1  # Venda
-        
-        # Sinais baseados no MACD
-        sinais['sinal_macd'] = 0
-        macd_cruzamento = (indicadores['macd'] > indicadores['sinal']) & \
-                         (indicadores['macd'].shift(1) <= indicadores['sinal'].shift(1))
-        sinais.loc[macd_cruzamento, 'sinal_macd'] = 1  # Compra
+        sinais['sinal_rsi'] = sinal_compacto(
+            compra=indicadores['rsi'] < 30, venda=indicadores['rsi'] > 70
+        )
         
-        macd_cruzamento_baixo = (indicadores['macd'] < indicadores['sinal']) & \
-                               (indicadores['macd'].shift(1) >= indicadores['sinal'].shift(1))
-        sinais.loc[macd_cruzamento_baixo, 'sinal_macd'] = -1  # Venda
+        # Sinais baseados no MACD (cruzamentos)
+        macd, sinal = indicadores['macd'], indicadores['sinal']
+        sinais['sinal_macd'] = sinal_compacto(
+            compra=(macd > sinal) & (macd.shift(1) <= sinal.shift(1)),
+            venda=(macd < sinal) & (macd.shift(1) >= sinal.shift(1))
+        )
         
         # Sinais baseados nas Bollinger Bands
-        sinais['sinal_bb'] = 0
-        sinais.loc[df['close'] <= indicadores['bb_inferior'], 'sinal_bb'] = 1  # Compra
-        sinais.loc[df['close'] >= indicadores['bb_superior'], 'sinal_bb'] = -1  # Venda
+        sinais['sinal_bb'] = sinal_compacto(
+            compra=preco <= indicadores['bb_inferior'], venda=preco >= indicadores['bb_superior']
+        )
         
         # Sinais baseados no Estocástico
-        sinais['sinal_estocastico'] = 0
-        sinais.loc[indicadores['estocastico_k'] < 20, 'sinal_estocastico'] = 1  # Compra
-        sinais.loc[indicadores['estocastico_k'] > 80, 'sinal_estocastico'] = -1  # Venda
+        sinais['sinal_estocastico'] = sinal_compacto(
+            compra=indicadores['estocastico_k'] < 20, venda=indicadores['estocastico_k'] > 80
+        )
         
         # Sinais baseados no Williams %R
-        sinais['sinal_williams'] = 0
-        sinais.loc[indicadores['williams_r'] < -80, 'sinal_williams'] = 1  # Compra
-        sinais.loc[indicadores['williams_r'] > -20, 'sinal_williams'] = -1  # Venda
+        sinais['sinal_williams'] = sinal_compacto(
+            compra=indicadores['williams_r'] < -80, venda=indicadores['williams_r'] > -20
+        )
         
-        # Score consolidado (média dos sinais)
-        colunas_sinais = ['sinal_rsi', 'sinal_macd', 'sinal_bb', 'sinal_estocastico', 'sinal_williams']
-        sinais['score_consolidado'] = sinais[colunas_sinais].mean(axis=1)
+        # Score consolidado (média dos sinais; múltiplos de 0.2, float32 é suficiente)
+        sinais['score_consolidado'] = sinais[self.COLUNAS_SINAIS].mean(axis=1).astype(np.float32)
         
         return sinais
     
+    def score_consolidado_atual(self, sinais):
+        """Score consolidado da última barra, recalculado em float64 a partir dos sinais int8"""
+        return float(sinais[self.COLUNAS_SINAIS].iloc[-1].astype(float).mean())
+    
     def calcular_niveis_suporte_resistencia(self, df, janela=20):
         """Calcula níveis de suporte e resistência"""
         if df is None or df.empty:
@@ -226,27 +599,50 @@ class AnalisePreditiva:
         minimos_locais = df['low'].rolling(window=janela, center=True).min() == df['low']
         
         # Níveis de resistência (máximos locais)
-        resistencias = df.loc[maximos_locais, 'high'].sort_values(ascending=False).head(5)
+        resistencias = df['high'][maximos_locais].sort_values(ascending=False).head(5)
         
         # Níveis de suporte (mínimos locais)
-        suportes = df.loc[minimos_locais, 'low'].sort_values(ascending=True).head(5)
+        suportes = df['low'][minimos_locais].sort_values(ascending=True).head(5)
         
         return {
             'resistencias': resistencias.tolist(),
             'suportes': suportes.tolist()
         }
     
-    def gerar_recomendacao(self, symbol, periodo='6mo'):
-        """Gera recomendação completa de investimento"""
+    def calcular_perfil_volume(self, df, n_faixas=50):
+        """
+        Perfil de volume do período: POC, área de valor, nós de alto/baixo volume
+        e os alvos candidatos acima/abaixo do último fechamento (None sem volume)
+        """
+        if df is None or df.empty or 'volume' not in df.columns:
+            return None
+        niveis = PerfilVolume.de_historico(df, n_faixas=n_faixas).niveis()
+        if niveis is None:
+            return None
+        niveis['alvo_alta'], niveis['alvo_baixa'] = alvos_perfil_volume(niveis, float(df['close'].iloc[-1]))
+        return niveis
+    
+    def gerar_recomendacao(self, symbol, periodo='6mo', dados=None, alvos='suporte_resistencia'):
+        """
+        Gera recomendação completa de investimento
+        Se `dados` (histórico base já buscado, DataFrame ou VisaoOHLCV do
+        armazém memmap) for informado, ele é recortado para o período em vez
+        de uma nova busca na rede
+        `alvos='perfil_volume'` usa os níveis do perfil de volume como preços-alvo
+        (com os extremos de suporte/resistência e as Bollinger como alternativa)
+        """
         print(f"Analisando {symbol} para recomendação...")
         
         # Buscar dados
-        df = self.buscar_dados_completos(symbol, periodo)
+        if dados is not None:
+            df = self.recortar_periodo(dados, periodo)
+        else:
+            df = self.buscar_dados_completos(symbol, periodo)
         if df is None:
             return None
         
-        # Calcular indicadores
-        indicadores = self.calcular_todos_indicadores(df)
+        # Calcular apenas os indicadores usados pela recomendação
+        indicadores = self.calcular_todos_indicadores(df, self.SAIDAS_RECOMENDACAO)
         if indicadores is None:
             return None
         
@@ -255,11 +651,12 @@ class AnalisePreditiva:
         
         # Calcular níveis de suporte e resistência
         niveis = self.calcular_niveis_suporte_resistencia(df)
+        perfil_volume = self.calcular_perfil_volume(df)
         
         # Análise atual (últimos valores)
         preco_atual = df['close'].iloc[-1]
         rsi_atual = indicadores['rsi'].iloc[-1]
-        score_atual = sinais['score_consolidado'].iloc[-1]
+        score_atual = self.score_consolidado_atual(sinais)
         
         # Determinar recomendação
         if score_atual > 0.3:
@@ -286,6 +683,9 @@ class AnalisePreditiva:
             # Usar Bollinger Bands como alternativa
             preco_alvo_alta = indicadores['bb_superior'].iloc[-1]
             preco_alvo_baixa = indicadores['bb_inferior'].iloc[-1]
+        if alvos == 'perfil_volume' and perfil_volume:
+            preco_alvo_alta = perfil_volume['alvo_alta'] or preco_alvo_alta
+            preco_alvo_baixa = perfil_volume['alvo_baixa'] or preco_alvo_baixa
         
         resultado = {
             'symbol': symbol,
@@ -300,6 +700,7 @@ class AnalisePreditiva:
             'indicadores': indicadores,
             'sinais': sinais,
             'niveis_suporte_resistencia': niveis,
+            'perfil_volume': perfil_volume,
             'analise_detalhada': {
                 'tendencia_rsi': 'Sobrecomprado' if rsi_atual > 70 else 'Sobrevendido' if rsi_atual < 30 else 'Neutro',
                 'posicao_bb': self._analisar_posicao_bollinger(preco_atual, indicadores),
@@ -381,6 +782,15 @@ class AnalisePreditiva:
             row=1, col=1
         )
         
+        # Perfil de volume: área de valor, POC e nós de alto volume
+        perfil = resultado.get('perfil_volume')
+        if perfil:
+            fig.add_hrect(y0=perfil['area_valor_baixa'], y1=perfil['area_valor_alta'], fillcolor="gray",
+                          opacity=0.08, line_width=0, row=1, col=1)
+            fig.add_hline(y=perfil['poc'], line_color="gray", annotation_text="POC", row=1, col=1)
+            for preco in perfil['nos_alto_volume']:
+                fig.add_hline(y=preco, line_dash="dot", line_color="gray", line_width=1, row=1, col=1)
+        
         # RSI
         fig.add_trace(
             go.Scatter(x=df.index, y=indicadores['rsi'], name='RSI', line=dict(color='purple')),
@@ -438,6 +848,7 @@ def exemplo_analise_preditiva():
             print(f"Preço Atual: ${resultado['preco_atual']:.2f}")
             print(f"Recomendação: {resultado['recomendacao']}")
             print(f"Score Consolidado: {resultado['score_consolidado']:.3f}")
+            print(f"Memória do Resultado: {medir_memoria_resultado(resultado)['bytes_total'] / 1024:.1f} KiB")
             print(f"RSI Atual: {rsi_value}") 
 
 
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Análise de Risco
+VaR e CVaR (histórico e paramétrico), drawdown máximo e sua duração,
+Sharpe, Sortino e beta contra um benchmark, além das versões móveis.
+Todas as métricas aceitam uma Series de preços ou a matriz de fechamentos
+do universo (datas x símbolos) e são calculadas coluna a coluna de uma vez.
+"""
+
+import heapq
+import math
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+from universo import matriz_fechamentos
+
+PERIODOS_ANO = 252
+
+
+def benchmark_padrao(symbol):
+    """Benchmark de referência: BOVA11 para ativos da B3, SPY para os demais"""
+    return 'BOVA11.SA' if symbol.upper().endswith('.SA') else 'SPY'
+
+
+class JanelaCauda:
+    """
+    Janela deslizante que mantém os `k` menores valores em um max-heap (com a soma)
+    e os demais em um min-heap, com remoção preguiçosa. Cada passo custa O(log w):
+    o VaR histórico é o topo do heap inferior e o CVaR é a soma / k.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._inferior = []  # (-valor, -posicao): max-heap dos k menores
+        self._superior = []  # (valor, posicao): min-heap dos demais
+        self._no_inferior = {}
+        self._removidos = set()
+        self._n_inferior = 0
+        self._n_superior = 0
+        self.soma_inferior = 0.0
+
+    def _limpar_topos(self):
+        while self._inferior and -self._inferior[0][1] in self._removidos:
+            self._removidos.discard(-heapq.heappop(self._inferior)[1])
+        while self._superior and self._superior[0][1] in self._removidos:
+            self._removidos.discard(heapq.heappop(self._superior)[1])
+
+    def _para_inferior(self, valor, posicao):
+        heapq.heappush(self._inferior, (-valor, -posicao))
+        self._no_inferior[posicao] = True
+        self._n_inferior += 1
+        self.soma_inferior += valor
+
+    def _para_superior(self, valor, posicao):
+        heapq.heappush(self._superior, (valor, posicao))
+        self._no_inferior[posicao] = False
+        self._n_superior += 1
+
+    def adicionar(self, valor, posicao):
+        if self._n_inferior and valor <= -self._inferior[0][0]:
+            self._para_inferior(valor, posicao)
+        else:
+            self._para_superior(valor, posicao)
+        self._balancear()
+
+    def remover(self, valor, posicao):
+        if self._no_inferior.pop(posicao):
+            self._n_inferior -= 1
+            self.soma_inferior -= valor
+        else:
+            self._n_superior -= 1
+        self._removidos.add(posicao)
+        self._limpar_topos()
+        self._balancear()
+
+    def _balancear(self):
+        self._limpar_topos()
+        while self._n_inferior > self.k:
+            valor, posicao = heapq.heappop(self._inferior)
+            self._n_inferior -= 1
+            self.soma_inferior += valor
+            self._para_superior(-valor, -posicao)
+            self._limpar_topos()
+        while self._n_inferior < self.k and self._n_superior:
+            valor, posicao = heapq.heappop(self._superior)
+            self._n_superior -= 1
+            self._para_inferior(valor, posicao)
+            self._limpar_topos()
+
+    @property
+    def maior_da_cauda(self):
+        return -self._inferior[0][0]
+
+
+class AnaliseRisco:
+    """Métricas de risco para um ativo ou para a matriz do universo"""
+
+    def __init__(self, nivel=0.95, periodos_ano=PERIODOS_ANO, taxa_livre_risco=0.0, janela=63):
+        self.nivel = nivel
+        self.periodos_ano = periodos_ano
+        # Taxa anual; convertida para o período das barras nas razões
+        self.taxa_livre_risco = taxa_livre_risco
+        self.janela = janela
+
+    # --- PREPARAÇÃO ---
+
+    @staticmethod
+    def _como_quadro(precos):
+        return precos.to_frame() if isinstance(precos, pd.Series) else precos
+
+    @staticmethod
+    def retornos(precos):
+        """Retornos simples por barra (a primeira barra de cada coluna é descartada)"""
+        return precos.pct_change(fill_method=None).iloc[1:]
+
+    def _taxa_periodo(self):
+        return (1 + self.taxa_livre_risco) ** (1 / self.periodos_ano) - 1
+
+    def _tamanho_cauda(self, n):
+        return np.maximum(np.ceil(n * (1 - self.nivel)).astype(int), 1)
+
+    # --- VAR / CVAR ---
+
+    def var_cvar_historico(self, retornos):
+        """
+        VaR e CVaR históricos (perdas positivas) por coluna: com k = ceil(n * (1 - nivel)),
+        o VaR é o k-ésimo menor retorno e o CVaR a média dos k menores
+        """
+        quadro = self._como_quadro(retornos)
+        ordenados = np.sort(quadro.to_numpy(), axis=0)  # NaN ao final de cada coluna
+        validos = quadro.notna().sum().to_numpy()
+        k = self._tamanho_cauda(validos)
+        colunas = np.arange(ordenados.shape[1])
+        acumulado = np.nancumsum(ordenados, axis=0)
+        var = -ordenados[k - 1, colunas]
+        cvar = -acumulado[k - 1, colunas] / k
+        var[validos == 0] = np.nan
+        cvar[validos == 0] = np.nan
+        return pd.Series(var, index=quadro.columns), pd.Series(cvar, index=quadro.columns)
+
+    def var_cvar_parametrico(self, retornos):
+        """VaR e CVaR paramétricos (normal) por coluna, como perdas positivas"""
+        quadro = self._como_quadro(retornos)
+        media, desvio = quadro.mean(), quadro.std()
+        z = norm.ppf(self.nivel)
+        var = -(media - z * desvio)
+        cvar = -(media - desvio * norm.pdf(z) / (1 - self.nivel))
+        return var, cvar
+
+    def var_cvar_moveis(self, retornos, janela=None):
+        """
+        VaR e CVaR históricos em janela móvel, O(n log w) por coluna com JanelaCauda
+        (sem reordenar cada janela). Retorna (var, cvar) no formato de `retornos`.
+        """
+        janela = janela or self.janela
+        quadro = self._como_quadro(retornos)
+        k = int(self._tamanho_cauda(np.array(janela)))
+        var = pd.DataFrame(np.nan, index=quadro.index, columns=quadro.columns)
+        cvar = var.copy()
+
+        for c, coluna in enumerate(quadro.columns):
+            serie = quadro[coluna].dropna()
+            valores = serie.to_numpy()
+            posicoes = quadro.index.get_indexer(serie.index)
+            cauda = JanelaCauda(k)
+            saida_var = np.full(len(valores), np.nan)
+            saida_cvar = np.full(len(valores), np.nan)
+            for i, valor in enumerate(valores):
+                cauda.adicionar(valor, i)
+                if i >= janela:
+                    cauda.remover(valores[i - janela], i - janela)
+                if i >= janela - 1:
+                    saida_var[i] = -cauda.maior_da_cauda
+                    saida_cvar[i] = -cauda.soma_inferior / k
+            var.iloc[posicoes, c] = saida_var
+            cvar.iloc[posicoes, c] = saida_cvar
+
+        if isinstance(retornos, pd.Series):
+            return var.iloc[:, 0].rename('var'), cvar.iloc[:, 0].rename('cvar')
+        return var, cvar
+
+    # --- DRAWDOWN ---
+
+    @staticmethod
+    def drawdown(precos):
+        """Queda relativa ao pico acumulado (0 no pico, negativa abaixo dele)"""
+        return precos / precos.cummax() - 1
+
+    def drawdown_movel(self, precos, janela=None):
+        """Queda relativa à máxima da janela móvel (deque monotônico do pandas, O(n))"""
+        janela = janela or self.janela
+        return precos / precos.rolling(window=janela, min_periods=1).max() - 1
+
+    def duracao_drawdown(self, precos):
+        """Maior sequência de barras consecutivas abaixo do pico anterior, por coluna"""
+        quadro = self._como_quadro(precos)
+        abaixo = (self.drawdown(quadro) < 0).astype(int)
+        acumulado = abaixo.cumsum()
+        # Contador que zera a cada novo pico: acumulado menos o valor no último pico
+        sequencia = acumulado - acumulado.where(abaixo == 0).ffill().fillna(0)
+        return sequencia.max().astype(int)
+
+    # --- RAZÕES ---
+
+    def sharpe(self, retornos):
+        excesso = retornos - self._taxa_periodo()
+        return excesso.mean() / excesso.std() * math.sqrt(self.periodos_ano)
+
+    def sortino(self, retornos):
+        excesso = retornos - self._taxa_periodo()
+        desvio_negativo = np.sqrt((excesso.clip(upper=0) ** 2).mean())
+        return excesso.mean() / desvio_negativo.replace(0, np.nan) * math.sqrt(self.periodos_ano)
+
+    def sharpe_movel(self, retornos, janela=None):
+        janela = janela or self.janela
+        excesso = retornos - self._taxa_periodo()
+        rolagem = excesso.rolling(window=janela)
+        return rolagem.mean() / rolagem.std() * math.sqrt(self.periodos_ano)
+
+    def sortino_movel(self, retornos, janela=None):
+        janela = janela or self.janela
+        excesso = retornos - self._taxa_periodo()
+        desvio_negativo = np.sqrt((excesso.clip(upper=0) ** 2).rolling(window=janela).mean())
+        return excesso.rolling(window=janela).mean() / desvio_negativo.mask(desvio_negativo == 0) * math.sqrt(self.periodos_ano)
+
+    def volatilidade_movel(self, retornos, janela=None):
+        janela = janela or self.janela
+        return retornos.rolling(window=janela).std() * math.sqrt(self.periodos_ano)
+
+    # --- BETA ---
+
+    @staticmethod
+    def alinhar_benchmark(precos, precos_benchmark):
+        """Alinha ativo(s) e benchmark por data de pregão (fusos e feriados diferentes)"""
+        quadro = AnaliseRisco._como_quadro(precos)
+        series = {coluna: quadro[coluna] for coluna in quadro.columns}
+        series['__benchmark__'] = precos_benchmark
+        matriz = matriz_fechamentos(series)
+        return matriz.drop(columns='__benchmark__'), matriz['__benchmark__']
+
+    @staticmethod
+    def beta(retornos, retornos_benchmark):
+        """Beta por coluna: cov(ativo, benchmark) / var(benchmark) nas barras em comum"""
+        quadro = AnaliseRisco._como_quadro(retornos)
+        return quadro.apply(lambda serie: serie.cov(retornos_benchmark) / retornos_benchmark[serie.notna()].var())
+
+    def beta_movel(self, retornos, retornos_benchmark, janela=None):
+        janela = janela or self.janela
+        return retornos.rolling(window=janela).cov(retornos_benchmark) / retornos_benchmark.rolling(window=janela).var()
+
+    # --- CONSOLIDAÇÃO ---
+
+    def metricas(self, precos, precos_benchmark=None):
+        """
+        Tabela de métricas (uma linha por símbolo) para uma Series ou a matriz de preços
+        VaR/CVaR e volatilidade por barra/ano como frações positivas; drawdown como fração negativa
+        """
+        quadro = self._como_quadro(precos)
+        retornos = self.retornos(quadro)
+        var_h, cvar_h = self.var_cvar_historico(retornos)
+        var_p, cvar_p = self.var_cvar_parametrico(retornos)
+        drawdown = self.drawdown(quadro)
+
+        tabela = pd.DataFrame({
+            'var_historico': var_h,
+            'cvar_historico': cvar_h,
+            'var_parametrico': var_p,
+            'cvar_parametrico': cvar_p,
+            'volatilidade_anual': retornos.std() * math.sqrt(self.periodos_ano),
+            'max_drawdown': drawdown.min(),
+            'drawdown_atual': drawdown.ffill().iloc[-1],
+            'duracao_max_drawdown': self.duracao_drawdown(quadro),
+            'sharpe': self.sharpe(retornos),
+            'sortino': self.sortino(retornos),
+            'beta': np.nan
+        })
+        if precos_benchmark is not None and len(precos_benchmark):
+            alinhados, benchmark = self.alinhar_benchmark(quadro, precos_benchmark)
+            tabela['beta'] = self.beta(self.retornos(alinhados), self.retornos(benchmark))
+        return tabela
+
+    def resumo(self, precos, precos_benchmark=None):
+        """Métricas de uma única série como dict de escalares (None onde indisponível)"""
+        linha = self.metricas(precos, precos_benchmark).iloc[0]
+        resumo = {chave: (None if pd.isna(valor) else float(valor)) for chave, valor in linha.items()}
+        resumo['duracao_max_drawdown'] = int(linha['duracao_max_drawdown'])
+        resumo['nivel'] = self.nivel
+        return resumo
+
+
+def exemplo_analise_risco():
+    """Exemplo: métricas de risco de alguns ativos contra o BOVA11"""
+    from universo import carregar_matriz_fechamentos
+
+    matriz, _ = carregar_matriz_fechamentos(['PETR4.SA', 'VALE3.SA', 'ITUB4.SA', 'BOVA11.SA'], periodo='2y')
+    if matriz.empty:
+        print("Não foi possível carregar os preços")
+        return
+    benchmark = matriz.pop('BOVA11.SA') if 'BOVA11.SA' in matriz else None
+    print(AnaliseRisco().metricas(matriz, benchmark).round(4).T)
+
+
+if __name__ == "__main__":
+    exemplo_analise_risco()
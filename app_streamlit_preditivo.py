@@ -7,21 +7,42 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
+import time
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 
 # Importar módulos personalizados
 try:
     from analise_preditiva import AnalisePreditiva
     from sistema_recomendacoes import SistemaRecomendacoes
-    from lista_ativos import obter_sugestoes_por_categoria
+    from lista_ativos import buscar_ativo_por_simbolo, obter_sugestoes_por_categoria
+    from cliente_dados import ErroCircuitoAberto, ErroDados, ErroLimiteTaxa
+    from snapshot_recomendacoes import SnapshotRecomendacoes
+    from execucao_comparacao import ExecucaoComparacao
+    from analise_risco import AnaliseRisco, benchmark_padrao
+    from cache_compartilhado import obter_cache_padrao
+    from pre_carregamento import PreCarregador
+    from historico_recomendacoes import HistoricoRecomendacoes
+    from universo import (carregar_cambio, fator_conversao, matriz_fechamentos, matriz_normalizada,
+                          simbolos_por_categoria)
+    from estudo_padroes import EstudoPadroes, vantagem_padroes
+    from amplitude_mercado import AmplitudeMercado, score_amplitude
+    from simulacao_carteira import historico_scores
+    from fundamentos import obter_base_padrao, triagem, aplicar_filtros, valor_mercado_em
 except ImportError as e:
     st.error(
-        f"Erro ao importar um módulo: '{e.name}'. Verifique se todos os arquivos .py "
-        "(`analise_preditiva.py`, `sistema_recomendacoes.py`, `lista_ativos.py`) "
-        "estão no mesmo diretório que este script."
+        f"Erro ao importar o módulo '{e.name}'. Verifique se todos os arquivos .py do projeto "
+        "estão no mesmo diretório que este script e se as dependências de requirements.txt estão instaladas."
     )
     st.stop()
 
+# Período do histórico base: buscado uma vez por símbolo, os demais períodos
+# e timeframes são derivados dele sem novas requisições
+PERIODO_BASE = "5y"
+
+# Símbolo exibido para cada moeda de negociação
+SIMBOLOS_MOEDA = {"BRL": "R$", "USD": "US$"}
+
 # Dicionário de categorias de ativos
 CATEGORIAS_DE_ATIVOS = {
     "Ações Americanas": "acoes_americanas",
@@ -62,31 +83,145 @@ st.markdown("""
 
 # --- FUNÇÕES DE EXECUÇÃO ---
 
-def executar_analise_preditiva(simbolo, periodo_analise):
+def exibir_erro_dados(erro, simbolo, mensagem_padrao):
+    """Mostra o erro tipado do cliente de dados, quando disponível"""
+    if erro is None:
+        st.error(mensagem_padrao)
+    elif isinstance(erro, (ErroLimiteTaxa, ErroCircuitoAberto)):
+        st.warning(f"⏳ {simbolo}: {erro.mensagem_usuario}")
+    else:
+        st.error(f"❌ {simbolo}: {erro.mensagem_usuario} ({erro})")
+
+def obter_historico_base(analisador, simbolo, forcar_atualizacao=False):
+    """
+    Retorna o histórico base do símbolo pelo cache compartilhado (sem cópia na sessão,
+    para valer o TTL do cache): sessões que abrem o mesmo símbolo ao mesmo tempo
+    disparam uma única requisição, e cada uma recebe sua própria cópia
+    """
+    if forcar_atualizacao:
+        analisador.invalidar_historico(simbolo, PERIODO_BASE)
+    return analisador.buscar_dados_completos(simbolo, PERIODO_BASE)
+
+def obter_do_snapshot(simbolo, tipo, periodo_analise, forcar_atualizacao):
+    """Lê o resultado pré-calculado; None se ausente, de outro período ou se o usuário pediu atualização"""
+    if forcar_atualizacao:
+        return None
+    resultado = SnapshotRecomendacoes().obter_resultado(simbolo, tipo, periodo_analise)
+    if resultado:
+        st.caption(f"📦 Resultado pré-calculado em {resultado['snapshot']['criada_em']}. "
+                   "Marque \"Forçar atualização\" para recalcular com dados ao vivo.")
+    return resultado
+
+def obter_resultado_compartilhado(chave, calcular, forcar_atualizacao=False):
+    """Resultado calculado uma única vez e reaproveitado por todas as sessões (cada leitura recebe uma cópia)"""
+    cache = obter_cache_padrao()
+    if forcar_atualizacao:
+        cache.invalidar(chave)
+    return cache.obter(chave, calcular)
+
+def registrar_no_historico(resultado, tipo, periodo_analise):
+    """Grava a recomendação calculada ao vivo no histórico de acertos (sem interromper a exibição)"""
+    try:
+        HistoricoRecomendacoes().registrar(resultado, tipo, periodo_analise)
+    except Exception as e:
+        print(f"Erro ao registrar {resultado['symbol']} no histórico: {e}")
+
+def executar_analise_preditiva(simbolo, periodo_analise, forcar_atualizacao=False):
     st.header(f"🔮 Análise Preditiva: {simbolo}")
     if st.button("📊 Analisar Ativo", key="analise_basica", type="primary", use_container_width=True):
-        with st.spinner(f"Executando análise para {simbolo}..."):
+        with st.spinner(f"Executando análise para {simbolo}..."), obter_pre_carregador().em_primeiro_plano():
             try:
+                resultado = obter_do_snapshot(simbolo, 'basica', periodo_analise, forcar_atualizacao)
+                if resultado:
+                    exibir_analise_preditiva(resultado)
+                    exibir_historico_acertos(simbolo, 'basica')
+                    return
                 analisador = AnalisePreditiva()
-                resultado = analisador.gerar_recomendacao(simbolo, periodo=periodo_analise)
+                dados_base = obter_historico_base(analisador, simbolo, forcar_atualizacao)
+                resultado = None
+                if dados_base is not None:
+                    resultado = obter_resultado_compartilhado(
+                        ('basica', simbolo, periodo_analise),
+                        lambda: analisador.gerar_recomendacao(simbolo, periodo=periodo_analise, dados=dados_base),
+                        forcar_atualizacao
+                    )
                 if resultado:
+                    registrar_no_historico(resultado, 'basica', periodo_analise)
                     exibir_analise_preditiva(resultado)
+                    exibir_historico_acertos(simbolo, 'basica')
                 else:
-                    st.error(f"❌ Não foi possível analisar {simbolo}. Verifique se o símbolo está correto ou tente novamente.")
+                    exibir_erro_dados(analisador.ultimo_erro, simbolo, f"❌ Não foi possível analisar {simbolo}. Verifique se o símbolo está correto ou tente novamente.")
             except Exception as e:
                 st.error(f"Ocorreu um erro inesperado durante a análise: {e}")
 
-def executar_recomendacoes_avancadas(simbolo, periodo_analise):
+def obter_previsor_ml():
+    """Previsor de ML mantido na sessão: modelos já ajustados são apenas atualizados incrementalmente"""
+    if "previsor_ml" not in st.session_state:
+        from previsao_ml import PrevisorDirecao
+        st.session_state["previsor_ml"] = PrevisorDirecao()
+    return st.session_state["previsor_ml"]
+
+def executar_recomendacoes_avancadas(simbolo, periodo_analise, forcar_atualizacao=False, usar_ml=False,
+                                     categoria_amplitude=None, usar_fundamentos=False):
     st.header(f"🎯 Recomendações Avançadas: {simbolo}")
     if st.button("🔍 Gerar Recomendação Avançada", key="analise_avancada", type="primary", use_container_width=True):
-        with st.spinner(f"Gerando recomendação avançada para {simbolo}..."):
+        with st.spinner(f"Gerando recomendação avançada para {simbolo}..."), obter_pre_carregador().em_primeiro_plano():
             try:
+                # O snapshot contém apenas o score técnico
+                score_ajustado = usar_ml or categoria_amplitude is not None or usar_fundamentos
+                resultado = obter_do_snapshot(simbolo, 'avancada', periodo_analise, forcar_atualizacao or score_ajustado)
+                if resultado:
+                    exibir_recomendacoes_avancadas(resultado)
+                    exibir_historico_acertos(simbolo, 'avancada')
+                    return
                 sistema = SistemaRecomendacoes()
-                resultado = sistema.gerar_recomendacao_avancada(simbolo, periodo=periodo_analise)
+                dados_base = obter_historico_base(sistema.analisador, simbolo, forcar_atualizacao)
+                resultado, analise_timeframes = None, None
+                if dados_base is not None:
+                    previsor = None
+                    if usar_ml:
+                        # O modelo é treinado com todo o histórico base, não só com o período exibido
+                        previsor = obter_previsor_ml()
+                        previsor.atualizar(simbolo, dados_base)
+                    dados_benchmark = obter_historico_base(sistema.analisador, benchmark_padrao(simbolo))
+                    amplitude = None
+                    if categoria_amplitude is not None:
+                        amplitude_categoria = obter_amplitude([categoria_amplitude])
+                        if amplitude_categoria is not None:
+                            amplitude = amplitude_categoria.metricas_categoria(categoria_amplitude)
+                    fundamentos = None
+                    if usar_fundamentos:
+                        # Só a base local: sem fundamentos ainda, a carga segue em segundo plano
+                        base_fundamentos = obter_base_padrao()
+                        fundamentos = base_fundamentos.obter_simbolo(simbolo)
+                        base_fundamentos.atualizar_em_segundo_plano([simbolo])
+                        if fundamentos is None:
+                            st.info(f"📑 Fundamentos de {simbolo} ainda não carregados; o score usa apenas os demais componentes.")
+
+                    def calcular():
+                        resultado = sistema.gerar_recomendacao_avancada(
+                            simbolo, periodo=periodo_analise, dados=dados_base, previsor=previsor,
+                            benchmark=dados_benchmark['close'] if dados_benchmark is not None else None,
+                            amplitude=amplitude, fundamentos=fundamentos
+                        )
+                        if not resultado:
+                            return None
+                        return resultado, sistema.analisador.analisar_multiplos_timeframes(dados_base, sistema=sistema)
+
+                    # Com ML (modelo da sessão), amplitude ou fundamentos o resultado não é compartilhado
+                    calculado = calcular() if score_ajustado else obter_resultado_compartilhado(
+                        ('avancada', simbolo, periodo_analise), calcular, forcar_atualizacao
+                    )
+                    if calculado:
+                        resultado, analise_timeframes = calculado
                 if resultado:
+                    tipo = 'avancada' + ('_ml' if usar_ml else '') + ('_amplitude' if amplitude else '') + ('_fundamentos' if fundamentos else '')
+                    registrar_no_historico(resultado, tipo, periodo_analise)
                     exibir_recomendacoes_avancadas(resultado)
+                    exibir_multiplos_timeframes(analise_timeframes)
+                    exibir_historico_acertos(simbolo, tipo)
                 else:
-                    st.error(f"❌ Não foi possível gerar recomendação para {simbolo}. Verifique o símbolo.")
+                    exibir_erro_dados(sistema.analisador.ultimo_erro, simbolo, f"❌ Não foi possível gerar recomendação para {simbolo}. Verifique o símbolo.")
             except Exception as e:
                 st.error(f"Ocorreu um erro inesperado durante a recomendação: {e}")
 
@@ -106,6 +241,11 @@ def executar_comparacao_ativos(periodo_analise):
     ativos_sugeridos = obter_sugestoes_por_categoria(categoria_tecnica_sugestao)
     exemplo_ativos = ",".join(ativos_sugeridos[:4]) if ativos_sugeridos else "AAPL,GOOGL,MSFT,TSLA"
     
+    moeda_base = st.sidebar.selectbox(
+        "Moeda base da comparação", list(SIMBOLOS_MOEDA), key="moeda_base_comparacao_selectbox",
+        help="Preços de ativos da B3 (BRL) e americanos (USD) são convertidos pela cotação BRL/USD do dia."
+    )
+    
     # Campo de texto para o usuário inserir os ativos
     ativos_comparacao = st.text_area(
         "Digite os símbolos dos ativos separados por vírgula:",
@@ -120,51 +260,276 @@ def executar_comparacao_ativos(periodo_analise):
             st.error("❌ Por favor, insira pelo menos 2 símbolos para comparação.")
             return
         
-        # Lógica de análise e exibição de resultados
-        with st.spinner("Comparando ativos... Por favor, aguarde."):
-            try:
-                analisador = AnalisePreditiva()
-                resultados = []
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-
-                for i, simbolo in enumerate(simbolos):
-                    status_text.text(f"Analisando {i+1}/{len(simbolos)}: {simbolo}...")
-                    resultado = analisador.gerar_recomendacao(simbolo, periodo=periodo_analise)
-                    if resultado:
-                        resultados.append({
-                            'Símbolo': simbolo, 
-                            'Preço Atual': resultado['preco_atual'], 
-                            'Recomendação': resultado['recomendacao'], 
-                            'Score': resultado['score_consolidado'], 
-                            'RSI': resultado['rsi_atual']
-                        })
-                    progress_bar.progress((i + 1) / len(simbolos))
-                
-                status_text.success("Comparação concluída!")
+        execucao_anterior = st.session_state.get("comparacao_em_andamento")
+        if execucao_anterior is not None and not execucao_anterior.concluida:
+            execucao_anterior.cancelar()
+        # A execução fica na sessão: mudar um widget no meio do processo não perde os resultados
+        st.session_state["comparacao_em_andamento"] = ExecucaoComparacao(simbolos, periodo_analise, PERIODO_BASE)
+    
+    execucao = st.session_state.get("comparacao_em_andamento")
+    if execucao is not None:
+        acompanhar_comparacao(execucao, moeda_base)
+
+def obter_amplitude(categorias):
+    """
+    Amplitude das categorias mantida na sessão: a cada execução, apenas os pregões
+    novos da matriz de fechamentos são processados, e o último já visto é refeito
+    se o fechamento dele mudou (barra parcial do pregão em andamento)
+    """
+    chave = tuple(sorted(categorias))
+    grupos = simbolos_por_categoria(list(chave))
+    analisador = AnalisePreditiva()
+    simbolos = list(dict.fromkeys(s for ativos in grupos.values() for s in ativos))
+    # Históricos pelo cache compartilhado (já aquecidos pelo pré-carregamento da categoria)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        historicos = dict(zip(simbolos, executor.map(
+            lambda s: analisador.buscar_dados_completos(s, PERIODO_BASE), simbolos)))
+    historicos = {s: df for s, df in historicos.items() if df is not None}
+    matriz = matriz_fechamentos(historicos)
+    if matriz.empty:
+        return None
+
+    amplitudes = st.session_state.setdefault("amplitudes", {})
+    # Séries de score por símbolo mantidas na sessão: só o último pregão conhecido
+    # (possivelmente parcial) e os novos são recalculados
+    scores_simbolos = st.session_state.setdefault("scores_amplitude", {})
+    scores = historico_scores(historicos, anteriores=scores_simbolos)
+    amplitude = amplitudes.get(chave) or AmplitudeMercado(grupos)
+    amplitude.acompanhar(matriz, scores)
+    amplitudes[chave] = amplitude
+    return amplitude
+
+def executar_amplitude_categorias():
+    st.header("🌐 Amplitude de Mercado por Categoria")
+    nomes = st.multiselect("Categorias", list(CATEGORIAS_DE_ATIVOS), default=list(CATEGORIAS_DE_ATIVOS),
+                           key="categorias_amplitude_multiselect")
+    if not nomes:
+        st.info("Selecione ao menos uma categoria.")
+        return
+    if not st.button("📊 Calcular Amplitude", key="calcular_amplitude", type="primary", use_container_width=True):
+        return
+    with st.spinner("Calculando a amplitude das categorias..."), obter_pre_carregador().em_primeiro_plano():
+        amplitude = obter_amplitude([CATEGORIAS_DE_ATIVOS[nome] for nome in nomes])
+    if amplitude is None:
+        st.error("❌ Não foi possível obter os históricos das categorias selecionadas.")
+        return
+
+    nomes_por_categoria = {tecnica: nome for nome, tecnica in CATEGORIAS_DE_ATIVOS.items()}
+    atual = amplitude.atual().rename(index=nomes_por_categoria)
+    atual['score_amplitude'] = [score_amplitude(linha) for linha in amplitude.atual().to_dict('records')]
+    tabela = pd.DataFrame({
+        'Membros': atual['membros'].astype(int),
+        'Avanços / Declínios': atual['avancos'].astype(int).astype(str) + " / " + atual['declinios'].astype(int).astype(str),
+        'Acima SMA 50': atual['pct_acima_sma50'],
+        'Acima SMA 200': atual['pct_acima_sma200'],
+        'RSI > 70': atual['pct_rsi_acima_70'],
+        'RSI < 30': atual['pct_rsi_abaixo_30'],
+        'Novas Máximas': atual['novas_maximas'].astype(int),
+        'Novas Mínimas': atual['novas_minimas'].astype(int),
+        'Score Médio': atual['score_medio'],
+        'Score de Amplitude': atual['score_amplitude']
+    })
+    st.dataframe(tabela.style.format({
+        'Acima SMA 50': '{:.0%}', 'Acima SMA 200': '{:.0%}', 'RSI > 70': '{:.0%}', 'RSI < 30': '{:.0%}',
+        'Score Médio': '{:+.2f}', 'Score de Amplitude': '{:+.2f}'
+    }, na_rep='-'), use_container_width=True)
+    st.caption(f"Pregão de {pd.Timestamp(amplitude.ultima_data):%d/%m/%Y}. Score de amplitude: tendência "
+               "(membros acima da SMA 200) e leitura contrária dos extremos de RSI, em [-1, 1].")
+
+    historico = amplitude.historico()
+    for metrica, titulo, formato in (('linha_ad', "Linha de Avanços e Declínios", None),
+                                     ('pct_acima_sma200', "% de Membros acima da SMA 200", '.0%')):
+        fig = go.Figure([
+            go.Scatter(x=historico.index, y=historico[(categoria, metrica)], name=nomes_por_categoria[categoria])
+            for categoria in amplitude.nomes_categorias
+        ])
+        fig.update_layout(title=titulo, template="plotly_white", height=350, yaxis_tickformat=formato)
+        st.plotly_chart(fig, use_container_width=True)
+
+def executar_triagem_fundamentalista():
+    st.header("📑 Triagem Fundamentalista")
+    st.caption("Recomendações do último snapshot combinadas aos fundamentos da base local; nenhuma requisição é feita na consulta.")
+    quadro = triagem()
+    if quadro.empty:
+        st.info("O snapshot de recomendações ainda não foi materializado (execute `python snapshot_recomendacoes.py`).")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    pl_max = col1.number_input("P/L máximo", min_value=0.0, value=0.0, step=1.0, help="0 = sem limite")
+    pvp_max = col2.number_input("P/VP máximo", min_value=0.0, value=0.0, step=0.5, help="0 = sem limite")
+    dy_min = col3.number_input("Dividend yield mínimo (%)", min_value=0.0, value=0.0, step=0.5)
+    valor_mercado_min = col4.number_input("Valor de mercado mínimo (R$ bilhões)", min_value=0.0, value=0.0, step=1.0,
+                                          help="Ativos em USD são convertidos pela cotação BRL/USD mais recente")
+    col1, col2, col3 = st.columns([2, 2, 1])
+    setores = col1.multiselect("Setores", sorted(quadro['setor'].dropna().unique()))
+    recomendacoes = col2.multiselect("Recomendações", ["COMPRA MUITO FORTE", "COMPRA FORTE", "COMPRA", "NEUTRO",
+                                                       "VENDA", "VENDA FORTE", "VENDA MUITO FORTE"])
+    excluir_prejuizo = col3.checkbox("Excluir P/L negativo", value=False)
+    filtros = {
+        'pl_min': 0 if excluir_prejuizo else None,
+        'pl_max': pl_max or None,
+        'pvp_max': pvp_max or None,
+        'dividend_yield_min': dy_min / 100 if dy_min else None,
+        'valor_mercado_min': valor_mercado_min * 1e9 if valor_mercado_min else None,
+        'setores': setores or None
+    }
+    # Valores de mercado em BRL: sem cotação, os ativos em USD ficam sem valor (não passam no filtro)
+    cambio = obter_cambio()
+    mascara = aplicar_filtros(quadro, filtros, 'BRL', cambio)
+    if recomendacoes:
+        mascara &= quadro['recomendacao'].isin(recomendacoes)
+    selecionados = quadro[mascara]
+
+    base = obter_base_padrao()
+    sem_fundamentos = quadro.loc[quadro['atualizado_em'].isna(), 'symbol'].tolist()
+    if sem_fundamentos:
+        st.warning(f"{len(sem_fundamentos)} símbolos ainda sem fundamentos na base local.")
+        if st.button("📥 Carregar fundamentos em segundo plano", key="carregar_fundamentos"):
+            base.atualizar_em_segundo_plano(sem_fundamentos)
+    if base.em_atualizacao:
+        st.caption(f"⏳ Atualizando fundamentos: {base.em_atualizacao} símbolos na fila")
+
+    tabela = pd.DataFrame({
+        'Símbolo': selecionados['symbol'],
+        'Recomendação': selecionados['recomendacao'],
+        'Score': selecionados['score'],
+        'Preço': selecionados['preco_atual'],
+        'Setor': selecionados['setor'],
+        'P/L': selecionados['pl'],
+        'P/VP': selecionados['pvp'],
+        'Dividend Yield': selecionados['dividend_yield'],
+        'Valor de Mercado (R$ bi)': valor_mercado_em(selecionados, 'BRL', cambio) / 1e9,
+        'Score Fundamentalista': selecionados['score_fundamentos']
+    })
+    st.write(f"**{len(tabela)} de {len(quadro)} símbolos atendem aos filtros**")
+    st.dataframe(tabela.style.format({
+        'Score': '{:+.3f}', 'Preço': '{:.2f}', 'P/L': '{:.1f}', 'P/VP': '{:.2f}', 'Dividend Yield': '{:.1%}',
+        'Valor de Mercado (R$ bi)': '{:,.1f}', 'Score Fundamentalista': '{:+.2f}'
+    }, na_rep='-'), use_container_width=True, hide_index=True)
+
+def obter_cambio():
+    """Cotação BRL/USD (buscada uma vez por dia); None se indisponível"""
+    try:
+        return carregar_cambio(PERIODO_BASE)
+    except ErroDados as e:
+        st.warning(f"⚠️ Cotação BRL/USD indisponível; preços exibidos apenas na moeda original. ({e.mensagem_usuario})")
+        return None
 
-                if resultados:
-                    df_comparacao = pd.DataFrame(resultados)
+def tabela_comparacao_moeda_base(resultados, moeda_base, cambio):
+    """Tabela comparativa com o preço na moeda de negociação e convertido para a moeda base"""
+    df_comparacao = pd.DataFrame(resultados)
+    coluna_base = f"Preço ({moeda_base})"
+    cotacao = cambio.iloc[-1] if cambio is not None else np.nan
+    df_comparacao.insert(3, coluna_base, [
+        preco * fator_conversao(moeda, moeda_base, cotacao)
+        for preco, moeda in zip(df_comparacao['Preço Atual'], df_comparacao['Moeda'])
+    ])
+    df_comparacao['Preço Atual'] = [
+        f"{SIMBOLOS_MOEDA[moeda]} {preco:,.2f}" for preco, moeda in zip(df_comparacao['Preço Atual'], df_comparacao['Moeda'])
+    ]
+    return df_comparacao, coluna_base
+
+def exibir_comparacao_normalizada(historicos, simbolos, periodo, moeda_base, cambio):
+    """Desempenho e correlação dos ativos em uma única matriz: mesma moeda e calendário comum"""
+    historicos = {s: historicos[s] for s in simbolos if s in historicos}
+    if len(historicos) < 2 or cambio is None:
+        return
+    # União dos pregões para o desempenho; interseção para retornos sem dias parados (feriados)
+    precos = AnalisePreditiva.recortar_periodo(matriz_normalizada(historicos, moeda_base, 'uniao', cambio), periodo)
+    retornos = AnalisePreditiva.recortar_periodo(
+        matriz_normalizada(historicos, moeda_base, 'intersecao', cambio), periodo
+    ).pct_change(fill_method=None)
+    
+    st.subheader(f"🌎 Desempenho em {moeda_base} (base 100)")
+    base_100 = precos.div(precos.bfill().iloc[0]).mul(100)
+    fig_desempenho = go.Figure([go.Scatter(x=base_100.index, y=base_100[s], name=s) for s in base_100.columns])
+    fig_desempenho.update_layout(template="plotly_white", height=400)
+    st.plotly_chart(fig_desempenho, use_container_width=True)
+    
+    st.subheader("🔗 Correlação dos Retornos Diários")
+    correlacao = retornos.corr()
+    fig_correlacao = go.Figure(go.Heatmap(
+        z=correlacao.values, x=correlacao.columns, y=correlacao.index, zmin=-1, zmax=1,
+        colorscale='RdBu', text=correlacao.round(2).values, texttemplate="%{text}"
+    ))
+    fig_correlacao.update_layout(template="plotly_white", height=400)
+    st.plotly_chart(fig_correlacao, use_container_width=True)
+    st.caption(f"{len(retornos.dropna())} pregões em comum entre as bolsas, retornos em {moeda_base}.")
+
+def acompanhar_comparacao(execucao, moeda_base="BRL"):
+    """Exibe os resultados da comparação progressivamente até a execução terminar"""
+    if not execucao.concluida:
+        if st.button("⏹️ Cancelar Comparação", key="cancelar_comparacao", use_container_width=True):
+            execucao.cancelar()
+    
+    if execucao.periodo != st.session_state.get("periodo_analise_selectbox", execucao.periodo):
+        st.info(f"ℹ️ Resultados calculados para o período {execucao.periodo}. Clique em Comparar para atualizar.")
+    
+    cambio = obter_cambio()
+    progress_bar = st.progress(0.0)
+    status_text = st.empty()
+    area_status = st.empty()
+    area_tabela = st.empty()
+    area_grafico = st.empty()
+    
+    versao_exibida = -1
+    while True:
+        concluida = execucao.concluida
+        progress_bar.progress(execucao.progresso())
+        
+        if execucao.versao != versao_exibida:
+            versao_exibida = execucao.versao
+            resultados, historicos = execucao.copiar_resultados()
+            
+            with area_status.container():
+                with st.expander("🧾 Status por símbolo", expanded=not concluida):
+                    st.dataframe(pd.DataFrame(execucao.tabela_status()).style.format(
+                        {'Tempo (s)': '{:.1f}'}, na_rep='-'
+                    ), use_container_width=True)
+            
+            if resultados:
+                df_comparacao, coluna_base = tabela_comparacao_moeda_base(resultados, moeda_base, cambio)
+                with area_tabela.container():
                     st.subheader("📊 Tabela Comparativa")
                     st.dataframe(df_comparacao.style.format({
-                        'Preço Atual': '${:,.2f}', 
+                        coluna_base: SIMBOLOS_MOEDA[moeda_base] + ' {:,.2f}',
                         'Score': '{:.3f}', 
-                        'RSI': '{:.1f}'
-                    }), use_container_width=True)
-                    
+                        'RSI': '{:.1f}',
+                        'VaR 95%': '{:.2%}',
+                        'CVaR 95%': '{:.2%}',
+                        'Drawdown Máx.': '{:.1%}',
+                        'Sharpe': '{:.2f}',
+                        'Beta': '{:.2f}'
+                    }, na_rep='-'), use_container_width=True)
+                
+                fig_scores = go.Figure(data=[go.Bar(
+                    x=df_comparacao['Símbolo'], 
+                    y=df_comparacao['Score'], 
+                    marker_color=['#28a745' if s > 0.1 else '#dc3545' if s < -0.1 else '#6c757d' for s in df_comparacao['Score']]
+                )])
+                fig_scores.update_layout(title="Comparação dos Scores de Recomendação", template="plotly_white")
+                with area_grafico.container():
                     st.subheader("⚖️ Comparação de Scores")
-                    fig_scores = go.Figure(data=[go.Bar(
-                        x=df_comparacao['Símbolo'], 
-                        y=df_comparacao['Score'], 
-                        marker_color=['#28a745' if s > 0.1 else '#dc3545' if s < -0.1 else '#6c757d' for s in df_comparacao['Score']]
-                    )])
-                    fig_scores.update_layout(title="Comparação dos Scores de Recomendação", template="plotly_white")
-                    st.plotly_chart(fig_scores, use_container_width=True)
-                else:
-                    st.warning("⚠️ Nenhum resultado encontrado para os ativos informados.")
-
-            except Exception as e:
-                st.error(f"Ocorreu um erro inesperado durante a comparação: {e}")
+                    st.plotly_chart(fig_scores, use_container_width=True, key=f"grafico_scores_{versao_exibida}")
+        
+        if concluida:
+            break
+        status_text.text(f"Comparando ativos... {execucao.progresso():.0%}")
+        time.sleep(0.3)
+    
+    resultados, _ = execucao.copiar_resultados()
+    if execucao.cancelada:
+        status_text.warning(f"Comparação cancelada: {len(resultados)} de {len(execucao.simbolos)} ativos analisados.")
+    else:
+        status_text.success("Comparação concluída!")
+    
+    for estado in execucao.estado.values():
+        if estado['erro'] is not None:
+            exibir_erro_dados(estado['erro'], estado['erro'].symbol, "")
+    if not resultados and not execucao.cancelada:
+        st.warning("⚠️ Nenhum resultado encontrado para os ativos informados.")
+    else:
+        exibir_comparacao_normalizada(historicos, [linha['Símbolo'] for linha in resultados], execucao.periodo, moeda_base, cambio)
 
 # --- FUNÇÕES DE EXIBIÇÃO (sem alterações) ---
 
@@ -188,6 +553,14 @@ def exibir_analise_preditiva(resultado):
         st.write(f"**Tendência RSI:** {resultado['analise_detalhada']['tendencia_rsi']}")
         st.write(f"**Posição Bollinger:** {resultado['analise_detalhada']['posicao_bb']}")
         st.write(f"**Momentum MACD:** {resultado['analise_detalhada']['momentum_macd']}")
+        perfil = resultado.get('perfil_volume')
+        if perfil:
+            st.write(f"**Perfil de Volume:** POC ${perfil['poc']:.2f} | Área de valor "
+                     f"${perfil['area_valor_baixa']:.2f} – ${perfil['area_valor_alta']:.2f}")
+            alvos_perfil = [f"{nome} ${perfil[chave]:.2f}" for nome, chave in (("alta", 'alvo_alta'), ("baixa", 'alvo_baixa'))
+                            if perfil[chave] is not None]
+            if alvos_perfil:
+                st.write(f"**Alvos pelo perfil de volume:** {' | '.join(alvos_perfil)}")
     fig = AnalisePreditiva().criar_grafico_analise_completa(resultado)
     if fig:
         st.plotly_chart(fig, use_container_width=True)
@@ -206,6 +579,10 @@ def exibir_analise_preditiva(resultado):
                     <div class="legend-color-box" style="background-color: blue;"></div>
                     <div class="legend-text"><strong>Média Móvel:</strong> Suaviza o preço para mostrar a tendência principal.</div>
                 </div>
+                <div class="legend-item">
+                    <div class="legend-color-box" style="background-color: lightgray;"></div>
+                    <div class="legend-text"><strong>POC / Área de Valor:</strong> Preço com maior volume negociado no período e a faixa que concentra 70% do volume; linhas pontilhadas marcam os nós de alto volume.</div>
+                </div>
                 <div class="legend-item">
                     <div class="legend-color-box" style="background-color: purple;"></div>
                     <div class="legend-text"><strong>RSI:</strong> Mede a força do movimento. Acima de 70 é sobrecomprado; abaixo de 30, sobrevendido.</div>
@@ -244,9 +621,53 @@ def exibir_recomendacoes_avancadas(resultado):
     col2.metric("📊 Score Final", f"{resultado['score_final']:.3f}")
     col3.metric("🎯 Alvo Principal", f"${resultado['preco_alvo_1']:.2f}")
     col4.metric("🛑 Stop Loss", f"${resultado['stop_loss']:.2f}")
+    if resultado.get('stop_loss_atr') is not None and not np.isnan(resultado['stop_loss_atr']):
+        col1, col2 = st.columns(2)
+        col1.metric("📏 Stop por ATR (3x)", f"${resultado['stop_loss_atr']:.2f}")
+        col2.metric("📊 ATR (14)", f"${resultado['atr_atual']:.2f}")
+    if resultado.get('probabilidade_alta_ml') is not None:
+        col1, col2 = st.columns(2)
+        col1.metric("🤖 Probabilidade de Alta (ML)", f"{resultado['probabilidade_alta_ml']:.1%}")
+        col2.metric("📐 Score Técnico (sem ML)", f"{resultado['score_tecnico']:.3f}")
+    if resultado.get('score_amplitude') is not None:
+        amplitude = resultado['amplitude_categoria']
+        col1, col2, col3 = st.columns(3)
+        col1.metric("🌐 Score de Amplitude da Categoria", f"{resultado['score_amplitude']:+.2f}")
+        col2.metric("📈 Membros acima da SMA 200", f"{amplitude['pct_acima_sma200']:.0%}")
+        col3.metric("🌡️ RSI > 70 / RSI < 30", f"{amplitude['pct_rsi_acima_70']:.0%} / {amplitude['pct_rsi_abaixo_30']:.0%}")
+    if resultado.get('score_fundamentos') is not None:
+        fundamentos = resultado['fundamentos']
+        formatar = lambda valor, formato: format(valor, formato) if valor is not None else "-"
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("📑 Score Fundamentalista", f"{resultado['score_fundamentos']:+.2f}")
+        col2.metric("P/L", formatar(fundamentos['pl'], '.1f'))
+        col3.metric("P/VP", formatar(fundamentos['pvp'], '.2f'))
+        col4.metric("Dividend Yield", formatar(fundamentos['dividend_yield'], '.1%'))
+        st.caption(f"Setor: {fundamentos['setor'] or '-'} | Fundamentos de {fundamentos['atualizado_em']}")
+    simulacao = obter_simulacao_alvos(resultado)
+    if simulacao:
+        with st.expander(f"🎲 Probabilidades Monte Carlo ({simulacao['n_caminhos']:,} trajetórias, {simulacao['horizonte']} pregões)"):
+            if simulacao['stop_valido']:
+                col1, col2, col3 = st.columns(3)
+                for coluna, nome, rotulo in ((col1, 'preco_alvo_1', "🎯 Alvo 1 antes do stop"),
+                                             (col2, 'preco_alvo_2', "🎯 Alvo 2 antes do stop")):
+                    probabilidade = simulacao['probabilidades_alvo'].get(nome)
+                    if nome in simulacao['alvos_ja_atingidos']:
+                        coluna.metric(rotulo, "Já atingido")
+                    elif probabilidade is not None:
+                        coluna.metric(rotulo, f"{probabilidade:.1%}")
+                col3.metric("🛑 Stop atingido", f"{simulacao['probabilidade_stop']:.1%}")
+            else:
+                st.warning("O preço atual já ultrapassou o stop sugerido; as probabilidades de alvo não se aplicam.")
+            percentis = simulacao['percentis_preco_final']
+            st.write(f"**Faixa de preço ao final do horizonte (5%–95%):** ${percentis[5]:.2f} – ${percentis[95]:.2f} "
+                     f"(mediana ${percentis[50]:.2f})")
+            st.caption("Trajetórias por movimento browniano geométrico calibrado nos retornos diários do período analisado.")
+    exibir_metricas_risco(resultado)
     if resultado['padroes_recentes']:
         st.subheader("🕯️ Padrões de Candlestick Recentes")
         st.info(f"Padrões identificados nos últimos 5 dias: **{', '.join(resultado['padroes_recentes'])}**")
+        exibir_vantagem_padroes(resultado['symbol'], resultado['padroes_recentes'])
     with st.expander("🔬 Análise Técnica Detalhada"):
         analise = resultado['analise_detalhada']
         st.write(f"**RSI:** {analise['tendencia_rsi']}")
@@ -260,8 +681,158 @@ def exibir_recomendacoes_avancadas(resultado):
         with st.expander("📘 Entenda os Indicadores do Gráfico"):
             st.markdown("""...""")
 
+def obter_simulacao_alvos(resultado):
+    """
+    Probabilidades Monte Carlo calibradas nos fechamentos diários completos do período
+    (o snapshot guarda a série reduzida do gráfico), calculadas uma vez por símbolo,
+    último pregão, alvos e stop e reaproveitadas entre renderizações e sessões
+    """
+    sistema = SistemaRecomendacoes()
+    dados = resultado['dados_historicos']
+    precos = dados['close']
+    base = obter_historico_base(sistema.analisador, resultado['symbol'])
+    if base is not None:
+        indice, inicio = base.index, pd.Timestamp(dados.index[0])
+        if indice.tz is not None:
+            indice = indice.tz_localize(None)
+        if inicio.tz is not None:
+            inicio = inicio.tz_localize(None)
+        precos = base['close'][indice >= inicio.normalize()]
+    if precos.empty:
+        return None
+    chave = ('monte_carlo', resultado['symbol'], precos.index[-1], resultado['preco_alvo_1'],
+             resultado['preco_alvo_2'], resultado['stop_loss'], bool(resultado['score_final'] > 0))
+    return obter_resultado_compartilhado(chave, lambda: sistema.calcular_probabilidades_alvos(resultado, precos=precos))
+
+def exibir_metricas_risco(resultado):
+    risco = resultado.get('risco')
+    if not risco:
+        return
+    with st.expander("📉 Métricas de Risco"):
+        nivel = f"{risco['nivel']:.0%}"
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric(f"VaR {nivel} (1 dia)", f"{risco['var_historico']:.2%}", help=f"Paramétrico: {risco['var_parametrico']:.2%}")
+        col2.metric(f"CVaR {nivel} (1 dia)", f"{risco['cvar_historico']:.2%}", help=f"Paramétrico: {risco['cvar_parametrico']:.2%}")
+        col3.metric("Drawdown Máximo", f"{risco['max_drawdown']:.1%}", help=f"Maior período abaixo do pico: {risco['duracao_max_drawdown']} pregões")
+        col4.metric("Volatilidade Anual", f"{risco['volatilidade_anual']:.1%}")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Sharpe", f"{risco['sharpe']:.2f}" if risco['sharpe'] is not None else "-")
+        col2.metric("Sortino", f"{risco['sortino']:.2f}" if risco['sortino'] is not None else "-")
+        col3.metric(f"Beta vs {benchmark_padrao(resultado['symbol'])}", f"{risco['beta']:.2f}" if risco['beta'] is not None else "-")
+        col4.metric("Drawdown Atual", f"{risco['drawdown_atual']:.1%}")
+        
+        analise_risco = AnaliseRisco()
+        precos = resultado['dados_historicos']['close']
+        var_movel, cvar_movel = analise_risco.var_cvar_moveis(analise_risco.retornos(precos))
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=var_movel.index, y=-var_movel, name=f"VaR {nivel} móvel", line=dict(color='orange')))
+        fig.add_trace(go.Scatter(x=cvar_movel.index, y=-cvar_movel, name=f"CVaR {nivel} móvel", line=dict(color='red')))
+        fig.add_trace(go.Scatter(x=precos.index, y=analise_risco.drawdown(precos), name="Drawdown", fill='tozeroy', line=dict(color='gray')))
+        fig.update_layout(title=f"Risco Móvel ({analise_risco.janela} pregões) e Drawdown", yaxis_tickformat='.0%', template="plotly_white", height=350)
+        st.plotly_chart(fig, use_container_width=True)
+
+def obter_estudo_padroes():
+    """Estudo de padrões gravado pelo job (`python estudo_padroes.py`), compartilhado entre sessões"""
+    return obter_cache_padrao().obter(('estudo_padroes',), lambda: EstudoPadroes().carregar(), ttl=3600)
+
+def exibir_vantagem_padroes(simbolo, padroes_recentes):
+    """Retorno histórico após cada padrão detectado, comparado a todos os pregões"""
+    estudo = obter_estudo_padroes()
+    if not estudo:
+        st.caption("Execute `python estudo_padroes.py` para ver o histórico de retornos após cada padrão.")
+        return
+    padroes = [p.lower().replace(' ', '_') for p in padroes_recentes]
+    tabela = vantagem_padroes(estudo, simbolo, padroes)
+    if tabela.empty:
+        return
+    bases = {'simbolo': simbolo, 'universo': 'Universo'}
+    exibicao = pd.DataFrame({
+        'Padrão': tabela['padrao'].str.replace('_', ' ').str.title(),
+        'Horizonte': [f"{h} pregão" if h == 1 else f"{h} pregões" for h in tabela['horizonte']],
+        'Base': [bases.get(nivel, grupo) for nivel, grupo in zip(tabela['nivel'], tabela['grupo'])],
+        'Ocorrências': tabela['ocorrencias'],
+        'Retorno Médio': tabela['retorno_medio'],
+        'Vantagem': tabela['vantagem'],
+        'Taxa de Alta': tabela['taxa_alta'],
+        'Taxa de Alta (todos os pregões)': tabela['taxa_alta_base']
+    })
+    st.dataframe(exibicao.style.format({
+        'Retorno Médio': '{:+.2%}', 'Vantagem': '{:+.2%}', 'Taxa de Alta': '{:.0%}',
+        'Taxa de Alta (todos os pregões)': '{:.0%}'
+    }), hide_index=True, use_container_width=True)
+    st.caption(f"Estudo de {estudo['criado_em']}: retornos após cada ocorrência no histórico completo. "
+               "Vantagem = retorno médio após o padrão menos o retorno médio de todos os pregões.")
+
+def exibir_historico_acertos(simbolo, tipo, horizonte=21):
+    """Taxas de acerto das recomendações passadas do ativo e da sua categoria (ledger), só do tipo exibido"""
+    historico = HistoricoRecomendacoes()
+    ativo = buscar_ativo_por_simbolo(simbolo)
+    with st.expander(f"📒 Histórico de acertos: {tipo} ({horizonte} pregões)"):
+        formato = {'taxa_acerto': '{:.0%}', 'retorno_medio': '{:.2%}', 'taxa_alvo': '{:.0%}', 'taxa_stop': '{:.0%}'}
+        taxas = historico.taxas_acerto('recomendacao', horizonte=horizonte, symbol=simbolo, tipo=tipo)
+        if taxas.empty:
+            st.info("Ainda não há desfechos apurados para este ativo. "
+                    "Execute `python historico_recomendacoes.py` após o fechamento.")
+        else:
+            st.markdown(f"**{simbolo}**")
+            st.dataframe(taxas.style.format(formato, na_rep='-'), use_container_width=True, hide_index=True)
+        if ativo:
+            taxas_categoria = historico.taxas_acerto('recomendacao', horizonte=horizonte, categoria=ativo['categoria'],
+                                                      tipo=tipo)
+            if not taxas_categoria.empty:
+                st.markdown(f"**Categoria: {ativo['categoria'].replace('_', ' ').title()}**")
+                st.dataframe(taxas_categoria.style.format(formato, na_rep='-'), use_container_width=True, hide_index=True)
+
+def exibir_multiplos_timeframes(analise):
+    if not analise or analise['score_confluencia'] is None:
+        return
+    with st.expander("🕒 Análise Multi-Timeframe"):
+        col1, col2 = st.columns(2)
+        col1.metric("🧭 Score de Confluência", f"{analise['score_confluencia']:.3f}")
+        col2.metric("🤝 Alinhamento", f"{analise['alinhamento']:.0%}")
+        linhas = []
+        for timeframe, dados in analise['timeframes'].items():
+            if dados['suficiente']:
+                linhas.append({
+                    'Timeframe': timeframe.title(), 'Barras': dados['barras'],
+                    'Score Consolidado': dados['score_consolidado'], 'Score Final': dados['score_final'],
+                    'Score Combinado': dados['score_combinado'], 'RSI': dados['rsi_atual']
+                })
+            else:
+                linhas.append({'Timeframe': timeframe.title(), 'Barras': dados['barras']})
+        st.dataframe(pd.DataFrame(linhas), use_container_width=True)
+        st.caption("Timeframes com poucas barras são exibidos sem score e ignorados na confluência.")
+
 # --- FUNÇÃO PRINCIPAL (MAIN) ---
 
+def obter_pre_carregador():
+    """Fila de pré-carregamento da sessão (os workers são do processo, compartilhados entre sessões)"""
+    if "pre_carregador" not in st.session_state:
+        st.session_state["pre_carregador"] = PreCarregador(PERIODO_BASE)
+    return st.session_state["pre_carregador"]
+
+def pre_carregar_categoria(categoria, simbolos, periodo_analise, prioritario, calcular_analise):
+    """Aquece em segundo plano os símbolos sugeridos da categoria (a fila é da sessão) e seus fundamentos"""
+    obter_base_padrao().atualizar_em_segundo_plano(simbolos)
+    pre_carregador = obter_pre_carregador()
+    pre_carregador.carregar(categoria, simbolos, periodo_analise, prioritario, calcular_analise)
+    status = pre_carregador.status()
+    if status['na_fila'] or status['workers']:
+        st.sidebar.caption(f"⏳ Pré-carregando sugestões: {status['concluidos'] + status['erros']}/{status['total']}")
+
+def exibir_metricas_cache():
+    """Acertos, falhas e esperas do cache compartilhado entre sessões"""
+    metricas = obter_cache_padrao().metricas()
+    with st.sidebar.expander("🗄️ Cache compartilhado"):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Acertos", metricas['acertos'])
+        col2.metric("Falhas", metricas['falhas'])
+        col3.metric("Esperas", metricas['esperas'])
+        taxa = metricas['taxa_acerto']
+        st.caption(f"Taxa de acerto: {taxa:.0%}" if taxa is not None else "Taxa de acerto: -")
+        st.caption(f"Itens: {metricas['itens']} | Em andamento: {metricas['em_andamento']} | "
+                   f"Tempo buscando/calculando: {metricas['tempo_calculo']:.1f}s")
+
 def main():
     st.markdown('<h1 class="main-header">Simulador de Renda Variável Preditiva</h1>', unsafe_allow_html=True)
     
@@ -269,7 +840,8 @@ def main():
     
     modo_operacao = st.sidebar.selectbox(
         "Modo de Operação",
-        ["Análise Preditiva Básica", "Recomendações Avançadas", "Comparação de Ativos"]
+        ["Análise Preditiva Básica", "Recomendações Avançadas", "Comparação de Ativos", "Amplitude por Categoria",
+         "Triagem Fundamentalista"]
     )
     
     st.sidebar.subheader("📊 Configurações do Ativo")
@@ -281,8 +853,21 @@ def main():
         key="periodo_analise_selectbox"
     )
     
+    forcar_atualizacao = st.sidebar.checkbox(
+        "🔄 Forçar atualização (ignorar snapshot)",
+        value=False,
+        key="forcar_atualizacao_checkbox",
+        help="Por padrão, os resultados pré-calculados pelo job noturno são usados quando disponíveis."
+    )
+    
+    exibir_metricas_cache()
+    
     if modo_operacao == "Comparação de Ativos":
         executar_comparacao_ativos(periodo_analise)
+    elif modo_operacao == "Amplitude por Categoria":
+        executar_amplitude_categorias()
+    elif modo_operacao == "Triagem Fundamentalista":
+        executar_triagem_fundamentalista()
     else:
         nome_tipo_ativo = st.sidebar.selectbox(
             "Tipo de Ativo", 
@@ -297,12 +882,35 @@ def main():
         simbolo_manual = st.sidebar.text_input("Ou digite o símbolo manualmente:", value=simbolo_selecionado, key="simbolo_manual_text")
         simbolo = simbolo_manual.strip().upper() if simbolo_manual else simbolo_selecionado
         
+        # Na análise básica também o resultado é pré-calculado; nas avançadas, só o histórico
+        pre_carregar_categoria(categoria_tecnica, simbolos_sugeridos, periodo_analise, simbolo,
+                               modo_operacao == "Análise Preditiva Básica")
+        
         if modo_operacao == "Análise Preditiva Básica":
             if simbolo:
-                executar_analise_preditiva(simbolo, periodo_analise)
+                executar_analise_preditiva(simbolo, periodo_analise, forcar_atualizacao)
         elif modo_operacao == "Recomendações Avançadas":
+            usar_ml = st.sidebar.checkbox(
+                "🤖 Combinar previsão de Machine Learning",
+                value=False,
+                key="usar_ml_checkbox",
+                help="Treina um modelo walk-forward com os indicadores e combina a probabilidade de alta ao score final."
+            )
+            usar_amplitude = st.sidebar.checkbox(
+                "🌐 Considerar amplitude da categoria",
+                value=False,
+                key="usar_amplitude_checkbox",
+                help=f"Combina ao score final o contexto de {nome_tipo_ativo}: membros acima da SMA 200 e extremos de RSI."
+            )
+            usar_fundamentos = st.sidebar.checkbox(
+                "📑 Considerar fundamentos",
+                value=False,
+                key="usar_fundamentos_checkbox",
+                help="Combina ao score final o score fundamentalista (P/L, P/VP e dividend yield) da base local."
+            )
             if simbolo:
-                executar_recomendacoes_avancadas(simbolo, periodo_analise)
+                executar_recomendacoes_avancadas(simbolo, periodo_analise, forcar_atualizacao, usar_ml,
+                                                 categoria_tecnica if usar_amplitude else None, usar_fundamentos)
 
 if __name__ == "__main__":
     main()
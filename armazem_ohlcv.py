@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Armazém Local de OHLCV Mapeado em Memória
+Layout colunar de largura fixa por símbolo (timestamp + OHLCV, um arquivo
+binário por coluna) e um pequeno índice JSON com o número de linhas
+confirmadas. Os workers abrem as colunas com numpy.memmap somente leitura,
+compartilhando o cache de páginas do sistema operacional sem cópias.
+"""
+
+import os
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from cliente_dados import ClienteDados
+
+try:
+    import fcntl
+except ImportError:  # Windows: exclusão apenas entre threads do mesmo processo
+    fcntl = None
+
+DIRETORIO_PADRAO = os.path.join('dados', 'ohlcv')
+
+# Colunas armazenadas e seus tipos (largura fixa)
+COLUNAS = {
+    'timestamp': np.dtype('<i8'),  # nanossegundos desde a época, UTC
+    'open': np.dtype('<f8'),
+    'high': np.dtype('<f8'),
+    'low': np.dtype('<f8'),
+    'close': np.dtype('<f8'),
+    'volume': np.dtype('<f8')
+}
+
+ARQUIVO_INDICE = 'indice.json'
+
+
+class _IndexadorPosicional:
+    """Suporte a `visao.iloc[inicio:fim]` retornando outra visão sem cópia"""
+
+    def __init__(self, visao):
+        self._visao = visao
+
+    def __getitem__(self, chave):
+        if isinstance(chave, slice):
+            return self._visao._fatiar(chave)
+        return pd.Series({coluna: self._visao._colunas[coluna][chave] for coluna in self._visao.columns})
+
+
+class VisaoOHLCV:
+    """
+    Visão somente leitura de um símbolo do armazém
+    Expõe a mesma interface mínima de DataFrame usada pela análise
+    (`visao['close']`, `visao.index`, `visao.empty`, `len(visao)`, `visao.iloc[a:b]`),
+    mas cada coluna é uma Series apoiada diretamente no memmap
+    """
+
+    columns = ['open', 'high', 'low', 'close', 'volume']
+
+    def __init__(self, symbol, colunas, timestamps, tz=None):
+        self.symbol = symbol
+        self._colunas = colunas
+        self._timestamps = timestamps
+        self._tz = tz
+        indice = pd.DatetimeIndex(timestamps.view('datetime64[ns]'))
+        if tz is not None:
+            indice = indice.tz_localize('UTC').tz_convert(tz)
+        self.index = indice
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def iloc(self):
+        return _IndexadorPosicional(self)
+
+    def _fatiar(self, fatia):
+        return VisaoOHLCV(
+            self.symbol,
+            {coluna: valores[fatia] for coluna, valores in self._colunas.items()},
+            self._timestamps[fatia],
+            self._tz
+        )
+
+    def __getitem__(self, chave):
+        if isinstance(chave, list):
+            return self.para_dataframe()[chave]
+        return pd.Series(self._colunas[chave], index=self.index, name=chave, copy=False)
+
+    def para_dataframe(self):
+        """Materializa a visão em um DataFrame (cópia), para operações não suportadas pela visão"""
+        return pd.DataFrame({coluna: np.array(self._colunas[coluna]) for coluna in self.columns}, index=self.index)
+
+
+class ArmazemOHLCV:
+    """Armazém colunar de OHLCV com leitura via memmap e append atômico"""
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        self._trava = threading.Lock()
+
+    # --- ÍNDICE ---
+
+    def _caminho_indice(self):
+        return os.path.join(self.diretorio, ARQUIVO_INDICE)
+
+    def ler_indice(self):
+        """Índice {symbol: {'linhas': n, 'tz': ...}} apenas com linhas confirmadas"""
+        try:
+            with open(self._caminho_indice()) as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return {}
+
+    def _gravar_indice(self, indice):
+        # Escrita em arquivo temporário + os.replace: leitores veem o índice antigo ou o novo, nunca parcial
+        temporario = self._caminho_indice() + '.tmp'
+        with open(temporario, 'w') as arquivo:
+            json.dump(indice, arquivo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self._caminho_indice())
+
+    def _caminho_coluna(self, symbol, coluna):
+        return os.path.join(self.diretorio, symbol, f'{coluna}.bin')
+
+    def simbolos(self):
+        return sorted(self.ler_indice())
+
+    # --- ESCRITA ---
+
+    def anexar(self, symbol, df):
+        """
+        Anexa barras novas (posteriores à última armazenada) ao símbolo
+        Os dados são gravados e sincronizados antes da atualização do índice;
+        uma falha no meio do append deixa apenas bytes órfãos, descartados no próximo append.
+        Retorna o número de barras anexadas.
+        """
+        if df is None or df.empty:
+            return 0
+
+        with self._trava, _TravaArquivo(os.path.join(self.diretorio, ARQUIVO_INDICE + '.lock')):
+            indice = self.ler_indice()
+            entrada = indice.get(symbol, {'linhas': 0, 'tz': None})
+            linhas = entrada['linhas']
+
+            timestamps = df.index
+            tz = str(timestamps.tz) if timestamps.tz is not None else None
+            if tz is not None:
+                timestamps = timestamps.tz_convert('UTC').tz_localize(None)
+            timestamps = timestamps.as_unit('ns').asi8
+
+            if linhas > 0:
+                ultimo = np.memmap(self._caminho_coluna(symbol, 'timestamp'), dtype=COLUNAS['timestamp'],
+                                   mode='r', offset=(linhas - 1) * 8, shape=(1,))[0]
+                novas = timestamps > ultimo
+            else:
+                novas = np.ones(len(timestamps), dtype=bool)
+            if not novas.any():
+                return 0
+
+            os.makedirs(os.path.join(self.diretorio, symbol), exist_ok=True)
+            valores = {'timestamp': timestamps[novas]}
+            for coluna in VisaoOHLCV.columns:
+                valores[coluna] = df[coluna].to_numpy(dtype=COLUNAS[coluna])[novas]
+
+            for coluna, dtype in COLUNAS.items():
+                with open(self._caminho_coluna(symbol, coluna), 'ab') as arquivo:
+                    # Descarta restos de um append anterior interrompido
+                    arquivo.truncate(linhas * dtype.itemsize)
+                    arquivo.write(np.ascontiguousarray(valores[coluna], dtype=dtype).tobytes())
+                    arquivo.flush()
+                    os.fsync(arquivo.fileno())
+
+            indice[symbol] = {'linhas': linhas + int(novas.sum()), 'tz': entrada['tz'] or tz}
+            self._gravar_indice(indice)
+            return int(novas.sum())
+
+    def atualizar_incremental(self, symbol, cliente=None, periodo_inicial='5y', periodo_incremental='1mo'):
+        """Busca apenas o período recente (ou o histórico inicial, se ausente) e anexa as barras novas"""
+        cliente = cliente or ClienteDados()
+        periodo = periodo_incremental if symbol in self.ler_indice() else periodo_inicial
+        return self.anexar(symbol, cliente.buscar_historico(symbol, periodo))
+
+    # --- LEITURA ---
+
+    def abrir(self, symbol):
+        """Abre o símbolo como VisaoOHLCV somente leitura (None se ausente)"""
+        entrada = self.ler_indice().get(symbol)
+        if entrada is None or entrada['linhas'] == 0:
+            return None
+
+        linhas = entrada['linhas']
+        colunas = {
+            coluna: np.memmap(self._caminho_coluna(symbol, coluna), dtype=dtype, mode='r', shape=(linhas,))
+            for coluna, dtype in COLUNAS.items()
+        }
+        timestamps = colunas.pop('timestamp')
+        return VisaoOHLCV(symbol, colunas, timestamps, entrada['tz'])
+
+
+class _TravaArquivo:
+    """Exclusão mútua entre processos que escrevem no mesmo armazém (no-op sem fcntl)"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._arquivo = open(self.caminho, 'a')
+            fcntl.flock(self._arquivo, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        if self._arquivo is not None:
+            fcntl.flock(self._arquivo, fcntl.LOCK_UN)
+            self._arquivo.close()
+
+
+def _analisar_simbolo_armazem(diretorio, symbol, periodo):
+    """Executado no worker: abre a visão memmap e gera o resumo da recomendação"""
+    from analise_preditiva import AnalisePreditiva
+
+    visao = ArmazemOHLCV(diretorio).abrir(symbol)
+    if visao is None:
+        return symbol, None
+    resultado = AnalisePreditiva().gerar_recomendacao(symbol, periodo=periodo, dados=visao)
+    if resultado is None:
+        return symbol, None
+    return symbol, {
+        'preco_atual': resultado['preco_atual'],
+        'recomendacao': resultado['recomendacao'],
+        'score_consolidado': resultado['score_consolidado'],
+        'rsi_atual': resultado['rsi_atual']
+    }
+
+
+def analisar_armazem_em_paralelo(diretorio=DIRETORIO_PADRAO, simbolos=None, periodo=None, max_workers=None):
+    """
+    Distribui as análises entre processos; cada worker recebe apenas o caminho
+    do armazém e o símbolo, e lê o histórico diretamente do memmap
+    """
+    if simbolos is None:
+        simbolos = ArmazemOHLCV(diretorio).simbolos()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futuros = [executor.submit(_analisar_simbolo_armazem, diretorio, s, periodo) for s in simbolos]
+        return dict(futuro.result() for futuro in futuros)
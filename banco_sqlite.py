@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Bancos SQLite Locais
+Conexões aos bancos em `dados/` (snapshot e histórico de recomendações,
+fundamentos): o esquema é criado e o WAL ativado uma única vez por processo
+e banco, para que leitores (o app) consultem enquanto um job ou thread grava.
+Se o arquivo do banco for removido com o processo em execução, ele é
+recriado, vazio, na próxima conexão.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+
+# Bancos com o esquema já criado neste processo (caminho absoluto)
+_BANCOS_INICIALIZADOS = set()
+_TRAVA_BANCOS = threading.Lock()
+
+
+def _inicializado(chave, caminho):
+    return chave in _BANCOS_INICIALIZADOS and os.path.exists(caminho)
+
+
+def inicializar_banco(caminho, esquema):
+    """Cria o diretório e o esquema e ativa o WAL, se ainda não feito neste processo"""
+    chave = os.path.abspath(caminho)
+    if _inicializado(chave, caminho):
+        return
+    with _TRAVA_BANCOS:
+        if _inicializado(chave, caminho):
+            return
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        if not os.path.exists(caminho):
+            # Sem o arquivo principal, -wal e -shm que restarem são do banco removido
+            for sufixo in ('-wal', '-shm'):
+                try:
+                    os.remove(caminho + sufixo)
+                except FileNotFoundError:
+                    pass
+        with closing(sqlite3.connect(caminho, timeout=30)) as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(esquema)
+        _BANCOS_INICIALIZADOS.add(chave)
+
+
+@contextmanager
+def conectar(caminho, esquema):
+    """Conexão fechada ao sair do bloco; o bloco é uma transação (commit ou rollback)"""
+    inicializar_banco(caminho, esquema)
+    with closing(sqlite3.connect(caminho, timeout=30)) as conexao:
+        with conexao:
+            yield conexao
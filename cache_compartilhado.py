@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Cache Compartilhado com Single-Flight
+Cache de processo (compartilhado por todas as sessões do servidor) para
+históricos buscados e resultados calculados. Para cada chave, apenas uma
+busca/cálculo fica em andamento; chamadas concorrentes aguardam e recebem
+o mesmo resultado. Opcionalmente, um diretório local estende o cache entre
+processos, com trava de arquivo por chave. Os valores são congelados ao entrar
+(arrays numpy somente leitura) e cada leitura recebe seus próprios contêineres
+e DataFrames, de modo que uma sessão não altera o que as outras leem.
+"""
+
+import os
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict, Counter
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem exclusão entre processos
+    fcntl = None
+
+TTL_PADRAO = 300.0
+
+# Com copy-on-write (padrão a partir do pandas 3) a cópia rasa já isola quem lê
+_COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3
+
+
+def _congelar(valor):
+    """Torna somente leitura os arrays numpy do valor (também dentro de dicionários, listas e tuplas)"""
+    if isinstance(valor, np.ndarray):
+        valor.flags.writeable = False
+    elif isinstance(valor, dict):
+        for item in valor.values():
+            _congelar(item)
+    elif isinstance(valor, (list, tuple)):
+        for item in valor:
+            _congelar(item)
+    return valor
+
+
+def _copia_leitura(valor):
+    """
+    Cópia do valor em cache entregue a cada leitura: novos dicionários, listas e tuplas e
+    DataFrames/Series próprios (rasos com copy-on-write); arrays congelados são compartilhados
+    """
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy(deep=not _COPY_ON_WRITE)
+    if isinstance(valor, dict):
+        return {chave: _copia_leitura(item) for chave, item in valor.items()}
+    if isinstance(valor, list):
+        return [_copia_leitura(item) for item in valor]
+    if isinstance(valor, tuple):
+        itens = [_copia_leitura(item) for item in valor]
+        return type(valor)(*itens) if hasattr(valor, '_fields') else tuple(itens)
+    if isinstance(valor, set):
+        return set(valor)
+    return valor
+
+
+class _Voo:
+    """Cálculo em andamento de uma chave, aguardado pelas chamadas concorrentes"""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.erro = None
+
+
+class CacheCompartilhado:
+    """
+    Cache LRU com TTL e single-flight por chave
+    Os valores são congelados ao entrar e cada leitura recebe uma cópia (ver _copia_leitura)
+    """
+
+    def __init__(self, ttl=TTL_PADRAO, max_itens=512, diretorio=None):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.diretorio = diretorio
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self._itens = OrderedDict()  # chave -> (expira_em, valor)
+        self._em_voo = {}
+        self._trava = threading.Lock()
+        self._contadores = Counter()
+        self._tempo_calculo = 0.0
+
+    # --- LEITURA ---
+
+    def obter(self, chave, calcular, ttl=None):
+        """
+        Retorna o valor em cache da chave ou executa `calcular()` uma única vez,
+        mesmo com chamadas concorrentes. Erros são repassados a todos os que aguardavam
+        e não são armazenados; resultados None também não. Cada chamada recebe sua
+        própria cópia do valor.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None and item[0] > time.monotonic():
+                self._itens.move_to_end(chave)
+                self._contadores['acertos'] += 1
+                return _copia_leitura(item[1])
+            voo = self._em_voo.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._em_voo[chave] = _Voo()
+                self._contadores['falhas'] += 1
+            else:
+                self._contadores['esperas'] += 1
+
+        if not lider:
+            voo.evento.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return _copia_leitura(voo.valor)
+
+        try:
+            voo.valor = _congelar(self._calcular(chave, calcular, ttl))
+        except BaseException as e:
+            voo.erro = e
+            with self._trava:
+                self._contadores['erros'] += 1
+            raise
+        finally:
+            with self._trava:
+                if voo.erro is None and voo.valor is not None:
+                    self._armazenar(chave, voo.valor, ttl)
+                del self._em_voo[chave]
+            voo.evento.set()
+        return _copia_leitura(voo.valor)
+
+    def _armazenar(self, chave, valor, ttl):
+        self._itens[chave] = (time.monotonic() + ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+
+    def _calcular(self, chave, calcular, ttl):
+        if not self.diretorio:
+            return self._executar(calcular)
+
+        # Entre processos: a trava da chave garante um único cálculo; os demais leem o arquivo
+        caminho = os.path.join(self.diretorio, hashlib.sha1(repr(chave).encode()).hexdigest())
+        with _TravaChave(caminho + '.lock'):
+            try:
+                if time.time() - os.path.getmtime(caminho + '.pkl') < ttl:
+                    with open(caminho + '.pkl', 'rb') as arquivo:
+                        valor = pickle.load(arquivo)
+                    with self._trava:
+                        self._contadores['acertos_disco'] += 1
+                    return valor
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+
+            valor = self._executar(calcular)
+            if valor is not None:
+                temporario = f"{caminho}.{os.getpid()}.tmp"
+                with open(temporario, 'wb') as arquivo:
+                    pickle.dump(valor, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporario, caminho + '.pkl')
+            return valor
+
+    def _executar(self, calcular):
+        inicio = time.perf_counter()
+        try:
+            return calcular()
+        finally:
+            with self._trava:
+                self._contadores['calculos'] += 1
+                self._tempo_calculo += time.perf_counter() - inicio
+
+    # --- MANUTENÇÃO E MÉTRICAS ---
+
+    def invalidar(self, chave=None):
+        """
+        Remove uma chave (ou todas) do cache em memória e do diretório compartilhado
+        Os arquivos de trava são mantidos (outro processo pode estar aguardando no mesmo
+        inode); cada .pkl é removido com a trava da chave, após um cálculo em andamento
+        """
+        with self._trava:
+            chaves = list(self._itens) if chave is None else [chave]
+            for c in chaves:
+                self._itens.pop(c, None)
+        if self.diretorio:
+            nomes = os.listdir(self.diretorio) if chave is None else [
+                hashlib.sha1(repr(chave).encode()).hexdigest() + '.pkl'
+            ]
+            for nome in nomes:
+                if nome.endswith('.pkl'):
+                    caminho = os.path.join(self.diretorio, nome[:-len('.pkl')])
+                    with _TravaChave(caminho + '.lock'):
+                        try:
+                            os.remove(caminho + '.pkl')
+                        except FileNotFoundError:
+                            pass
+
+    def metricas(self):
+        """Acertos, falhas (misses), esperas em cálculos em andamento, erros e tempo de cálculo"""
+        with self._trava:
+            contadores = dict(self._contadores)
+            itens, em_voo, tempo = len(self._itens), len(self._em_voo), self._tempo_calculo
+        acertos = contadores.get('acertos', 0) + contadores.get('esperas', 0)
+        total = acertos + contadores.get('falhas', 0)
+        return {
+            'acertos': contadores.get('acertos', 0),
+            'falhas': contadores.get('falhas', 0),
+            'esperas': contadores.get('esperas', 0),
+            'acertos_disco': contadores.get('acertos_disco', 0),
+            'erros': contadores.get('erros', 0),
+            'calculos': contadores.get('calculos', 0),
+            'tempo_calculo': tempo,
+            'taxa_acerto': acertos / total if total else None,
+            'itens': itens,
+            'em_andamento': em_voo
+        }
+
+
+class _TravaChave:
+    """Trava exclusiva entre processos para uma chave (no-op sem fcntl)"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._arquivo = open(self.caminho, 'a')
+            fcntl.flock(self._arquivo, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        if self._arquivo is not None:
+            fcntl.flock(self._arquivo, fcntl.LOCK_UN)
+            self._arquivo.close()
+
+
+# Cache padrão do processo; SIMULADOR_DIRETORIO_CACHE o estende entre processos
+_CACHE_PADRAO = None
+_TRAVA_PADRAO = threading.Lock()
+
+
+def obter_cache_padrao():
+    """Retorna o cache compartilhado do processo (criado na primeira chamada)"""
+    global _CACHE_PADRAO
+    with _TRAVA_PADRAO:
+        if _CACHE_PADRAO is None:
+            _CACHE_PADRAO = CacheCompartilhado(diretorio=os.environ.get('SIMULADOR_DIRETORIO_CACHE'))
+        return _CACHE_PADRAO
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Cliente de Dados de Mercado
+Encapsula o acesso ao provedor (Yahoo Finance) com limitação de taxa,
+novas tentativas com backoff exponencial e disjuntor (circuit breaker)
+"""
+
+import os
+import time
+import random
+import threading
+import yfinance as yf
+
+try:
+    import fcntl
+except ImportError:  # Windows: limitação apenas entre threads do mesmo processo
+    fcntl = None
+
+
+# --- ERROS TIPADOS ---
+
+class ErroDados(Exception):
+    """Erro base ao obter dados de mercado"""
+
+    mensagem_usuario = "Falha ao obter dados de mercado."
+
+    def __init__(self, mensagem, symbol=None, provedor=None):
+        super().__init__(mensagem)
+        self.symbol = symbol
+        self.provedor = provedor
+
+
+class ErroSemDados(ErroDados):
+    """O provedor respondeu, mas não há histórico para o símbolo (símbolo inválido ou sem negociação)"""
+
+    mensagem_usuario = "Nenhum dado encontrado. Verifique se o símbolo está correto."
+
+
+class ErroLimiteTaxa(ErroDados):
+    """O provedor recusou as requisições por excesso de chamadas (throttling)"""
+
+    mensagem_usuario = "O provedor de dados está limitando as requisições. Aguarde alguns instantes."
+
+
+class ErroCircuitoAberto(ErroDados):
+    """O disjuntor do provedor está aberto após falhas consecutivas"""
+
+    mensagem_usuario = "Provedor de dados temporariamente indisponível. Tente novamente em instantes."
+
+    def __init__(self, mensagem, symbol=None, provedor=None, reabre_em=None):
+        super().__init__(mensagem, symbol, provedor)
+        self.reabre_em = reabre_em
+
+
+class ErroProvedor(ErroDados):
+    """Falha do provedor: erro não transitório ou transitório que persistiu após todas as tentativas"""
+
+    mensagem_usuario = "Erro de comunicação com o provedor de dados."
+
+
+# --- LIMITADOR DE TAXA (TOKEN BUCKET) ---
+
+class LimitadorTaxa:
+    """
+    Token bucket compartilhado entre threads e, opcionalmente, entre processos.
+    Com `arquivo_estado`, o estado do balde fica em um arquivo protegido por
+    flock, de modo que todos os processos que usam o mesmo arquivo dividem a cota.
+    """
+
+    def __init__(self, taxa=2.0, capacidade=5, arquivo_estado=None):
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade)
+        self.arquivo_estado = arquivo_estado if fcntl is not None else None
+        self._trava = threading.Lock()
+        self._tokens = self.capacidade
+        self._ultimo = time.monotonic()
+
+    def _reabastecer(self, tokens, ultimo, agora):
+        return min(self.capacidade, tokens + (agora - ultimo) * self.taxa)
+
+    def _tentar_consumir(self, quantidade):
+        """Consome tokens se disponíveis; retorna o tempo de espera necessário (0 = consumido)"""
+        if self.arquivo_estado is None:
+            agora = time.monotonic()
+            self._tokens = self._reabastecer(self._tokens, self._ultimo, agora)
+            self._ultimo = agora
+            if self._tokens >= quantidade:
+                self._tokens -= quantidade
+                return 0.0
+            return (quantidade - self._tokens) / self.taxa
+
+        # Relógio de parede: precisa ser comparável entre processos
+        with open(self.arquivo_estado, 'a+') as arquivo:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+            try:
+                arquivo.seek(0)
+                conteudo = arquivo.read().split()
+                agora = time.time()
+                if len(conteudo) == 2:
+                    tokens = self._reabastecer(float(conteudo[0]), float(conteudo[1]), agora)
+                else:
+                    tokens = self.capacidade
+                espera = 0.0
+                if tokens >= quantidade:
+                    tokens -= quantidade
+                else:
+                    espera = (quantidade - tokens) / self.taxa
+                arquivo.seek(0)
+                arquivo.truncate()
+                arquivo.write(f"{tokens} {agora}")
+                arquivo.flush()
+                return espera
+            finally:
+                fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+    def adquirir(self, quantidade=1, timeout=None):
+        """Bloqueia até obter `quantidade` tokens. Retorna False se o timeout expirar"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._trava:
+                espera = self._tentar_consumir(quantidade)
+            if espera == 0:
+                return True
+            if limite is not None and time.monotonic() + espera > limite:
+                return False
+            time.sleep(espera)
+
+
+# --- DISJUNTOR (CIRCUIT BREAKER) ---
+
+class DisjuntorCircuito:
+    """
+    Disjuntor por provedor
+    fechado: requisições passam normalmente
+    aberto: requisições falham imediatamente até `tempo_recuperacao` expirar
+    meio_aberto: uma requisição de teste decide se o circuito fecha ou reabre
+    """
+
+    FECHADO, ABERTO, MEIO_ABERTO = 'fechado', 'aberto', 'meio_aberto'
+
+    def __init__(self, limiar_falhas=5, tempo_recuperacao=30.0):
+        self.limiar_falhas = limiar_falhas
+        self.tempo_recuperacao = tempo_recuperacao
+        self._trava = threading.Lock()
+        self._estado = self.FECHADO
+        self._falhas = 0
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+
+    @property
+    def estado(self):
+        with self._trava:
+            if self._estado == self.ABERTO and time.monotonic() - self._aberto_em >= self.tempo_recuperacao:
+                return self.MEIO_ABERTO
+            return self._estado
+
+    def permitir(self):
+        """Retorna (permitido, segundos_ate_reabrir)"""
+        with self._trava:
+            if self._estado == self.FECHADO:
+                return True, 0.0
+            restante = self.tempo_recuperacao - (time.monotonic() - self._aberto_em)
+            if self._estado == self.ABERTO and restante > 0:
+                return False, restante
+            # Meio aberto: apenas uma requisição de teste por vez
+            if self._teste_em_andamento:
+                return False, max(restante, 0.0)
+            self._estado = self.MEIO_ABERTO
+            self._teste_em_andamento = True
+            return True, 0.0
+
+    def registrar_sucesso(self):
+        with self._trava:
+            self._estado = self.FECHADO
+            self._falhas = 0
+            self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        with self._trava:
+            self._falhas += 1
+            self._teste_em_andamento = False
+            if self._estado == self.MEIO_ABERTO or self._falhas >= self.limiar_falhas:
+                self._estado = self.ABERTO
+                self._aberto_em = time.monotonic()
+
+    def liberar(self):
+        """Encerra a requisição sem alterar o estado (erro que não indica falha do provedor)"""
+        with self._trava:
+            self._teste_em_andamento = False
+
+
+# Limitadores e disjuntores são compartilhados por provedor dentro do processo
+_LIMITADORES = {}
+_DISJUNTORES = {}
+_TRAVA_REGISTRO = threading.Lock()
+
+
+def obter_limitador(provedor, **kwargs):
+    """Retorna o limitador de taxa compartilhado do provedor (criado na primeira chamada)"""
+    with _TRAVA_REGISTRO:
+        if provedor not in _LIMITADORES:
+            _LIMITADORES[provedor] = LimitadorTaxa(**kwargs)
+        return _LIMITADORES[provedor]
+
+
+def obter_disjuntor(provedor, **kwargs):
+    """Retorna o disjuntor compartilhado do provedor (criado na primeira chamada)"""
+    with _TRAVA_REGISTRO:
+        if provedor not in _DISJUNTORES:
+            _DISJUNTORES[provedor] = DisjuntorCircuito(**kwargs)
+        return _DISJUNTORES[provedor]
+
+
+# --- CLASSIFICAÇÃO DE ERROS ---
+
+# Erros do yfinance que indicam símbolo inexistente ou sem cotações
+ERROS_SIMBOLO = ('YFTickerMissingError', 'YFPricesMissingError', 'YFTzMissingError')
+
+
+def erro_transitorio(erro, provedor=None):
+    """
+    Indica se vale repetir a requisição: rede, timeout, limite de taxa ou erro HTTP 5xx
+    Erros determinísticos (ValueError, KeyError, TypeError, símbolo desconhecido) falhariam de novo
+    """
+    eh_limite_taxa = getattr(provedor, 'eh_limite_taxa', None)
+    if eh_limite_taxa is not None and eh_limite_taxa(erro):
+        return True
+    if type(erro).__name__ in ERROS_SIMBOLO or isinstance(erro, (ValueError, KeyError, TypeError)):
+        return False
+    # Erros HTTP com resposta: só 429 e 5xx são transitórios (404 etc. se repetiriam)
+    status = getattr(getattr(erro, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    # requests/urllib levantam subclasses de OSError (ConnectionError, TimeoutError, ...)
+    if isinstance(erro, OSError):
+        return True
+    nome = type(erro).__name__.lower()
+    return 'timeout' in nome or 'connection' in nome
+
+
+# --- PROVEDORES ---
+
+class ProvedorYFinance:
+    """Provedor de histórico via Yahoo Finance"""
+
+    nome = 'yfinance'
+
+    def buscar(self, symbol, periodo='1y', interval='1d'):
+        ticker = yf.Ticker(symbol)
+        return ticker.history(period=periodo, interval=interval)
+
+    def buscar_fundamentos(self, symbol):
+        """Dicionário `info` do Yahoo Finance (uma requisição pesada por símbolo)"""
+        return yf.Ticker(symbol).info
+
+    @staticmethod
+    def eh_limite_taxa(erro):
+        """Identifica respostas de throttling do Yahoo Finance"""
+        if type(erro).__name__ == 'YFRateLimitError':
+            return True
+        texto = str(erro).lower()
+        return '429' in texto or 'too many requests' in texto or 'rate limit' in texto
+
+
+def provedor_padrao():
+    """Yahoo Finance, ou dados sintéticos (testes de carga sem rede) com SIMULADOR_PROVEDOR=sintetico"""
+    if os.environ.get('SIMULADOR_PROVEDOR') == 'sintetico':
+        from dados_sinteticos import ProvedorSintetico
+        return ProvedorSintetico()
+    return ProvedorYFinance()
+
+
+# --- CLIENTE ---
+
+class ClienteDados:
+    """Cliente de dados com limitação de taxa, backoff exponencial com jitter e disjuntor"""
+
+    def __init__(self, provedor=None, limitador=None, disjuntor=None,
+                 max_tentativas=4, atraso_base=0.5, atraso_maximo=8.0):
+        self.provedor = provedor or provedor_padrao()
+        nome = self.provedor.nome
+        self.limitador = limitador or obter_limitador(
+            nome, arquivo_estado=os.environ.get('SIMULADOR_ARQUIVO_LIMITE_TAXA')
+        )
+        self.disjuntor = disjuntor or obter_disjuntor(nome)
+        self.max_tentativas = max_tentativas
+        self.atraso_base = atraso_base
+        self.atraso_maximo = atraso_maximo
+
+    def _atraso(self, tentativa):
+        """Backoff exponencial com jitter completo"""
+        return random.uniform(0, min(self.atraso_maximo, self.atraso_base * (2 ** tentativa)))
+
+    def buscar_historico(self, symbol, periodo='1y', interval='1d'):
+        """
+        Busca o histórico OHLCV com colunas em minúsculas
+        Só erros transitórios são repetidos e contam no disjuntor; os demais são levantados na hora
+        Levanta ErroSemDados, ErroLimiteTaxa, ErroCircuitoAberto ou ErroProvedor
+        """
+        nome = self.provedor.nome
+        eh_limite_taxa = getattr(self.provedor, 'eh_limite_taxa', lambda erro: False)
+        ultimo_erro = None
+
+        for tentativa in range(self.max_tentativas):
+            permitido, reabre_em = self.disjuntor.permitir()
+            if not permitido:
+                raise ErroCircuitoAberto(
+                    f"Circuito do provedor '{nome}' aberto; nova tentativa em {reabre_em:.0f}s",
+                    symbol, nome, reabre_em
+                )
+
+            self.limitador.adquirir()
+            try:
+                df = self.provedor.buscar(symbol, periodo, interval)
+            except Exception as e:
+                if not erro_transitorio(e, self.provedor):
+                    self.disjuntor.liberar()
+                    tipo_erro = ErroSemDados if type(e).__name__ in ERROS_SIMBOLO else ErroProvedor
+                    raise tipo_erro(f"Erro ao buscar dados para {symbol}: {e}", symbol, nome) from e
+                self.disjuntor.registrar_falha()
+                ultimo_erro = e
+                if tentativa + 1 < self.max_tentativas:
+                    time.sleep(self._atraso(tentativa))
+                continue
+
+            # Resposta válida do provedor, mesmo que vazia
+            self.disjuntor.registrar_sucesso()
+            if df is None or df.empty:
+                raise ErroSemDados(f"Nenhum dado retornado para {symbol}", symbol, nome)
+
+            # Padronizar nomes das colunas
+            df.columns = [col.lower() for col in df.columns]
+            return df
+
+        if eh_limite_taxa(ultimo_erro):
+            raise ErroLimiteTaxa(
+                f"Limite de requisições atingido para {symbol} após {self.max_tentativas} tentativas",
+                symbol, nome
+            ) from ultimo_erro
+        raise ErroProvedor(
+            f"Erro ao buscar dados para {symbol}: {ultimo_erro}", symbol, nome
+        ) from ultimo_erro
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Gerador de Universo OHLCV Sintético
+Produz históricos diários realistas para quantos símbolos forem necessários,
+sem acesso à rede: GBM com saltos, volatilidade em clusters (GARCH(1,1)),
+gaps de abertura, dias sem volume e suspensões de negociação.
+A geração é vetorizada entre os símbolos de um lote, reprodutível por
+símbolo (mesma semente -> mesmo histórico, em qualquer lote) e pode ser
+consumida em lotes para universos grandes (ex.: 10 mil símbolos x 20 anos).
+"""
+
+import time
+import random
+import zlib
+import numpy as np
+import pandas as pd
+
+PREGOES_ANO = 252
+
+SETORES_SINTETICOS = ('Financial Services', 'Energy', 'Basic Materials', 'Utilities', 'Technology',
+                      'Consumer Defensive', 'Industrials', 'Healthcare')
+
+
+def simbolos_sinteticos(quantidade, prefixo='SIM', fracao_b3=0.5):
+    """Símbolos fictícios; uma fração recebe o sufixo .SA (fuso e moeda da B3)"""
+    corte = int(round(quantidade * fracao_b3))
+    return [f"{prefixo}{i:05d}" + ('.SA' if i < corte else '') for i in range(quantidade)]
+
+
+def fuso_do_simbolo(symbol):
+    return 'America/Sao_Paulo' if symbol.upper().endswith('.SA') else 'America/New_York'
+
+
+class GeradorOHLCV:
+    """
+    Gerador vetorizado de OHLCV diário
+    Parâmetros anuais são convertidos para o pregão; probabilidades são por pregão
+    """
+
+    # Componentes aleatórios sorteados por símbolo, sempre na mesma ordem
+    _NORMAIS = 7    # choque noturno, choque do pregão, salto, gap, máxima, mínima, volume
+    _UNIFORMES = 4  # ocorrência de salto, gap, dia sem volume, suspensão
+
+    def __init__(self, anos=20, fim=None, semente=0, deriva_anual=0.07, vol_anual=0.30,
+                 garch_alfa=0.08, garch_beta=0.90, fracao_noturna=0.2,
+                 prob_salto=0.01, media_salto=-0.02, vol_salto=0.06,
+                 prob_gap=0.03, vol_gap=0.03, prob_volume_zero=0.003,
+                 prob_suspensao=0.0005, duracao_suspensao=3, volume_base=1e6):
+        if garch_alfa + garch_beta >= 1:
+            raise ValueError("garch_alfa + garch_beta deve ser menor que 1 (variância estacionária)")
+        self.n_barras = int(anos * PREGOES_ANO)
+        # Data final fixa: o mesmo símbolo gera o mesmo calendário em qualquer chamada
+        self.fim = pd.Timestamp(fim or pd.Timestamp.today()).normalize()
+        self.semente = semente
+        self.deriva = deriva_anual / PREGOES_ANO
+        self.variancia = vol_anual ** 2 / PREGOES_ANO
+        self.garch_alfa = garch_alfa
+        self.garch_beta = garch_beta
+        self.fracao_noturna = fracao_noturna
+        self.prob_salto = prob_salto
+        self.media_salto = media_salto
+        self.vol_salto = vol_salto
+        self.prob_gap = prob_gap
+        self.vol_gap = vol_gap
+        self.prob_volume_zero = prob_volume_zero
+        self.prob_suspensao = prob_suspensao
+        self.duracao_suspensao = duracao_suspensao
+        self.volume_base = volume_base
+        self._calendarios = {}
+
+    # --- SORTEIOS ---
+
+    def _sorteios(self, simbolos):
+        """Normais (m, k, n), uniformes (m, k, n) e nível/volume iniciais (m, 2) de cada símbolo"""
+        n = self.n_barras
+        normais = np.empty((len(simbolos), self._NORMAIS, n))
+        uniformes = np.empty((len(simbolos), self._UNIFORMES, n))
+        iniciais = np.empty((len(simbolos), 2))
+        for i, symbol in enumerate(simbolos):
+            rng = np.random.default_rng([self.semente, zlib.crc32(symbol.encode())])
+            normais[i] = rng.standard_normal((self._NORMAIS, n))
+            uniformes[i] = rng.random((self._UNIFORMES, n))
+            iniciais[i] = rng.normal(size=2)
+        return normais, uniformes, iniciais
+
+    def calendario(self, symbol):
+        """Dias úteis que terminam em `fim`, à meia-noite no fuso da bolsa (como o yfinance)"""
+        fuso = fuso_do_simbolo(symbol)
+        if fuso not in self._calendarios:
+            indice = pd.bdate_range(end=self.fim, periods=self.n_barras)
+            self._calendarios[fuso] = indice.tz_localize(fuso).rename('Date')
+        return self._calendarios[fuso]
+
+    # --- GERAÇÃO ---
+
+    def _variancias(self, choques, saltos, suspensao_inicio):
+        """
+        Recursão GARCH(1,1) e estado de suspensão: único laço, sobre as barras,
+        com todos os símbolos do lote processados juntos
+        """
+        m, n = choques.shape
+        omega = self.variancia * (1 - self.garch_alfa - self.garch_beta)
+        h = np.empty((m, n))
+        suspenso = np.zeros((m, n), dtype=bool)
+        h_anterior = np.full(m, self.variancia)
+        eps_anterior = np.zeros(m)
+        suspenso_anterior = np.zeros(m, dtype=bool)
+        # Duração geométrica com média `duracao_suspensao`
+        prob_fim = 1 / max(self.duracao_suspensao, 1)
+        for t in range(n):
+            h_anterior = omega + self.garch_alfa * eps_anterior ** 2 + self.garch_beta * h_anterior
+            h[:, t] = h_anterior
+            eps_anterior = np.sqrt(h_anterior) * choques[:, t] + saltos[:, t]
+            suspenso_anterior = np.where(suspenso_anterior, suspensao_inicio[:, t] >= prob_fim,
+                                         suspensao_inicio[:, t] < self.prob_suspensao)
+            suspenso[:, t] = suspenso_anterior
+        return h, suspenso
+
+    def gerar_matrizes(self, simbolos):
+        """Matrizes (símbolos x barras) de open, high, low, close, volume e a máscara de suspensão"""
+        normais, uniformes, iniciais = self._sorteios(simbolos)
+        z_noite, z_dia, z_salto, z_gap, z_maxima, z_minima, z_volume = (normais[:, i] for i in range(self._NORMAIS))
+        u_salto, u_gap, u_zero, u_suspensao = (uniformes[:, i] for i in range(self._UNIFORMES))
+
+        f = self.fracao_noturna
+        choques = np.sqrt(f) * z_noite + np.sqrt(1 - f) * z_dia
+        saltos = np.where(u_salto < self.prob_salto, self.media_salto + self.vol_salto * z_salto, 0.0)
+        gaps = np.where(u_gap < self.prob_gap, self.vol_gap * z_gap, 0.0)
+        h, suspenso = self._variancias(choques, saltos + gaps, u_suspensao)
+        sigma = np.sqrt(h)
+
+        # Retorno = noite (choque + gap) + pregão (deriva + choque + salto)
+        sem_volume = u_zero < self.prob_volume_zero
+        r_noite = np.where(sem_volume, 0.0, sigma * np.sqrt(f) * z_noite + gaps)
+        r_dia = np.where(sem_volume, 0.0, self.deriva - h / 2 + sigma * np.sqrt(1 - f) * z_dia + saltos)
+
+        nivel_inicial = np.exp(np.log(50) + 0.8 * iniciais[:, :1])  # preços iniciais ~ log-normal em torno de 50
+        log_close = np.log(nivel_inicial) + np.cumsum(r_noite + r_dia, axis=1)
+        log_close_anterior = np.concatenate([np.log(nivel_inicial), log_close[:, :-1]], axis=1)
+        close = np.exp(log_close)
+        open_ = np.exp(log_close_anterior + r_noite)
+
+        # Amplitude do pregão proporcional à volatilidade condicional (sempre >= 0)
+        escala = np.where(sem_volume, 0.0, sigma * np.sqrt(1 - f) * 0.8)
+        high = np.maximum(open_, close) * np.exp(np.abs(z_maxima) * escala)
+        low = np.minimum(open_, close) * np.exp(-np.abs(z_minima) * escala)
+
+        # Volume: nível por símbolo, ruído log-normal e mais negociação em dias de choque
+        volume_simbolo = self.volume_base * np.exp(iniciais[:, 1:])
+        surpresa = np.abs(r_noite + r_dia) / sigma
+        volume = np.round(volume_simbolo * np.exp(0.4 * z_volume) * (1 + 0.5 * surpresa))
+        volume[sem_volume] = 0.0
+        return {'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume, 'suspenso': suspenso}
+
+    def gerar(self, simbolos):
+        """
+        {symbol: DataFrame} no formato do provedor (colunas Open, High, Low, Close,
+        Volume, Dividends, Stock Splits; índice diário com fuso). Pregões suspensos
+        não aparecem no histórico; o preço segue evoluindo e reabre com gap.
+        """
+        matrizes = self.gerar_matrizes(simbolos)
+        historicos = {}
+        for i, symbol in enumerate(simbolos):
+            negociado = ~matrizes['suspenso'][i]
+            df = pd.DataFrame({
+                'Open': matrizes['open'][i, negociado],
+                'High': matrizes['high'][i, negociado],
+                'Low': matrizes['low'][i, negociado],
+                'Close': matrizes['close'][i, negociado],
+                'Volume': matrizes['volume'][i, negociado],
+                'Dividends': 0.0,
+                'Stock Splits': 0.0
+            }, index=self.calendario(symbol)[negociado])
+            historicos[symbol] = df
+        return historicos
+
+    def gerar_lotes(self, simbolos, tamanho_lote=128):
+        """Gera o universo em lotes ({symbol: DataFrame} por lote) sem manter tudo em memória"""
+        simbolos = list(simbolos)
+        for inicio in range(0, len(simbolos), tamanho_lote):
+            yield self.gerar(simbolos[inicio:inicio + tamanho_lote])
+
+
+class ProvedorSintetico:
+    """
+    Provedor compatível com ClienteDados que responde com dados sintéticos
+    `latencia` (segundos) e `prob_falha` simulam a rede para testes de carga
+    """
+
+    nome = 'sintetico'
+
+    def __init__(self, gerador=None, latencia=0.0, prob_falha=0.0):
+        self.gerador = gerador or GeradorOHLCV()
+        self.latencia = latencia
+        self.prob_falha = prob_falha
+
+    def buscar(self, symbol, periodo='1y', interval='1d'):
+        from analise_preditiva import AnalisePreditiva
+
+        if interval != '1d':
+            raise ValueError(f"O provedor sintético gera apenas barras diárias (interval='{interval}')")
+        if self.latencia:
+            time.sleep(self.latencia)
+        if self.prob_falha and random.random() < self.prob_falha:
+            raise ConnectionError(f"Falha simulada ao buscar {symbol}")
+        df = self.gerador.gerar([symbol])[symbol]
+        return AnalisePreditiva.recortar_periodo(df, periodo)
+
+    def buscar_fundamentos(self, symbol):
+        """Fundamentos fictícios (reprodutíveis por símbolo) com as chaves do `info` do Yahoo Finance"""
+        if self.latencia:
+            time.sleep(self.latencia)
+        if self.prob_falha and random.random() < self.prob_falha:
+            raise ConnectionError(f"Falha simulada ao buscar fundamentos de {symbol}")
+        rng = np.random.default_rng([self.gerador.semente, zlib.crc32(symbol.encode()), 1])
+        return {
+            'trailingPE': float(rng.lognormal(2.7, 0.5)) if rng.random() > 0.1 else float(-rng.lognormal(2.5, 0.5)),
+            'priceToBook': float(rng.lognormal(0.7, 0.6)),
+            'trailingAnnualDividendYield': float(rng.gamma(1.5, 0.02)) if rng.random() > 0.2 else 0.0,
+            'marketCap': float(rng.lognormal(23, 1.5)),
+            'sector': SETORES_SINTETICOS[int(rng.integers(len(SETORES_SINTETICOS)))],
+            'currency': 'BRL' if symbol.upper().endswith('.SA') else 'USD'
+        }
+
+
+def exemplo_dados_sinteticos():
+    """Exemplo: 2 mil símbolos x 20 anos gerados em lotes, com checagem de OHLC"""
+    gerador = GeradorOHLCV(anos=20, semente=42)
+    simbolos = simbolos_sinteticos(2000)
+
+    inicio = time.perf_counter()
+    barras, invalidas = 0, 0
+    for lote in gerador.gerar_lotes(simbolos, tamanho_lote=256):
+        for df in lote.values():
+            barras += len(df)
+            invalidas += int(((df['High'] < df[['Open', 'Close']].max(axis=1)) |
+                              (df['Low'] > df[['Open', 'Close']].min(axis=1))).sum())
+    print(f"{len(simbolos)} símbolos, {barras:,} barras em {time.perf_counter() - inicio:.1f}s "
+          f"({invalidas} barras OHLC inválidas)")
+
+    # Plugado no cliente, como se fosse o Yahoo Finance
+    from analise_preditiva import AnalisePreditiva
+    from cliente_dados import ClienteDados
+
+    analisador = AnalisePreditiva(cliente=ClienteDados(provedor=ProvedorSintetico(gerador)))
+    resultado = analisador.gerar_recomendacao(simbolos[0], periodo='1y')
+    print(f"{simbolos[0]}: {resultado['recomendacao']} (score {resultado['score_consolidado']:.2f})")
+
+
+if __name__ == "__main__":
+    exemplo_dados_sinteticos()
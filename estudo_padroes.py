@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Estudo de Padrões de Candlestick
+Mede se os padrões de `SistemaRecomendacoes.identificar_padroes_candlestick`
+antecipam alguma coisa nos nossos ativos: detecta os padrões em todo o
+histórico de todo o universo (pool de processos) e resume a distribuição
+dos retornos futuros de 1, 5 e 20 pregões após cada ocorrência, por símbolo,
+por categoria e no universo, comparada à de todos os pregões (a "vantagem"
+do padrão). O resultado fica em cache em disco para a visão de recomendações.
+"""
+
+import os
+import pickle
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from universo import simbolos_por_categoria, carregar_historicos
+
+CAMINHO_PADRAO = os.path.join('dados', 'estudo_padroes.pkl')
+
+HORIZONTES = (1, 5, 20)
+
+# Ocorrências mínimas para usar a estatística do próprio símbolo (senão, categoria ou universo)
+MIN_OCORRENCIAS = 20
+
+# Sistema de recomendações de cada processo do pool (criado na primeira tarefa)
+_SISTEMA = None
+
+
+def retornos_futuros(close, horizontes=HORIZONTES):
+    """Matriz (barras x horizontes) de close[t+h] / close[t] - 1; NaN onde o futuro não existe"""
+    close = np.asarray(close, dtype=float)
+    futuros = np.full((len(close), len(horizontes)), np.nan)
+    for j, h in enumerate(horizontes):
+        if h < len(close):
+            futuros[:-h, j] = close[h:] / close[:-h] - 1
+    futuros[~np.isfinite(futuros)] = np.nan
+    return futuros
+
+
+def _estudar_bloco(bloco, horizontes):
+    """
+    Eventos (símbolo, padrão, horizonte, retorno) e estatísticas-base de todos os pregões
+    (contagem, soma, soma dos quadrados e altas por horizonte) de um bloco de símbolos
+    """
+    global _SISTEMA
+    if _SISTEMA is None:
+        from sistema_recomendacoes import SistemaRecomendacoes
+        _SISTEMA = SistemaRecomendacoes()
+
+    eventos, base = [], []
+    for symbol, df in bloco:
+        padroes = _SISTEMA.identificar_padroes_candlestick(df)
+        if padroes is None:
+            continue
+        futuros = retornos_futuros(df['close'], horizontes)
+        linhas, colunas = np.nonzero(padroes.fillna(False).to_numpy(dtype=bool))
+
+        # Formato longo: uma linha por ocorrência e horizonte
+        retornos = futuros[linhas].ravel()
+        validos = ~np.isnan(retornos)
+        eventos.append(pd.DataFrame({
+            'symbol': symbol,
+            'padrao': np.asarray(padroes.columns)[np.repeat(colunas, len(horizontes))][validos],
+            'horizonte': np.tile(horizontes, len(linhas))[validos],
+            'retorno': retornos[validos]
+        }))
+
+        validos = ~np.isnan(futuros)
+        base.append(pd.DataFrame({
+            'symbol': symbol,
+            'horizonte': list(horizontes),
+            'n': validos.sum(axis=0),
+            'soma': np.nansum(futuros, axis=0),
+            'soma_quadrados': np.nansum(futuros ** 2, axis=0),
+            'altas': (futuros > 0).sum(axis=0)
+        }))
+    vazio = pd.DataFrame()
+    return (pd.concat(eventos, ignore_index=True) if eventos else vazio,
+            pd.concat(base, ignore_index=True) if base else vazio)
+
+
+def _agregar(eventos, base, chave, nivel):
+    """Distribuição dos retornos por (chave, padrão, horizonte) comparada à base da mesma chave"""
+    grupos = eventos.assign(alta=eventos['retorno'] > 0).groupby([chave, 'padrao', 'horizonte'], observed=True)
+    resumo = grupos.agg(
+        ocorrencias=('retorno', 'size'),
+        retorno_medio=('retorno', 'mean'),
+        desvio=('retorno', 'std'),
+        taxa_alta=('alta', 'mean')
+    )
+    quantis = grupos['retorno'].quantile([0.1, 0.5, 0.9]).unstack()
+    quantis.columns = ['p10', 'mediana', 'p90']
+    resumo = resumo.join(quantis)
+
+    totais = base.groupby([chave, 'horizonte'], observed=True)[['n', 'soma', 'altas']].sum()
+    referencia = pd.DataFrame({
+        'retorno_medio_base': totais['soma'] / totais['n'],
+        'taxa_alta_base': totais['altas'] / totais['n']
+    })
+    resumo = resumo.join(referencia, on=[chave, 'horizonte'])
+    resumo['vantagem'] = resumo['retorno_medio'] - resumo['retorno_medio_base']
+    resumo['vantagem_taxa_alta'] = resumo['taxa_alta'] - resumo['taxa_alta_base']
+    resumo = resumo.reset_index().rename(columns={chave: 'grupo'})
+    resumo.insert(0, 'nivel', nivel)
+    return resumo
+
+
+class EstudoPadroes:
+    """Estudo dos retornos futuros condicionados aos padrões de candlestick, com cache em disco"""
+
+    def __init__(self, horizontes=HORIZONTES, periodo='max', max_workers=None, tamanho_bloco=16,
+                 caminho=CAMINHO_PADRAO, validade=timedelta(days=7)):
+        self.horizontes = tuple(horizontes)
+        self.periodo = periodo
+        self.max_workers = max_workers
+        self.tamanho_bloco = tamanho_bloco
+        self.caminho = caminho
+        self.validade = validade
+
+    def eventos(self, historicos):
+        """Detecta os padrões em todos os históricos ({symbol: df}) em paralelo"""
+        itens = [(symbol, df[['open', 'high', 'low', 'close']]) for symbol, df in historicos.items()
+                 if df is not None and len(df) > max(self.horizontes)]
+        blocos = [itens[i:i + self.tamanho_bloco] for i in range(0, len(itens), self.tamanho_bloco)]
+        if not blocos:
+            return pd.DataFrame(), pd.DataFrame()
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            partes = list(executor.map(_estudar_bloco, blocos, [self.horizontes] * len(blocos)))
+        eventos = pd.concat([p[0] for p in partes if not p[0].empty], ignore_index=True)
+        base = pd.concat([p[1] for p in partes if not p[1].empty], ignore_index=True)
+        eventos['symbol'] = eventos['symbol'].astype('category')
+        eventos['padrao'] = eventos['padrao'].astype('category')
+        return eventos, base
+
+    @staticmethod
+    def resumir(eventos, base, categorias):
+        """
+        Resumo por símbolo, categoria e universo ('todos'): ocorrências, retorno médio,
+        desvio, p10/mediana/p90, taxa de alta e a vantagem sobre a base de todos os pregões
+        `categorias`: {categoria: [símbolos]} (um símbolo pode estar em mais de uma)
+        """
+        if eventos.empty:
+            return pd.DataFrame()
+        mapa = pd.DataFrame([(s, c) for c, ativos in categorias.items() for s in dict.fromkeys(ativos)],
+                            columns=['symbol', 'categoria'])
+        eventos_categoria = eventos.astype({'symbol': str}).merge(mapa, on='symbol')
+        base_categoria = base.merge(mapa, on='symbol')
+        return pd.concat([
+            _agregar(eventos, base, 'symbol', 'simbolo'),
+            _agregar(eventos_categoria, base_categoria, 'categoria', 'categoria'),
+            _agregar(eventos.assign(universo='todos'), base.assign(universo='todos'), 'universo', 'universo')
+        ], ignore_index=True)
+
+    # --- EXECUÇÃO E CACHE ---
+
+    def executar(self, categorias=None, cliente=None):
+        """Busca o histórico completo do universo, estuda os padrões e grava o resultado"""
+        categorias = categorias if categorias is not None else simbolos_por_categoria()
+        simbolos = list(dict.fromkeys(s for ativos in categorias.values() for s in ativos))
+        historicos, falhas = carregar_historicos(simbolos, periodo=self.periodo, cliente=cliente)
+        eventos, base = self.eventos(historicos)
+        estudo = {
+            'criado_em': datetime.now().isoformat(timespec='seconds'),
+            'horizontes': self.horizontes,
+            'periodo': self.periodo,
+            'categorias': categorias,
+            'falhas': sorted(falhas),
+            'resumo': self.resumir(eventos, base, categorias)
+        }
+        self.gravar(estudo)
+        return estudo
+
+    def gravar(self, estudo):
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        temporario = f"{self.caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'wb') as arquivo:
+            pickle.dump(estudo, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, self.caminho)
+
+    def carregar(self):
+        """Estudo gravado, se existir, tiver os mesmos horizontes e estiver dentro da validade; senão None"""
+        try:
+            with open(self.caminho, 'rb') as arquivo:
+                estudo = pickle.load(arquivo)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if tuple(estudo['horizontes']) != self.horizontes:
+            return None
+        if datetime.now() - datetime.fromisoformat(estudo['criado_em']) > self.validade:
+            return None
+        return estudo
+
+    def obter(self, categorias=None, cliente=None):
+        """Estudo em cache ou, se ausente/vencido, um novo"""
+        return self.carregar() or self.executar(categorias, cliente)
+
+
+def vantagem_padroes(estudo, symbol, padroes, horizonte=None, min_ocorrencias=MIN_OCORRENCIAS):
+    """
+    Estatística histórica de cada padrão para o símbolo: a do próprio símbolo quando há
+    ocorrências suficientes, senão a da sua categoria e, por fim, a do universo
+    `padroes`: nomes das colunas de `identificar_padroes_candlestick` (ex.: 'engolfo_alta')
+    """
+    resumo = estudo['resumo'] if estudo else None
+    if resumo is None or resumo.empty:
+        return pd.DataFrame()
+    categorias = [c for c, ativos in estudo['categorias'].items() if symbol in ativos]
+    niveis = [('simbolo', [symbol]), ('categoria', categorias), ('universo', ['todos'])]
+
+    linhas = []
+    for padrao in padroes:
+        do_padrao = resumo[(resumo['padrao'] == padrao) & (resumo['ocorrencias'] >= min_ocorrencias)]
+        if horizonte is not None:
+            do_padrao = do_padrao[do_padrao['horizonte'] == horizonte]
+        for nivel, grupos in niveis:
+            escolhidas = do_padrao[(do_padrao['nivel'] == nivel) & do_padrao['grupo'].isin(grupos)]
+            if not escolhidas.empty:
+                # Com mais de uma categoria, fica a de mais ocorrências em cada horizonte
+                linhas.append(escolhidas.sort_values('ocorrencias').groupby('horizonte').tail(1))
+                break
+    if not linhas:
+        return pd.DataFrame()
+    return pd.concat(linhas).sort_values(['padrao', 'horizonte']).reset_index(drop=True)
+
+
+def exemplo_estudo_padroes():
+    """Exemplo: estudo do universo (ou o cache da última semana) e os padrões mais fortes"""
+    estudo = EstudoPadroes().obter()
+    resumo = estudo['resumo']
+    if resumo.empty:
+        print("Nenhum padrão encontrado")
+        return
+    print(f"Estudo de {estudo['criado_em']} ({len(estudo['falhas'])} símbolos sem dados)")
+    universo = resumo[resumo['nivel'] == 'universo']
+    for linha in universo.itertuples():
+        print(f"{linha.padrao:>16} {linha.horizonte:>2}d: {linha.ocorrencias:>6} ocorrências | "
+              f"retorno médio {linha.retorno_medio:+.2%} (base {linha.retorno_medio_base:+.2%}) | "
+              f"alta {linha.taxa_alta:.0%} (base {linha.taxa_alta_base:.0%})")
+
+
+if __name__ == "__main__":
+    exemplo_estudo_padroes()
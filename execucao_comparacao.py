@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Execução em Segundo Plano da Comparação de Ativos
+Envia a análise de cada símbolo a um executor, acompanha status e tempo
+por símbolo e permite cancelar; a interface coleta os resultados
+progressivamente à medida que ficam prontos
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from analise_preditiva import AnalisePreditiva
+from analise_risco import AnaliseRisco, benchmark_padrao
+from cliente_dados import ErroDados
+from universo import moeda_do_simbolo
+
+# Status possíveis de cada símbolo
+NA_FILA, EXECUTANDO, CONCLUIDO, ERRO, CANCELADO = 'na fila', 'executando', 'concluído', 'erro', 'cancelado'
+
+
+class ExecucaoComparacao:
+    """Uma execução de comparação; todas as atualizações de estado são protegidas por trava"""
+
+    def __init__(self, simbolos, periodo, periodo_base='5y', historicos=None, max_workers=4):
+        self.simbolos = list(dict.fromkeys(simbolos))
+        self.periodo = periodo
+        self.periodo_base = periodo_base
+        self._historicos = dict(historicos or {})
+        self._cancelar = threading.Event()
+        self._trava = threading.Lock()
+        self.inicio = time.monotonic()
+        self.estado = {
+            simbolo: {'status': NA_FILA, 'inicio': None, 'fim': None, 'mensagem': '', 'erro': None}
+            for simbolo in self.simbolos
+        }
+        # Resultados na ordem em que foram concluídos
+        self.linhas = []
+        # Históricos base buscados pelos workers, para a comparação normalizada da interface
+        self.historicos_novos = {}
+        self.versao = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='comparacao')
+        self._futuros = {simbolo: self._executor.submit(self._analisar, simbolo) for simbolo in self.simbolos}
+        self._executor.shutdown(wait=False)
+
+    def _atualizar(self, simbolo, **campos):
+        with self._trava:
+            self.estado[simbolo].update(campos)
+            self.versao += 1
+
+    def _analisar(self, simbolo):
+        if self._cancelar.is_set():
+            self._atualizar(simbolo, status=CANCELADO)
+            return
+        self._atualizar(simbolo, status=EXECUTANDO, inicio=time.monotonic())
+
+        analisador = AnalisePreditiva()
+        try:
+            dados_base = self._obter_historico(analisador, simbolo)
+            resultado = analisador.gerar_recomendacao(simbolo, periodo=self.periodo, dados=dados_base)
+            if resultado is not None:
+                risco = AnaliseRisco().resumo(resultado['dados_historicos']['close'],
+                                              self._fechamentos_benchmark(analisador, simbolo))
+        except ErroDados as e:
+            self._atualizar(simbolo, status=ERRO, fim=time.monotonic(), mensagem=e.mensagem_usuario, erro=e)
+            return
+        except Exception as e:
+            self._atualizar(simbolo, status=ERRO, fim=time.monotonic(), mensagem=str(e))
+            return
+
+        if resultado is None:
+            self._atualizar(simbolo, status=ERRO, fim=time.monotonic(), mensagem="Dados insuficientes para o período")
+            return
+
+        with self._trava:
+            self.linhas.append({
+                'Símbolo': simbolo,
+                'Moeda': moeda_do_simbolo(simbolo),
+                'Preço Atual': resultado['preco_atual'],
+                'Recomendação': resultado['recomendacao'],
+                'Score': resultado['score_consolidado'],
+                'RSI': resultado['rsi_atual'],
+                'VaR 95%': risco['var_historico'],
+                'CVaR 95%': risco['cvar_historico'],
+                'Drawdown Máx.': risco['max_drawdown'],
+                'Sharpe': risco['sharpe'],
+                'Beta': risco['beta']
+            })
+        self._atualizar(simbolo, status=CONCLUIDO, fim=time.monotonic())
+
+    def _obter_historico(self, analisador, simbolo):
+        """Histórico base recebido na criação ou buscado agora (e repassado à interface ao final)"""
+        with self._trava:
+            dados = self._historicos.get(simbolo, self.historicos_novos.get(simbolo))
+        if dados is None:
+            dados = analisador.obter_historico(simbolo, self.periodo_base)
+            with self._trava:
+                self.historicos_novos[simbolo] = dados
+        return dados
+
+    def _fechamentos_benchmark(self, analisador, simbolo):
+        """Fechamentos do benchmark do símbolo para o beta; None se indisponível"""
+        try:
+            return self._obter_historico(analisador, benchmark_padrao(simbolo))['close']
+        except ErroDados:
+            return None
+
+    def cancelar(self):
+        """Cancela os símbolos ainda na fila; os que já estão executando terminam normalmente"""
+        self._cancelar.set()
+        for simbolo, futuro in self._futuros.items():
+            if futuro.cancel():
+                self._atualizar(simbolo, status=CANCELADO)
+
+    @property
+    def cancelada(self):
+        return self._cancelar.is_set()
+
+    @property
+    def concluida(self):
+        return all(futuro.done() for futuro in self._futuros.values())
+
+    def progresso(self):
+        with self._trava:
+            finalizados = sum(e['status'] in (CONCLUIDO, ERRO, CANCELADO) for e in self.estado.values())
+        return finalizados / len(self.simbolos) if self.simbolos else 1.0
+
+    def tabela_status(self):
+        """Linhas de status por símbolo com o tempo decorrido (ou total) em segundos"""
+        agora = time.monotonic()
+        with self._trava:
+            linhas = []
+            for simbolo, estado in self.estado.items():
+                tempo = None
+                if estado['inicio'] is not None:
+                    tempo = (estado['fim'] or agora) - estado['inicio']
+                linhas.append({
+                    'Símbolo': simbolo, 'Status': estado['status'],
+                    'Tempo (s)': tempo, 'Mensagem': estado['mensagem']
+                })
+            return linhas
+
+    def copiar_resultados(self):
+        with self._trava:
+            return list(self.linhas), dict(self.historicos_novos)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Exportação Arrow/Parquet dos Resultados de Análise
+Converte o histórico de preços, o dicionário de indicadores, os `sinais` e os
+`scores_detalhados` de um resultado em tabelas Arrow com esquema fixo (as
+mesmas colunas e tipos para qualquer símbolo ou visão, com nulos onde o
+resultado não traz a série). Grava datasets Parquet de um ou de vários
+símbolos particionados por símbolo e ano, e passa tabelas em memória no
+formato IPC do Arrow (buffer ou arquivo mapeado), lidas sem cópia e sem CSV.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from analise_preditiva import criar_registro_padrao
+
+DIRETORIO_PADRAO = os.path.join('dados', 'exportacao')
+
+# Bump ao alterar qualquer esquema (gravado nos metadados de cada tabela)
+VERSAO_ESQUEMA = '1'
+
+_CHAVES = [pa.field('symbol', pa.string(), nullable=False), pa.field('date', pa.timestamp('us'), nullable=False)]
+_METADADOS = {b'versao_esquema': VERSAO_ESQUEMA.encode()}
+
+# Uma tabela por parte do resultado; `date` é o horário local da bolsa (sem fuso), como no índice
+ESQUEMAS = {
+    'precos': pa.schema(_CHAVES + [pa.field(c, pa.float64()) for c in ('open', 'high', 'low', 'close', 'volume')],
+                        metadata=_METADADOS),
+    # Todas as saídas públicas do registro padrão, na ordem de registro
+    'indicadores': pa.schema(_CHAVES + [pa.field(c, pa.float64()) for c in criar_registro_padrao().saidas_disponiveis()],
+                             metadata=_METADADOS),
+    'sinais': pa.schema(_CHAVES + [pa.field('preco', pa.float64())] +
+                        [pa.field(c, pa.int8()) for c in ('sinal_rsi', 'sinal_macd', 'sinal_bb', 'sinal_estocastico',
+                                                          'sinal_williams')] +
+                        [pa.field('score_consolidado', pa.float32())], metadata=_METADADOS),
+    'scores': pa.schema(_CHAVES + [pa.field(c, pa.float32()) for c in (
+        'score_rsi', 'score_macd', 'score_bb', 'score_sma', 'score_estocastico', 'score_williams',
+        'score_mfi', 'score_cmf', 'score_adx')] + [pa.field('score_final', pa.float64())], metadata=_METADADOS)
+}
+
+# Chave de cada tabela no resultado de gerar_recomendacao / gerar_recomendacao_avancada
+CHAVES_RESULTADO = {
+    'precos': 'dados_historicos', 'indicadores': 'indicadores',
+    'sinais': 'sinais', 'scores': 'scores_detalhados'
+}
+
+
+def tabela_arrow(quadro, esquema, symbol):
+    """
+    Tabela com o esquema dado a partir de um quadro indexado por data (ou dicionário de Series)
+    Colunas ausentes viram nulos e colunas fora do esquema são ignoradas
+    """
+    if isinstance(quadro, dict):
+        quadro = pd.DataFrame(quadro)
+    indice = pd.DatetimeIndex(quadro.index)
+    if indice.tz is not None:
+        indice = indice.tz_localize(None)
+    colunas = [pa.array(np.full(len(quadro), symbol, dtype=object), pa.string()),
+               pa.array(indice.as_unit('us').to_numpy(), pa.timestamp('us'))]
+    for campo in list(esquema)[len(_CHAVES):]:
+        if campo.name in quadro:
+            valores = pd.to_numeric(quadro[campo.name], errors='coerce')
+            colunas.append(pa.array(valores.to_numpy(), from_pandas=True).cast(campo.type))
+        else:
+            colunas.append(pa.nulls(len(quadro), campo.type))
+    return pa.Table.from_arrays(colunas, schema=esquema)
+
+
+def tabelas_resultado(resultado):
+    """{nome: tabela} das partes presentes no resultado (análise básica, avançada ou do snapshot)"""
+    tabelas = {}
+    for nome, chave in CHAVES_RESULTADO.items():
+        quadro = resultado.get(chave)
+        if quadro is not None and len(quadro):
+            tabelas[nome] = tabela_arrow(quadro, ESQUEMAS[nome], resultado['symbol'])
+    return tabelas
+
+
+def combinar_resultados(resultados):
+    """{nome: tabela} de vários resultados concatenados (mesmo esquema; sem cópia dos dados)"""
+    partes = {}
+    for resultado in resultados:
+        if resultado is None:
+            continue
+        for nome, tabela in tabelas_resultado(resultado).items():
+            partes.setdefault(nome, []).append(tabela)
+    return {nome: pa.concat_tables(tabelas) for nome, tabelas in partes.items()}
+
+
+# --- IPC EM MEMÓRIA ---
+
+def para_ipc(tabela):
+    """Serializa a tabela no formato de stream IPC do Arrow (pa.Buffer, sem conversão para texto)"""
+    saida = pa.BufferOutputStream()
+    with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return saida.getvalue()
+
+
+def de_ipc(buffer):
+    """Lê uma tabela de um buffer IPC; as colunas apontam para a memória do buffer (sem cópia)"""
+    return pa.ipc.open_stream(buffer).read_all()
+
+
+def gravar_ipc(tabela, caminho):
+    """Grava a tabela em arquivo IPC (Feather v2, sem compressão) para leitura mapeada em memória"""
+    diretorio = os.path.dirname(caminho)
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with pa.OSFile(temporario, 'wb') as arquivo, pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    os.replace(temporario, caminho)
+
+
+def abrir_ipc(caminho):
+    """Abre um arquivo IPC via memory map: outros processos leem as mesmas páginas, sem cópia"""
+    return pa.ipc.open_file(pa.memory_map(caminho, 'r')).read_all()
+
+
+# --- PARQUET ---
+
+class ExportadorArrow:
+    """Datasets Parquet por tabela (precos, indicadores, sinais, scores), particionados por símbolo e ano"""
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, compressao='zstd'):
+        self.diretorio = diretorio
+        self.compressao = compressao
+
+    def _particionamento(self):
+        return ds.partitioning(pa.schema([('symbol', pa.string()), ('ano', pa.int16())]), flavor='hive')
+
+    def gravar(self, tabelas):
+        """
+        Grava {nome: tabela} nos datasets; as partições (símbolo, ano) recebidas substituem as
+        existentes, e as demais são mantidas. Retorna {nome: linhas gravadas}
+        """
+        gravadas = {}
+        for nome, tabela in tabelas.items():
+            if nome not in ESQUEMAS:
+                raise ValueError(f"Tabela desconhecida: '{nome}' (esperado: {', '.join(ESQUEMAS)})")
+            ano = pc.year(tabela['date']).cast(pa.int16())
+            ds.write_dataset(
+                tabela.append_column('ano', ano), os.path.join(self.diretorio, nome),
+                format='parquet', partitioning=self._particionamento(),
+                existing_data_behavior='delete_matching',
+                basename_template='parte-{i}.parquet',
+                file_options=ds.ParquetFileFormat().make_write_options(compression=self.compressao)
+            )
+            gravadas[nome] = tabela.num_rows
+        return gravadas
+
+    def exportar(self, resultado):
+        """Exporta as tabelas de um resultado (um símbolo)"""
+        return self.gravar(tabelas_resultado(resultado))
+
+    def exportar_lote(self, resultados):
+        """Exporta vários resultados de uma vez (uma escrita por tabela)"""
+        return self.gravar(combinar_resultados(resultados))
+
+    def ler(self, nome, simbolos=None, inicio=None, fim=None, colunas=None):
+        """
+        Lê uma tabela do dataset com filtros aplicados na leitura (só as partições e
+        row groups necessários); `inicio`/`fim`: datas inclusive
+        """
+        caminho = os.path.join(self.diretorio, nome)
+        if not os.path.isdir(caminho):
+            return ESQUEMAS[nome].empty_table()
+        dataset = ds.dataset(caminho, format='parquet', partitioning=self._particionamento(),
+                             schema=ESQUEMAS[nome].append(pa.field('ano', pa.int16())))
+        condicoes = []
+        if simbolos is not None:
+            condicoes.append(ds.field('symbol').isin(list(simbolos)))
+        if inicio is not None:
+            inicio = pd.Timestamp(inicio)
+            condicoes += [ds.field('ano') >= inicio.year, ds.field('date') >= pa.scalar(inicio, pa.timestamp('us'))]
+        if fim is not None:
+            fim = pd.Timestamp(fim)
+            if fim == fim.normalize():  # data sem horário: inclui o dia inteiro
+                fim += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+            condicoes += [ds.field('ano') <= fim.year, ds.field('date') <= pa.scalar(fim, pa.timestamp('us'))]
+        filtro = None
+        for condicao in condicoes:
+            filtro = condicao if filtro is None else filtro & condicao
+        tabela = dataset.to_table(columns=colunas or ESQUEMAS[nome].names, filter=filtro)
+        ordem = [(coluna, 'ascending') for coluna in ('symbol', 'date') if coluna in tabela.column_names]
+        return tabela.sort_by(ordem) if ordem else tabela
+
+
+def exemplo_exportacao_arrow():
+    """Exemplo: exportação em lote do snapshot, leitura filtrada e passagem IPC em memória"""
+    import time
+    from snapshot_recomendacoes import SnapshotRecomendacoes
+    from sistema_recomendacoes import SistemaRecomendacoes
+
+    sistema = SistemaRecomendacoes()
+    resultados = [sistema.gerar_recomendacao_avancada(s, periodo='2y') for s in ('PETR4.SA', 'VALE3.SA', 'AAPL')]
+    exportador = ExportadorArrow()
+    inicio = time.perf_counter()
+    print(f"Gravadas: {exportador.exportar_lote(resultados)} em {time.perf_counter() - inicio:.2f}s")
+
+    # Snapshot inteiro (séries reduzidas), se já materializado
+    snapshot = SnapshotRecomendacoes()
+    conteudos = snapshot.listar_conteudos('avancada')
+    if conteudos:
+        resultados_snapshot = [snapshot.montar_resultado(resumo, serie) for _, resumo, serie in conteudos]
+        print(f"Snapshot: {ExportadorArrow(os.path.join(DIRETORIO_PADRAO, 'snapshot')).exportar_lote(resultados_snapshot)}")
+
+    scores = exportador.ler('scores', simbolos=['PETR4.SA'], inicio='2024-01-01', colunas=['symbol', 'date', 'score_final'])
+    print(scores.to_pandas().tail())
+
+    # Passagem em memória para outro componente: sem CSV e sem cópia das colunas
+    buffer = para_ipc(scores)
+    recebida = de_ipc(buffer)
+    print(f"IPC: {buffer.size:,} bytes, {recebida.num_rows} linhas, esquema igual: {recebida.schema.equals(scores.schema)}")
+
+
+if __name__ == "__main__":
+    exemplo_exportacao_arrow()
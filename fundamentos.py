@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Fundamentos dos Ativos
+P/L, P/VP, dividend yield, valor de mercado e setor de cada símbolo, lidos
+do `info` do provedor em lotes paralelos (com limitador e disjuntor próprios,
+para não disputar a cota do histórico) e guardados em SQLite com validade
+longa. As consultas leem apenas o banco local: símbolos ausentes ou vencidos
+são atualizados em segundo plano, cedendo a vez às análises do usuário, e
+nunca atrasam o caminho técnico. Inclui o score fundamentalista, os filtros
+e a triagem (screener) sobre o snapshot de recomendações.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from cliente_dados import erro_transitorio, obter_limitador, obter_disjuntor, provedor_padrao
+from universo import fator_conversao, moeda_do_simbolo
+from banco_sqlite import conectar, inicializar_banco
+
+CAMINHO_PADRAO = os.path.join('dados', 'fundamentos.db')
+
+# Fundamentos mudam a cada balanço: uma semana de validade; falhas são retentadas antes
+VALIDADE_PADRAO = timedelta(days=7)
+VALIDADE_FALHA = timedelta(hours=12)
+
+# Pausa máxima por lote da carga em segundo plano enquanto há análises em primeiro plano (s)
+ESPERA_MAXIMA_PRIMEIRO_PLANO = 5.0
+
+CAMPOS = ['pl', 'pvp', 'dividend_yield', 'valor_mercado', 'setor', 'moeda']
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS fundamentos (
+    symbol TEXT PRIMARY KEY,
+    atualizado_em TEXT,
+    tentativa_em TEXT NOT NULL,
+    erro TEXT,
+    pl REAL,
+    pvp REAL,
+    dividend_yield REAL,
+    valor_mercado REAL,
+    setor TEXT,
+    moeda TEXT
+);
+"""
+
+# Filtros aceitos: chave -> (coluna, limite inferior/superior); 'setores' recebe uma lista
+# Os limites de valor de mercado são na moeda base (ver valor_mercado_em)
+FILTROS = {
+    'pl_min': ('pl', 'min'), 'pl_max': ('pl', 'max'),
+    'pvp_min': ('pvp', 'min'), 'pvp_max': ('pvp', 'max'),
+    'dividend_yield_min': ('dividend_yield', 'min'), 'dividend_yield_max': ('dividend_yield', 'max'),
+    'valor_mercado_min': ('valor_mercado', 'min'), 'valor_mercado_max': ('valor_mercado', 'max')
+}
+
+# Faixas do score fundamentalista: (limites, scores), com len(scores) == len(limites) + 1
+FAIXAS_SCORE = {
+    'pl': ([0, 10, 15, 25, 40], [-1.0, 1.0, 0.5, 0.0, -0.5, -1.0]),  # P/L negativo: prejuízo
+    'pvp': ([1, 2, 4], [1.0, 0.5, 0.0, -0.5]),
+    'dividend_yield': ([0.03, 0.06], [0.0, 0.5, 1.0])
+}
+
+
+def normalizar_info(info):
+    """Campos de interesse do dicionário `info` do Yahoo Finance (ausentes como None)"""
+    def numero(chave):
+        valor = info.get(chave)
+        return float(valor) if isinstance(valor, (int, float)) and np.isfinite(valor) else None
+
+    # 'dividendYield' mudou de fração para percentual entre versões do yfinance: preferir a fração
+    dividend_yield = numero('trailingAnnualDividendYield')
+    preco = numero('currentPrice') or numero('regularMarketPrice')
+    if dividend_yield is None and numero('dividendRate') is not None and preco:
+        dividend_yield = numero('dividendRate') / preco
+    setor = info.get('sector') or ('ETF' if info.get('quoteType') == 'ETF' else None)
+    return {
+        'pl': numero('trailingPE'),
+        'pvp': numero('priceToBook'),
+        'dividend_yield': dividend_yield,
+        'valor_mercado': numero('marketCap'),
+        'setor': setor,
+        'moeda': info.get('currency')
+    }
+
+
+def scores_fundamentalistas(quadro):
+    """Score em [-1, 1] por linha (média das faixas de P/L, P/VP e dividend yield disponíveis)"""
+    componentes = []
+    for coluna, (limites, scores) in FAIXAS_SCORE.items():
+        valores = pd.to_numeric(quadro[coluna], errors='coerce').to_numpy(dtype=float) \
+            if coluna in quadro else np.full(len(quadro), np.nan)
+        score = np.asarray(scores)[np.searchsorted(limites, np.nan_to_num(valores), side='right')]
+        componentes.append(np.where(np.isnan(valores), np.nan, score))
+    with np.errstate(invalid='ignore'):
+        media = np.nanmean(np.vstack(componentes), axis=0) if len(quadro) else np.zeros(0)
+    return pd.Series(media, index=quadro.index, name='score_fundamentos')
+
+
+def score_fundamentalista(fundamentos):
+    """Score de um símbolo (dicionário de `CAMPOS`); None sem nenhum indicador"""
+    if not fundamentos:
+        return None
+    score = scores_fundamentalistas(pd.DataFrame([fundamentos])).iloc[0]
+    return None if pd.isna(score) else float(score)
+
+
+def valor_mercado_em(quadro, moeda_base='BRL', cambio=None):
+    """
+    Valor de mercado convertido para `moeda_base` pela cotação mais recente
+    `cambio`: BRL por USD (escalar ou Series, ver universo.carregar_cambio); sem ele, os ativos
+    em outra moeda ficam NaN (nenhuma busca é feita). Moeda ausente é deduzida do símbolo;
+    moedas sem conversão viram NaN
+    """
+    valores = pd.to_numeric(quadro['valor_mercado'], errors='coerce').to_numpy(dtype=float)
+    moedas = quadro['moeda'] if 'moeda' in quadro else pd.Series(None, index=quadro.index, dtype=object)
+    simbolos = quadro['symbol'] if 'symbol' in quadro else pd.Series(quadro.index, index=quadro.index)
+    moedas = [moeda if isinstance(moeda, str) and moeda else
+              (moeda_do_simbolo(symbol) if isinstance(symbol, str) else None)
+              for moeda, symbol in zip(moedas, simbolos)]
+    if cambio is None:
+        cambio = np.nan
+    elif isinstance(cambio, pd.Series):
+        cambio = float(cambio.dropna().iloc[-1]) if cambio.notna().any() else np.nan
+
+    fatores = np.full(len(moedas), np.nan)
+    for i, moeda in enumerate(moedas):
+        try:
+            fatores[i] = fator_conversao(moeda, moeda_base, cambio)
+        except ValueError:
+            pass
+    return pd.Series(valores * fatores, index=quadro.index, name=f"valor_mercado_{moeda_base.lower()}")
+
+
+def aplicar_filtros(quadro, filtros, moeda_base='BRL', cambio=None):
+    """
+    Máscara das linhas que atendem a todos os filtros (ver FILTROS); valores
+    ausentes não atendem a filtros de limite. Os limites de valor de mercado são
+    em `moeda_base`: cada ativo é convertido antes da comparação (ver valor_mercado_em)
+    """
+    mascara = pd.Series(True, index=quadro.index)
+    convertido = None
+    for chave, limite in (filtros or {}).items():
+        if limite is None:
+            continue
+        if chave == 'setores':
+            mascara &= quadro['setor'].isin(limite)
+            continue
+        if chave not in FILTROS:
+            raise ValueError(f"Filtro fundamentalista desconhecido: '{chave}'")
+        coluna, tipo = FILTROS[chave]
+        if coluna == 'valor_mercado':
+            if convertido is None:
+                convertido = valor_mercado_em(quadro, moeda_base, cambio)
+            valores = convertido
+        else:
+            valores = pd.to_numeric(quadro[coluna], errors='coerce')
+        mascara &= (valores >= limite) if tipo == 'min' else (valores <= limite)
+    return mascara
+
+
+def atende_filtros(fundamentos, filtros, symbol=None, moeda_base='BRL', cambio=None):
+    """True se o símbolo (dicionário de `CAMPOS`) atende aos filtros; sem fundamentos, False"""
+    if not fundamentos:
+        return False
+    quadro = pd.DataFrame([dict(fundamentos, symbol=symbol)])
+    return bool(aplicar_filtros(quadro, filtros, moeda_base, cambio).iloc[0])
+
+
+class BaseFundamentos:
+    """Base local de fundamentos com validade, carga em lotes paralelos e atualização em segundo plano"""
+
+    def __init__(self, caminho=CAMINHO_PADRAO, validade=VALIDADE_PADRAO, validade_falha=VALIDADE_FALHA,
+                 provedor=None, max_workers=4, tamanho_lote=20):
+        self.caminho = caminho
+        self.validade = validade
+        self.validade_falha = validade_falha
+        self.provedor = provedor or provedor_padrao()
+        self.max_workers = max_workers
+        self.tamanho_lote = tamanho_lote
+        # Cota e disjuntor separados dos do histórico: o `info` é lento e não pode atrasar os preços
+        nome = f"{self.provedor.nome}_fundamentos"
+        self.limitador = obter_limitador(nome, taxa=1.0, capacidade=2)
+        self.disjuntor = obter_disjuntor(nome)
+        self._pendentes = []
+        self._trava = threading.Lock()
+        self._thread = None
+        inicializar_banco(caminho, ESQUEMA)
+
+    def _conectar(self):
+        """Conexão fechada ao sair do bloco; o bloco é uma transação (commit ou rollback)"""
+        return conectar(self.caminho, ESQUEMA)
+
+    # --- CONSULTA (sem rede) ---
+
+    def obter(self, simbolos=None):
+        """
+        Fundamentos gravados (índice symbol, colunas CAMPOS + atualizado_em), lidos só do banco
+        Com `simbolos`, devolve uma linha por símbolo pedido (NaN para os ainda sem dados)
+        """
+        with self._conectar() as conexao:
+            quadro = pd.read_sql_query(
+                f"SELECT symbol, {', '.join(CAMPOS)}, atualizado_em FROM fundamentos "
+                "WHERE atualizado_em IS NOT NULL", conexao, index_col='symbol'
+            )
+        if simbolos is not None:
+            quadro = quadro.reindex(pd.Index(list(simbolos), name='symbol'))
+        return quadro
+
+    def obter_simbolo(self, symbol):
+        """Fundamentos de um símbolo como dicionário, ou None se ainda não carregados"""
+        linha = self.obter([symbol]).iloc[0]
+        if pd.isna(linha['atualizado_em']):
+            return None
+        fundamentos = {campo: (None if pd.isna(linha[campo]) else linha[campo]) for campo in CAMPOS + ['atualizado_em']}
+        for campo in ('pl', 'pvp', 'dividend_yield', 'valor_mercado'):
+            if fundamentos[campo] is not None:
+                fundamentos[campo] = float(fundamentos[campo])
+        return fundamentos
+
+    def vencidos(self, simbolos):
+        """Símbolos sem fundamentos válidos cuja última tentativa não seja uma falha recente"""
+        with self._conectar() as conexao:
+            linhas = dict((s, (a, t)) for s, a, t in conexao.execute(
+                "SELECT symbol, atualizado_em, tentativa_em FROM fundamentos"))
+        agora = datetime.now()
+        vencidos = []
+        for symbol in dict.fromkeys(simbolos):
+            atualizado_em, tentativa_em = linhas.get(symbol, (None, None))
+            if atualizado_em and agora - datetime.fromisoformat(atualizado_em) <= self.validade:
+                continue
+            if tentativa_em and atualizado_em != tentativa_em and \
+                    agora - datetime.fromisoformat(tentativa_em) <= self.validade_falha:
+                continue
+            vencidos.append(symbol)
+        return vencidos
+
+    # --- CARGA ---
+
+    def _buscar(self, symbol):
+        """Fundamentos normalizados de um símbolo (uma requisição, pela cota dos fundamentos)"""
+        permitido, reabre_em = self.disjuntor.permitir()
+        if not permitido:
+            raise ConnectionError(f"Circuito de fundamentos aberto; nova tentativa em {reabre_em:.0f}s")
+        self.limitador.adquirir()
+        try:
+            info = self.provedor.buscar_fundamentos(symbol)
+        except Exception as e:
+            if erro_transitorio(e, self.provedor):
+                self.disjuntor.registrar_falha()
+            else:
+                self.disjuntor.liberar()
+            raise
+        self.disjuntor.registrar_sucesso()
+        fundamentos = normalizar_info(info or {})
+        if all(fundamentos[campo] is None for campo in ('pl', 'pvp', 'dividend_yield', 'valor_mercado')):
+            raise ValueError(f"Nenhum fundamento retornado para {symbol}")
+        return fundamentos
+
+    def _carregar_lote(self, lote, executor):
+        """Busca um lote em paralelo e grava tudo numa única transação; retorna as falhas"""
+        def buscar(symbol):
+            try:
+                return symbol, self._buscar(symbol), None
+            except Exception as e:
+                return symbol, None, str(e)
+
+        agora = datetime.now().isoformat(timespec='seconds')
+        resultados = list(executor.map(buscar, lote))
+        with self._conectar() as conexao:
+            for symbol, fundamentos, erro in resultados:
+                if fundamentos is not None:
+                    conexao.execute(
+                        f"INSERT OR REPLACE INTO fundamentos (symbol, atualizado_em, tentativa_em, erro, "
+                        f"{', '.join(CAMPOS)}) VALUES (?, ?, ?, NULL, {', '.join('?' * len(CAMPOS))})",
+                        (symbol, agora, agora, *[fundamentos[campo] for campo in CAMPOS])
+                    )
+                else:
+                    # Falha não apaga os fundamentos anteriores, apenas registra a tentativa
+                    conexao.execute(
+                        "INSERT INTO fundamentos (symbol, tentativa_em, erro) VALUES (?, ?, ?) "
+                        "ON CONFLICT (symbol) DO UPDATE SET tentativa_em = excluded.tentativa_em, erro = excluded.erro",
+                        (symbol, agora, erro)
+                    )
+        return [symbol for symbol, fundamentos, _ in resultados if fundamentos is None]
+
+    def atualizar(self, simbolos, forcar=False, ceder_vez=False):
+        """
+        Carrega os fundamentos ausentes ou vencidos (todos, com `forcar`) em lotes paralelos
+        `ceder_vez`: antes de cada lote, aguarda (até ESPERA_MAXIMA_PRIMEIRO_PLANO) as análises em primeiro plano
+        Retorna {'atualizados': n, 'falhas': [símbolos]}
+        """
+        from pre_carregamento import aguardar_primeiro_plano
+
+        simbolos = list(dict.fromkeys(simbolos)) if forcar else self.vencidos(simbolos)
+        falhas = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for i in range(0, len(simbolos), self.tamanho_lote):
+                if ceder_vez:
+                    aguardar_primeiro_plano(espera_maxima=ESPERA_MAXIMA_PRIMEIRO_PLANO)
+                falhas += self._carregar_lote(simbolos[i:i + self.tamanho_lote], executor)
+        return {'atualizados': len(simbolos) - len(falhas), 'falhas': falhas}
+
+    def atualizar_em_segundo_plano(self, simbolos):
+        """
+        Enfileira os símbolos ausentes ou vencidos e retorna imediatamente; uma única thread
+        por base os carrega, cedendo a vez às análises em primeiro plano. Retorna quantos entraram na fila
+        """
+        novos = self.vencidos(simbolos)
+        with self._trava:
+            novos = [s for s in novos if s not in self._pendentes]
+            self._pendentes.extend(novos)
+            if novos and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._trabalhar, name='fundamentos', daemon=True)
+                self._thread.start()
+        return len(novos)
+
+    def _trabalhar(self):
+        while True:
+            with self._trava:
+                lote, self._pendentes = self._pendentes[:self.tamanho_lote], self._pendentes[self.tamanho_lote:]
+                if not lote:
+                    self._thread = None
+                    return
+            try:
+                self.atualizar(lote, forcar=True, ceder_vez=True)
+            except sqlite3.Error:
+                pass  # banco indisponível: os símbolos voltam a ser pedidos na próxima consulta
+
+    @property
+    def em_atualizacao(self):
+        """Símbolos ainda na fila da atualização em segundo plano"""
+        with self._trava:
+            return len(self._pendentes)
+
+
+_BASE_PADRAO = None
+_TRAVA_PADRAO = threading.Lock()
+
+
+def obter_base_padrao():
+    """Retorna a base de fundamentos do processo (criada na primeira chamada)"""
+    global _BASE_PADRAO
+    with _TRAVA_PADRAO:
+        if _BASE_PADRAO is None:
+            _BASE_PADRAO = BaseFundamentos()
+        return _BASE_PADRAO
+
+
+def triagem(filtros=None, tipo='avancada', snapshot=None, base=None, moeda_base='BRL', cambio=None):
+    """
+    Triagem do universo: resumos da versão atual do snapshot de recomendações com os
+    fundamentos da base local e o score fundamentalista, filtrados por `filtros` (ver FILTROS)
+    Nenhuma requisição de rede é feita na consulta: limites de valor de mercado usam
+    `cambio` (BRL por USD) para os ativos em outra moeda que `moeda_base`
+    """
+    from snapshot_recomendacoes import SnapshotRecomendacoes
+
+    snapshot = snapshot or SnapshotRecomendacoes()
+    base = base or obter_base_padrao()
+    resumos = snapshot.listar_resumos(tipo)
+    quadro = resumos.join(base.obter(resumos['symbol']), on='symbol')
+    quadro['score_fundamentos'] = scores_fundamentalistas(quadro)
+    if filtros:
+        quadro = quadro[aplicar_filtros(quadro, filtros, moeda_base, cambio)]
+    return quadro.reset_index(drop=True)
+
+
+def exemplo_fundamentos():
+    """Exemplo: carga dos fundamentos do universo e triagem de ações baratas e pagadoras de dividendos"""
+    import time
+    from universo import simbolos_por_categoria
+
+    simbolos = list(dict.fromkeys(s for ativos in simbolos_por_categoria().values() for s in ativos))
+    base = BaseFundamentos()
+    inicio = time.perf_counter()
+    relatorio = base.atualizar(simbolos)
+    print(f"{relatorio['atualizados']} símbolos atualizados em {time.perf_counter() - inicio:.1f}s "
+          f"({len(relatorio['falhas'])} falhas)")
+
+    quadro = base.obter(simbolos)
+    quadro['score_fundamentos'] = scores_fundamentalistas(quadro)
+    filtros = {'pl_min': 0, 'pl_max': 15, 'pvp_max': 2, 'dividend_yield_min': 0.04}
+    selecionados = quadro[aplicar_filtros(quadro, filtros)].sort_values('score_fundamentos', ascending=False)
+    print(f"Triagem {filtros}: {len(selecionados)} de {len(quadro)} símbolos")
+    print(selecionados[['setor', 'pl', 'pvp', 'dividend_yield', 'score_fundamentos']].head(15).round(3))
+
+
+if __name__ == "__main__":
+    exemplo_fundamentos()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Histórico de Recomendações (Ledger)
+Registro só de inclusão de cada recomendação gerada (score, scores por
+componente, alvos, stop e data do pregão) em SQLite indexado. Um job em
+lote apura os desfechos com os preços posteriores, e as taxas de acerto
+por símbolo, categoria ou recomendação são consultadas direto no banco.
+"""
+
+import os
+import json
+from datetime import datetime
+import pandas as pd
+from analise_preditiva import AnalisePreditiva
+from cliente_dados import ErroDados
+from lista_ativos import buscar_ativo_por_simbolo
+from banco_sqlite import conectar, inicializar_banco
+
+CAMINHO_PADRAO = os.path.join('dados', 'historico_recomendacoes.db')
+
+# Horizontes de apuração, em pregões após a recomendação
+HORIZONTES_PADRAO = (5, 21, 63)
+
+# Variação máxima (em módulo) para que uma recomendação NEUTRO conte como acerto
+LIMIAR_NEUTRO = 0.02
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS recomendacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    registrada_em TEXT NOT NULL,
+    data_referencia TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    categoria TEXT,
+    tipo TEXT NOT NULL,
+    periodo TEXT,
+    origem TEXT,
+    recomendacao TEXT NOT NULL,
+    direcao INTEGER NOT NULL,
+    score REAL,
+    preco REAL NOT NULL,
+    alvo_1 REAL,
+    alvo_2 REAL,
+    stop REAL,
+    componentes TEXT,
+    UNIQUE (symbol, tipo, periodo, data_referencia)
+);
+CREATE INDEX IF NOT EXISTS idx_recomendacoes_symbol ON recomendacoes (symbol, data_referencia);
+CREATE INDEX IF NOT EXISTS idx_recomendacoes_data ON recomendacoes (data_referencia);
+CREATE INDEX IF NOT EXISTS idx_recomendacoes_recomendacao ON recomendacoes (recomendacao, data_referencia);
+CREATE INDEX IF NOT EXISTS idx_recomendacoes_categoria ON recomendacoes (categoria, data_referencia);
+CREATE TABLE IF NOT EXISTS desfechos (
+    id_recomendacao INTEGER NOT NULL REFERENCES recomendacoes (id),
+    horizonte INTEGER NOT NULL,
+    data_saida TEXT NOT NULL,
+    preco_saida REAL NOT NULL,
+    retorno REAL NOT NULL,
+    acerto INTEGER NOT NULL,
+    atingiu_alvo INTEGER,
+    atingiu_stop INTEGER,
+    PRIMARY KEY (horizonte, id_recomendacao)
+);
+"""
+
+# Agrupamentos aceitos pelas consultas de taxa de acerto
+AGRUPAMENTOS = ('symbol', 'categoria', 'recomendacao', 'tipo')
+
+
+def direcao_da_recomendacao(recomendacao):
+    """+1 para compras, -1 para vendas e 0 para NEUTRO"""
+    if 'COMPRA' in recomendacao:
+        return 1
+    if 'VENDA' in recomendacao:
+        return -1
+    return 0
+
+
+def _nivel(valor):
+    """Valor opcional (score, alvo, stop) como float, ou None se ausente"""
+    return None if valor is None or pd.isna(valor) else float(valor)
+
+
+def _extrair_registro(resultado, tipo):
+    """Campos gravados de um resultado de `gerar_recomendacao` ou `gerar_recomendacao_avancada`"""
+    direcao = direcao_da_recomendacao(resultado['recomendacao'])
+    if tipo == 'basica':
+        score = resultado['score_consolidado']
+        alvo_1 = resultado['preco_alvo_alta' if direcao >= 0 else 'preco_alvo_baixa']
+        alvo_2 = None
+        stop = resultado['preco_alvo_baixa' if direcao >= 0 else 'preco_alvo_alta']
+        componentes = resultado['sinais'][AnalisePreditiva.COLUNAS_SINAIS].iloc[-1]
+    else:
+        score = resultado['score_final']
+        alvo_1, alvo_2, stop = resultado['preco_alvo_1'], resultado['preco_alvo_2'], resultado['stop_loss']
+        componentes = resultado['scores_detalhados'].iloc[-1]
+    componentes = {chave: None if pd.isna(valor) else float(valor) for chave, valor in componentes.items()}
+    if tipo != 'basica' and resultado.get('probabilidade_alta_ml') is not None:
+        componentes['probabilidade_alta_ml'] = float(resultado['probabilidade_alta_ml'])
+
+    return {
+        'data_referencia': pd.Timestamp(resultado['dados_historicos'].index[-1]).strftime('%Y-%m-%d'),
+        'recomendacao': resultado['recomendacao'],
+        'direcao': direcao,
+        'score': _nivel(score),
+        'preco': float(resultado['preco_atual']),
+        'alvo_1': _nivel(alvo_1),
+        'alvo_2': _nivel(alvo_2),
+        'stop': _nivel(stop),
+        'componentes': json.dumps(componentes)
+    }
+
+
+def _periodo_cobrindo(data_inicial):
+    """Menor período do provedor que cobre o histórico desde `data_inicial`"""
+    dias = (pd.Timestamp.today() - pd.Timestamp(data_inicial)).days
+    for periodo, limite in (('1y', 330), ('2y', 700), ('5y', 1800), ('10y', 3600)):
+        if dias < limite:
+            return periodo
+    return 'max'
+
+
+class HistoricoRecomendacoes:
+    """Ledger de recomendações com apuração de desfechos e consultas de acerto"""
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        inicializar_banco(caminho, ESQUEMA)
+
+    def _conectar(self):
+        """Conexão fechada ao sair do bloco; o bloco é uma transação (commit ou rollback)"""
+        return conectar(self.caminho, ESQUEMA)
+
+    # --- REGISTRO ---
+
+    def registrar(self, resultado, tipo='basica', periodo=None, origem='app', categoria=None):
+        """
+        Grava a recomendação (uma por símbolo, tipo, período e pregão; repetições são ignoradas)
+        Retorna o id do registro, ou None se já existia
+        """
+        if resultado is None:
+            return None
+        if categoria is None:
+            ativo = buscar_ativo_por_simbolo(resultado['symbol'])
+            categoria = ativo['categoria'] if ativo else None
+        registro = _extrair_registro(resultado, tipo)
+        with self._conectar() as conexao:
+            cursor = conexao.execute(
+                "INSERT OR IGNORE INTO recomendacoes (registrada_em, data_referencia, symbol, categoria, tipo, "
+                "periodo, origem, recomendacao, direcao, score, preco, alvo_1, alvo_2, stop, componentes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec='seconds'), registro['data_referencia'], resultado['symbol'],
+                 categoria, tipo, periodo, origem, registro['recomendacao'], registro['direcao'], registro['score'],
+                 registro['preco'], registro['alvo_1'], registro['alvo_2'], registro['stop'], registro['componentes'])
+            )
+            return cursor.lastrowid if cursor.rowcount else None
+
+    # --- APURAÇÃO ---
+
+    def pendentes(self, horizontes=HORIZONTES_PADRAO):
+        """Recomendações sem desfecho apurado em pelo menos um dos horizontes"""
+        marcadores = ",".join("?" * len(horizontes))
+        with self._conectar() as conexao:
+            return pd.read_sql_query(
+                "SELECT r.id, r.symbol, r.data_referencia, r.direcao, r.preco, r.alvo_1, r.stop, "
+                "GROUP_CONCAT(d.horizonte) AS apurados FROM recomendacoes r "
+                f"LEFT JOIN desfechos d ON d.id_recomendacao = r.id AND d.horizonte IN ({marcadores}) "
+                "GROUP BY r.id HAVING COUNT(d.horizonte) < ?",
+                conexao, params=(*horizontes, len(horizontes))
+            )
+
+    @staticmethod
+    def calcular_desfechos(df, pendentes, horizontes=HORIZONTES_PADRAO, limiar_neutro=LIMIAR_NEUTRO):
+        """
+        Desfechos de um símbolo a partir do histórico OHLCV posterior às recomendações
+        Horizontes ainda não decorridos ficam para a próxima apuração
+        """
+        datas = df.index.tz_localize(None).normalize() if df.index.tz is not None else df.index.normalize()
+        close, high, low = (df[c].to_numpy(dtype=float) for c in ('close', 'high', 'low'))
+        posicoes = datas.searchsorted(pd.to_datetime(pendentes['data_referencia']), side='right') - 1
+
+        linhas = []
+        for (_, rec), posicao in zip(pendentes.iterrows(), posicoes):
+            apurados = {int(h) for h in str(rec['apurados']).split(',')} if rec['apurados'] else set()
+            for horizonte in horizontes:
+                saida = posicao + horizonte
+                if horizonte in apurados or posicao < 0 or saida >= len(close):
+                    continue
+                retorno = close[saida] / rec['preco'] - 1
+                direcao = rec['direcao']
+                acerto = abs(retorno) < limiar_neutro if direcao == 0 else direcao * retorno > 0
+                # Alvo e stop tocados em algum pregão da janela, no sentido da recomendação; níveis do
+                # lado errado do preço de referência (ex.: alvo de compra abaixo da entrada) não contam
+                janela_alta, janela_baixa = high[posicao + 1:saida + 1].max(), low[posicao + 1:saida + 1].min()
+                alvo, stop = _nivel(rec['alvo_1']), _nivel(rec['stop'])
+                atingiu_alvo = atingiu_stop = None
+                if direcao != 0 and alvo is not None and direcao * (alvo - rec['preco']) > 0:
+                    atingiu_alvo = janela_alta >= alvo if direcao > 0 else janela_baixa <= alvo
+                if direcao != 0 and stop is not None and direcao * (rec['preco'] - stop) > 0:
+                    atingiu_stop = janela_baixa <= stop if direcao > 0 else janela_alta >= stop
+                linhas.append((
+                    int(rec['id']), horizonte, datas[saida].strftime('%Y-%m-%d'), float(close[saida]),
+                    float(retorno), int(acerto),
+                    None if atingiu_alvo is None else int(atingiu_alvo),
+                    None if atingiu_stop is None else int(atingiu_stop)
+                ))
+        return linhas
+
+    def apurar_desfechos(self, horizontes=HORIZONTES_PADRAO, analisador=None):
+        """
+        Job em lote: busca o histórico de cada símbolo pendente uma única vez e grava
+        os desfechos já decorridos. Retorna o número de desfechos gravados e as falhas.
+        """
+        analisador = analisador or AnalisePreditiva()
+        pendentes = self.pendentes(horizontes)
+        gravados, falhas = 0, {}
+        for symbol, grupo in pendentes.groupby('symbol'):
+            try:
+                df = analisador.obter_historico(symbol, _periodo_cobrindo(grupo['data_referencia'].min()))
+            except ErroDados as e:
+                falhas[symbol] = e
+                continue
+            linhas = self.calcular_desfechos(df, grupo, horizontes)
+            if linhas:
+                with self._conectar() as conexao:
+                    conexao.executemany("INSERT OR IGNORE INTO desfechos VALUES (?, ?, ?, ?, ?, ?, ?, ?)", linhas)
+                gravados += len(linhas)
+        return {'desfechos': gravados, 'falhas': falhas}
+
+    # --- CONSULTAS ---
+
+    def taxas_acerto(self, agrupar_por='recomendacao', horizonte=21, symbol=None, categoria=None,
+                     recomendacao=None, tipo=None, desde=None):
+        """
+        Taxa de acerto, retorno médio e frequência de alvo/stop por grupo
+        Ex.: taxas_acerto('recomendacao', symbol='VALE3.SA', desde='2024-01-01')
+        """
+        if agrupar_por not in AGRUPAMENTOS:
+            raise ValueError(f"Agrupamento inválido: {agrupar_por}. Use um de {AGRUPAMENTOS}")
+        filtros, parametros = ["d.horizonte = ?"], [horizonte]
+        for coluna, valor in (('symbol', symbol), ('categoria', categoria), ('recomendacao', recomendacao), ('tipo', tipo)):
+            if valor is not None:
+                filtros.append(f"r.{coluna} = ?")
+                parametros.append(valor)
+        if desde is not None:
+            filtros.append("r.data_referencia >= ?")
+            parametros.append(pd.Timestamp(desde).strftime('%Y-%m-%d'))
+
+        with self._conectar() as conexao:
+            return pd.read_sql_query(
+                f"SELECT r.{agrupar_por} AS grupo, COUNT(*) AS recomendacoes, AVG(d.acerto) AS taxa_acerto, "
+                "AVG(d.retorno) AS retorno_medio, AVG(d.atingiu_alvo) AS taxa_alvo, AVG(d.atingiu_stop) AS taxa_stop "
+                "FROM recomendacoes r JOIN desfechos d ON d.id_recomendacao = r.id "
+                f"WHERE {' AND '.join(filtros)} GROUP BY r.{agrupar_por} ORDER BY recomendacoes DESC",
+                conexao, params=parametros
+            )
+
+    def historico(self, symbol, tipo=None, desde=None, horizonte=21):
+        """Recomendações registradas do símbolo com o desfecho no horizonte (NaN se pendente)"""
+        filtros, parametros = ["r.symbol = ?"], [horizonte, symbol]
+        if tipo is not None:
+            filtros.append("r.tipo = ?")
+            parametros.append(tipo)
+        if desde is not None:
+            filtros.append("r.data_referencia >= ?")
+            parametros.append(pd.Timestamp(desde).strftime('%Y-%m-%d'))
+        with self._conectar() as conexao:
+            historico = pd.read_sql_query(
+                "SELECT r.data_referencia, r.tipo, r.periodo, r.recomendacao, r.score, r.preco, r.alvo_1, "
+                "r.alvo_2, r.stop, r.componentes, d.retorno, d.acerto, d.atingiu_alvo, d.atingiu_stop "
+                "FROM recomendacoes r LEFT JOIN desfechos d ON d.id_recomendacao = r.id AND d.horizonte = ? "
+                f"WHERE {' AND '.join(filtros)} ORDER BY r.data_referencia",
+                conexao, params=parametros
+            )
+        historico['data_referencia'] = pd.to_datetime(historico['data_referencia'])
+        historico['componentes'] = historico['componentes'].map(lambda texto: json.loads(texto) if texto else {})
+        return historico
+
+
+if __name__ == "__main__":
+    # Job de apuração (agendar após o fechamento, junto do snapshot noturno)
+    ledger = HistoricoRecomendacoes()
+    relatorio = ledger.apurar_desfechos()
+    print(f"{relatorio['desfechos']} desfechos apurados")
+    if relatorio['falhas']:
+        print(f"Falhas: {', '.join(relatorio['falhas'])}")
+    print(ledger.taxas_acerto('recomendacao').to_string(index=False))
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Ingestão de Ticks e Agregação de Barras em Tempo Real
+Consome um fluxo de negócios (arquivo em replay ou socket local), agrega
+em barras OHLCV de 1 e 5 minutos guardadas em buffers circulares de
+tamanho fixo e envia cada barra fechada à camada de indicadores/score.
+Ticks atrasados são aceitos até `atraso_maximo` segundos (marca d'água);
+os mais antigos são descartados e contados. A latência tick -> score e a
+vazão (ticks/s) são medidas continuamente.
+
+Formato das linhas (arquivo e socket): timestamp_epoch_s,symbol,preco,volume
+"""
+
+import time
+import heapq
+import socket
+import threading
+from collections import deque, namedtuple
+import numpy as np
+import pandas as pd
+from analise_preditiva import AnalisePreditiva
+
+Tick = namedtuple('Tick', ['timestamp', 'symbol', 'preco', 'volume'])
+
+# Timeframes suportados e sua duração em segundos
+TIMEFRAMES_INTRADIARIOS = {'1m': 60, '5m': 300}
+
+# Latências guardadas para os percentis
+AMOSTRAS_LATENCIA = 10000
+
+
+def ler_tick(linha):
+    """Converte uma linha `timestamp,symbol,preco,volume` em Tick"""
+    timestamp, symbol, preco, volume = linha.strip().split(',')
+    return Tick(float(timestamp), symbol, float(preco), float(volume))
+
+
+# --- FONTES ---
+
+class FonteArquivo:
+    """
+    Replay de um arquivo de ticks
+    `velocidade`: None para o mais rápido possível; 1.0 reproduz o ritmo original, 10.0 é 10x mais rápido
+    """
+
+    def __init__(self, caminho, velocidade=None):
+        self.caminho = caminho
+        self.velocidade = velocidade
+        self._parar = threading.Event()
+
+    def __iter__(self):
+        inicio_replay = inicio_fluxo = None
+        with open(self.caminho) as arquivo:
+            for linha in arquivo:
+                if self._parar.is_set():
+                    return
+                if not linha.strip() or linha.startswith('#'):
+                    continue
+                tick = ler_tick(linha)
+                if self.velocidade:
+                    if inicio_replay is None:
+                        inicio_replay, inicio_fluxo = time.monotonic(), tick.timestamp
+                    espera = (tick.timestamp - inicio_fluxo) / self.velocidade - (time.monotonic() - inicio_replay)
+                    if espera > 0:
+                        time.sleep(espera)
+                yield tick
+
+    def fechar(self):
+        self._parar.set()
+
+
+class FonteSocket:
+    """Cliente TCP de um servidor local que envia uma linha por tick"""
+
+    def __init__(self, host='127.0.0.1', porta=9009, timeout=5.0):
+        self.host = host
+        self.porta = porta
+        self.timeout = timeout
+        self._conexao = None
+
+    def __iter__(self):
+        self._conexao = socket.create_connection((self.host, self.porta), timeout=self.timeout)
+        self._conexao.settimeout(None)
+        with self._conexao, self._conexao.makefile('r') as fluxo:
+            for linha in fluxo:
+                if linha.strip():
+                    yield ler_tick(linha)
+
+    def fechar(self):
+        if self._conexao is not None:
+            try:
+                self._conexao.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def gravar_ticks_sinteticos(caminho, simbolos, duracao=3600, ticks_por_segundo=200, fracao_atrasada=0.01,
+                            atraso_medio=1.0, inicio=None, semente=0):
+    """
+    Grava um arquivo de ticks de teste: passeio aleatório por símbolo e uma fração
+    de ticks fora de ordem (atrasados exponencialmente, em segundos)
+    """
+    rng = np.random.default_rng(semente)
+    inicio = inicio if inicio is not None else pd.Timestamp.now(tz='UTC').floor('D').timestamp()
+    n = int(duracao * ticks_por_segundo)
+    tempos = inicio + np.sort(rng.uniform(0, duracao, n))
+    indices = rng.integers(0, len(simbolos), n)
+    precos_iniciais = rng.uniform(10, 200, len(simbolos))
+    passos = rng.normal(0, 0.0005, n)
+    log_precos = np.zeros(n)
+    for i in range(len(simbolos)):
+        mascara = indices == i
+        log_precos[mascara] = np.log(precos_iniciais[i]) + np.cumsum(passos[mascara])
+    volumes = rng.integers(1, 50, n) * 100
+
+    # Ticks atrasados chegam depois (a ordem do arquivo é a ordem de chegada)
+    chegada = tempos + np.where(rng.random(n) < fracao_atrasada, rng.exponential(atraso_medio, n), 0.0)
+    with open(caminho, 'w') as arquivo:
+        for j in np.argsort(chegada, kind='stable'):
+            arquivo.write(f"{tempos[j]:.6f},{simbolos[indices[j]]},{np.exp(log_precos[j]):.4f},{volumes[j]}\n")
+    return n
+
+
+# --- AGREGAÇÃO ---
+
+class BufferCircular:
+    """
+    Últimas `capacidade` barras fechadas (inicio, open, high, low, close, volume) em memória fixa
+    Escrito pela thread de ingestão e lido pela de score: escrita e leitura sob a mesma trava
+    """
+
+    COLUNAS = ['inicio', 'open', 'high', 'low', 'close', 'volume']
+
+    def __init__(self, capacidade=500):
+        self.capacidade = capacidade
+        self._dados = np.empty((capacidade, len(self.COLUNAS)))
+        self._proxima = 0
+        self.total = 0
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacidade)
+
+    def anexar(self, inicio, barra):
+        with self._trava:
+            self._dados[self._proxima, 0] = inicio
+            self._dados[self._proxima, 1:] = barra
+            self._proxima = (self._proxima + 1) % self.capacidade
+            self.total += 1
+
+    def ultimas(self, n=None):
+        """Cópia das últimas `n` barras em ordem cronológica"""
+        with self._trava:
+            quantidade = len(self) if n is None else min(n, len(self))
+            posicoes = (self._proxima - quantidade + np.arange(quantidade)) % self.capacidade
+            return self._dados[posicoes]
+
+    def para_dataframe(self, n=None):
+        dados = self.ultimas(n)
+        indice = pd.to_datetime(dados[:, 0], unit='s', utc=True)
+        return pd.DataFrame(dados[:, 1:], index=indice, columns=self.COLUNAS[1:])
+
+
+class AgregadorBarras:
+    """
+    Agrega ticks em barras por símbolo e timeframe
+    Uma barra fecha quando a marca d'água (maior timestamp visto - `atraso_maximo`)
+    passa do seu fim; ticks de barras já fechadas são descartados e contados
+    """
+
+    def __init__(self, timeframes=('1m', '5m'), capacidade=500, atraso_maximo=2.0):
+        self.timeframes = list(timeframes)
+        self.duracoes = [TIMEFRAMES_INTRADIARIOS[tf] for tf in self.timeframes]
+        self.capacidade = capacidade
+        self.atraso_maximo = atraso_maximo
+        self.marca_dagua = float('-inf')
+        self.buffers = {}
+        # (symbol, timeframe, inicio) -> [open, high, low, close, volume, instante do open, instante do close]
+        self._abertas = {}
+        self._fechamentos = []  # heap de (fim, chave)
+        self.ticks = 0
+        self.ticks_descartados = 0
+        # `buffer` é chamado pelas threads de ingestão e de score
+        self._trava = threading.Lock()
+
+    def buffer(self, symbol, timeframe):
+        chave = (symbol, timeframe)
+        with self._trava:
+            if chave not in self.buffers:
+                self.buffers[chave] = BufferCircular(self.capacidade)
+            return self.buffers[chave]
+
+    def processar(self, tick):
+        """Inclui o tick e retorna as barras fechadas com o avanço da marca d'água [(symbol, timeframe, inicio)]"""
+        self.ticks += 1
+        if tick.timestamp > self.marca_dagua:
+            self.marca_dagua = tick.timestamp
+        limite = self.marca_dagua - self.atraso_maximo
+
+        for timeframe, duracao in zip(self.timeframes, self.duracoes):
+            inicio = tick.timestamp - tick.timestamp % duracao
+            if inicio + duracao <= limite:
+                self.ticks_descartados += 1
+                continue
+            chave = (tick.symbol, timeframe, inicio)
+            barra = self._abertas.get(chave)
+            if barra is None:
+                self._abertas[chave] = [tick.preco, tick.preco, tick.preco, tick.preco, tick.volume,
+                                        tick.timestamp, tick.timestamp]
+                heapq.heappush(self._fechamentos, (inicio + duracao, chave))
+                continue
+            if tick.preco > barra[1]:
+                barra[1] = tick.preco
+            elif tick.preco < barra[2]:
+                barra[2] = tick.preco
+            barra[4] += tick.volume
+            # Ticks fora de ordem só alteram open/close se forem o primeiro/último da barra
+            if tick.timestamp >= barra[6]:
+                barra[3], barra[6] = tick.preco, tick.timestamp
+            elif tick.timestamp < barra[5]:
+                barra[0], barra[5] = tick.preco, tick.timestamp
+        return self._fechar_ate(limite)
+
+    def _fechar_ate(self, limite):
+        fechadas = []
+        while self._fechamentos and self._fechamentos[0][0] <= limite:
+            _, chave = heapq.heappop(self._fechamentos)
+            symbol, timeframe, inicio = chave
+            self.buffer(symbol, timeframe).anexar(inicio, self._abertas.pop(chave)[:5])
+            fechadas.append(chave)
+        return fechadas
+
+    def fechar_todas(self):
+        """Fecha as barras em aberto (fim do fluxo)"""
+        return self._fechar_ate(float('inf'))
+
+
+# --- SCORE E PIPELINE ---
+
+class AvaliadorIntradiario:
+    """Camada de indicadores/score da análise preditiva aplicada às barras intradiárias"""
+
+    def __init__(self, analisador=None, min_barras=35):
+        self.analisador = analisador or AnalisePreditiva(cache=False)
+        self.min_barras = min_barras
+
+    def avaliar(self, df):
+        if len(df) < self.min_barras:
+            return None
+        indicadores = self.analisador.calcular_todos_indicadores(df, AnalisePreditiva.SAIDAS_SINAIS)
+        sinais = self.analisador.gerar_sinais_trading(df, indicadores)
+        return {
+            'score': self.analisador.score_consolidado_atual(sinais),
+            'rsi': float(indicadores['rsi'].iloc[-1]),
+            'preco': float(df['close'].iloc[-1]),
+            'barra': df.index[-1]
+        }
+
+
+class PipelineTicks:
+    """
+    Fonte -> agregador -> score em duas threads: a ingestão nunca espera o cálculo
+    dos indicadores; barras fechadas pendentes do mesmo símbolo/timeframe são
+    coalescidas (o score usa sempre o buffer mais recente)
+    """
+
+    def __init__(self, fonte, agregador=None, avaliador=None, janela_score=200, ao_atualizar=None):
+        self.fonte = fonte
+        self.agregador = agregador or AgregadorBarras()
+        self.avaliador = avaliador or AvaliadorIntradiario()
+        self.janela_score = janela_score
+        # Chamado como ao_atualizar(symbol, timeframe, resultado) a cada score calculado
+        self.ao_atualizar = ao_atualizar
+        self.scores = {}
+        self._pendentes = {}  # (symbol, timeframe) -> instante de chegada do tick que fechou a barra
+        self._condicao = threading.Condition()
+        self._latencias = deque(maxlen=AMOSTRAS_LATENCIA)
+        self._fim_fluxo = threading.Event()
+        self._threads = []
+        self.inicio = self.fim = None
+        self.barras_fechadas = 0
+        self.scores_calculados = 0
+        self.coalescidas = 0
+
+    def iniciar(self):
+        self.inicio = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._ingerir, name='ingestao_ticks', daemon=True),
+            threading.Thread(target=self._pontuar, name='score_ticks', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def parar(self):
+        self.fonte.fechar()
+
+    def aguardar(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+        return self.metricas()
+
+    def _publicar(self, fechadas, chegada):
+        if not fechadas:
+            return
+        with self._condicao:
+            for symbol, timeframe, _ in fechadas:
+                chave = (symbol, timeframe)
+                if chave in self._pendentes:
+                    self.coalescidas += 1
+                else:
+                    self._pendentes[chave] = chegada
+            self.barras_fechadas += len(fechadas)
+            self._condicao.notify()
+
+    def _ingerir(self):
+        try:
+            for tick in self.fonte:
+                chegada = time.perf_counter()
+                self._publicar(self.agregador.processar(tick), chegada)
+            self._publicar(self.agregador.fechar_todas(), time.perf_counter())
+        finally:
+            self.fim = time.perf_counter()
+            with self._condicao:
+                self._fim_fluxo.set()
+                self._condicao.notify()
+
+    def _pontuar(self):
+        while True:
+            with self._condicao:
+                while not self._pendentes and not self._fim_fluxo.is_set():
+                    self._condicao.wait()
+                if not self._pendentes:
+                    return
+                pendentes, self._pendentes = self._pendentes, {}
+
+            for (symbol, timeframe), chegada in pendentes.items():
+                df = self.agregador.buffer(symbol, timeframe).para_dataframe(self.janela_score)
+                resultado = self.avaliador.avaliar(df)
+                if resultado is None:
+                    continue
+                self._latencias.append(time.perf_counter() - chegada)
+                self.scores[(symbol, timeframe)] = resultado
+                self.scores_calculados += 1
+                if self.ao_atualizar is not None:
+                    self.ao_atualizar(symbol, timeframe, resultado)
+
+    def metricas(self):
+        """Vazão da ingestão, barras, descartes e percentis da latência tick -> score (ms)"""
+        duracao = ((self.fim or time.perf_counter()) - self.inicio) if self.inicio else 0.0
+        latencias = np.array(self._latencias) * 1000
+        percentis = np.percentile(latencias, [50, 95, 99]) if len(latencias) else [np.nan] * 3
+        return {
+            'ticks': self.agregador.ticks,
+            'ticks_por_segundo': self.agregador.ticks / duracao if duracao > 0 else None,
+            'ticks_descartados': self.agregador.ticks_descartados,
+            'barras_fechadas': self.barras_fechadas,
+            'scores_calculados': self.scores_calculados,
+            'coalescidas': self.coalescidas,
+            'latencia_p50_ms': float(percentis[0]),
+            'latencia_p95_ms': float(percentis[1]),
+            'latencia_p99_ms': float(percentis[2]),
+            'latencia_max_ms': float(latencias.max()) if len(latencias) else np.nan
+        }
+
+
+def exemplo_ingestao_ticks():
+    """Exemplo: replay de 2 horas de ticks sintéticos de 20 símbolos, sem pausas"""
+    import os
+    import tempfile
+
+    caminho = os.path.join(tempfile.gettempdir(), 'ticks_sinteticos.csv')
+    simbolos = [f"SIM{i:02d}" for i in range(20)]
+    gravar_ticks_sinteticos(caminho, simbolos, duracao=7200, ticks_por_segundo=100)
+
+    pipeline = PipelineTicks(FonteArquivo(caminho)).iniciar()
+    metricas = pipeline.aguardar()
+    for chave, valor in metricas.items():
+        print(f"{chave:>20}: {valor:,.2f}" if isinstance(valor, float) else f"{chave:>20}: {valor}")
+    for (symbol, timeframe), resultado in sorted(pipeline.scores.items())[:4]:
+        print(f"{symbol} {timeframe}: score {resultado['score']:+.2f} | RSI {resultado['rsi']:.1f} | {resultado['barra']}")
+
+
+if __name__ == "__main__":
+    exemplo_ingestao_ticks()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Perfil de Volume (Volume por Preço)
+Distribui o volume de cada barra uniformemente entre a mínima e a máxima,
+em faixas de preço de largura fixa, com histogramas ponderados
+(np.bincount) e sem laço por barra. A partir do perfil obtém o ponto de
+controle (POC), a área de valor e os nós de alto e baixo volume (HVN/LVN)
+de qualquer janela de datas. O perfil aceita atualizações incrementais
+(novas barras somam, barras que saem da janela subtraem).
+"""
+
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# Fração do volume contida na área de valor
+FRACAO_AREA_VALOR = 0.70
+
+
+def histograma_volume(high, low, volume, largura, origem=0.0):
+    """
+    Volume por faixa de preço; a faixa k cobre [origem + k*largura, origem + (k+1)*largura)
+    Retorna (k_inicial, volumes), com volumes[i] referente à faixa k_inicial + i
+    Barras sem amplitude (high == low) concentram o volume em uma faixa; barras sem volume
+    ou com preços ausentes são ignoradas
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    validas = np.isfinite(high) & np.isfinite(low) & np.isfinite(volume) & (volume > 0)
+    if not validas.any():
+        return 0, np.zeros(0)
+    high, low, volume = np.maximum(high[validas], low[validas]), np.minimum(high[validas], low[validas]), volume[validas]
+
+    # Posições em unidades de faixa; uma máxima exatamente na borda não abre uma faixa vazia
+    a = (low - origem) / largura
+    b = (high - origem) / largura
+    ka = np.floor(a).astype(np.int64)
+    kb = np.maximum(np.ceil(b).astype(np.int64) - 1, ka)
+    k_inicial = int(ka.min())
+    n = int(kb.max()) - k_inicial + 1
+    ia, ib = ka - k_inicial, kb - k_inicial
+
+    mesma_faixa = ia == ib
+    amplitude = np.where(mesma_faixa, 1.0, b - a)
+    densidade = np.where(mesma_faixa, 0.0, volume / amplitude)  # volume por faixa inteira coberta
+
+    # Pontas parciais da barra + faixas intermediárias por diferenças acumuladas
+    volumes = np.bincount(ia, weights=np.where(mesma_faixa, volume, densidade * (ka + 1 - a)), minlength=n)
+    volumes += np.bincount(ib, weights=densidade * (b - kb), minlength=n)
+    diferencas = np.bincount(ia + 1, weights=densidade, minlength=n + 1) - np.bincount(ib, weights=densidade, minlength=n + 1)
+    volumes += np.cumsum(diferencas)[:n]
+    return k_inicial, np.maximum(volumes, 0.0)
+
+
+class PerfilVolume:
+    """
+    Perfil de volume incremental em uma grade de preços fixa
+    Com `janela` (nº de barras), as barras mais antigas saem do perfil à medida que novas chegam
+    """
+
+    def __init__(self, largura, origem=0.0, janela=None, area_valor=FRACAO_AREA_VALOR):
+        if largura <= 0:
+            raise ValueError("A largura das faixas de preço deve ser positiva")
+        self.largura = float(largura)
+        self.origem = float(origem)
+        self.janela = janela
+        self.area_valor = area_valor
+        self._k_inicial = 0
+        self._volumes = np.zeros(0)
+        self._barras = deque() if janela else None  # (high, low, volume) das barras na janela
+
+    @classmethod
+    def de_historico(cls, df, inicio=None, fim=None, n_faixas=50, largura=None, **kwargs):
+        """
+        Perfil das barras entre `inicio` e `fim` (datas, inclusive) de um histórico
+        com colunas high, low e volume. Sem `largura`, a amplitude da janela é
+        dividida em `n_faixas`
+        """
+        if inicio is not None or fim is not None:
+            df = df.loc[inicio:fim]
+        high, low = np.asarray(df['high'], dtype=float), np.asarray(df['low'], dtype=float)
+        if largura is None:
+            amplitude = float(np.nanmax(high) - np.nanmin(low)) if len(high) else 0.0
+            largura = amplitude / n_faixas if amplitude > 0 else 1.0
+        perfil = cls(largura, **kwargs)
+        perfil.adicionar(high, low, df['volume'])
+        return perfil
+
+    # --- ATUALIZAÇÃO ---
+
+    def adicionar(self, high, low, volume):
+        """Soma barras ao perfil (arrays ou Series); com `janela`, remove as que saíram dela"""
+        high = np.atleast_1d(np.asarray(high, dtype=float))
+        low = np.atleast_1d(np.asarray(low, dtype=float))
+        volume = np.atleast_1d(np.asarray(volume, dtype=float))
+        if self.janela:
+            high, low, volume = high[-self.janela:], low[-self.janela:], volume[-self.janela:]
+        self._somar(high, low, volume, 1.0)
+
+        if self.janela:
+            self._barras.extend(zip(high, low, volume))
+            excedente = len(self._barras) - self.janela
+            if excedente > 0:
+                saindo = np.array([self._barras.popleft() for _ in range(excedente)])
+                self._somar(saindo[:, 0], saindo[:, 1], saindo[:, 2], -1.0)
+
+    def remover(self, high, low, volume):
+        """Subtrai barras já incluídas (janelas controladas pelo chamador)"""
+        self._somar(np.atleast_1d(high), np.atleast_1d(low), np.atleast_1d(volume), -1.0)
+
+    def _somar(self, high, low, volume, sinal):
+        k_inicial, volumes = histograma_volume(high, low, volume, self.largura, self.origem)
+        if not len(volumes):
+            return
+        # Amplia a grade quando as barras saem da faixa de preços já vista
+        if not len(self._volumes):
+            self._k_inicial, self._volumes = k_inicial, np.zeros(len(volumes))
+        antes = max(self._k_inicial - k_inicial, 0)
+        depois = max(k_inicial + len(volumes) - (self._k_inicial + len(self._volumes)), 0)
+        if antes or depois:
+            self._volumes = np.pad(self._volumes, (antes, depois))
+            self._k_inicial -= antes
+        inicio = k_inicial - self._k_inicial
+        self._volumes[inicio:inicio + len(volumes)] += sinal * volumes
+        if sinal < 0:
+            # Faixas esvaziadas ficam com resíduos de arredondamento: zera-os
+            self._volumes[self._volumes < 1e-9 * self._volumes.max(initial=0.0)] = 0.0
+
+    # --- CONSULTA ---
+
+    @property
+    def precos(self):
+        """Preço central de cada faixa"""
+        return self.origem + (self._k_inicial + np.arange(len(self._volumes)) + 0.5) * self.largura
+
+    def serie(self):
+        """Volume por preço central da faixa, sem as faixas vazias das pontas"""
+        ocupadas = np.flatnonzero(self._volumes > 0)
+        if not len(ocupadas):
+            return pd.Series(dtype=float, name='volume')
+        fatia = slice(ocupadas[0], ocupadas[-1] + 1)
+        return pd.Series(self._volumes[fatia], index=self.precos[fatia], name='volume')
+
+    def _limites_area_valor(self, volumes, poc):
+        """Expande a partir do POC para o vizinho de maior volume até cobrir a fração da área de valor"""
+        alvo = self.area_valor * volumes.sum()
+        baixo = alto = poc
+        acumulado = volumes[poc]
+        while acumulado < alvo and (baixo > 0 or alto < len(volumes) - 1):
+            abaixo = volumes[baixo - 1] if baixo > 0 else -1.0
+            acima = volumes[alto + 1] if alto < len(volumes) - 1 else -1.0
+            if acima >= abaixo:
+                alto += 1
+                acumulado += acima
+            else:
+                baixo -= 1
+                acumulado += abaixo
+        return baixo, alto
+
+    def niveis(self, suavizacao=3, fator_alto=1.5, fator_baixo=0.5, max_nos=5):
+        """
+        POC, área de valor (alta/baixa) e nós de volume
+        HVN: máximos locais do perfil suavizado com volume >= `fator_alto` x a média das faixas;
+        LVN: mínimos locais internos com volume <= `fator_baixo` x a média. Os nós vêm ordenados
+        por volume (HVN do maior para o menor, LVN do menor para o maior)
+        """
+        serie = self.serie()
+        if serie.empty:
+            return None
+        volumes, precos = serie.to_numpy(), serie.index.to_numpy()
+        poc = int(np.argmax(volumes))
+        baixo, alto = self._limites_area_valor(volumes, poc)
+
+        suave = np.convolve(volumes, np.ones(suavizacao) / suavizacao, mode='same') if suavizacao > 1 else volumes
+        media = suave.mean()
+        interno = np.zeros(len(suave), dtype=bool)
+        interno[1:-1] = True
+        esquerda, direita = np.roll(suave, 1), np.roll(suave, -1)
+        picos = np.flatnonzero(interno & (suave >= esquerda) & (suave > direita) & (suave >= fator_alto * media))
+        vales = np.flatnonzero(interno & (suave <= esquerda) & (suave < direita) & (suave <= fator_baixo * media))
+        picos = picos[np.argsort(-suave[picos])][:max_nos]
+        vales = vales[np.argsort(suave[vales])][:max_nos]
+
+        return {
+            'poc': float(precos[poc]),
+            'area_valor_alta': float(precos[alto] + self.largura / 2),
+            'area_valor_baixa': float(precos[baixo] - self.largura / 2),
+            'nos_alto_volume': [float(p) for p in precos[picos]],
+            'nos_baixo_volume': [float(p) for p in precos[vales]],
+            'largura_faixa': self.largura,
+            'volume_total': float(volumes.sum())
+        }
+
+
+def alvos_perfil_volume(niveis, preco_atual):
+    """
+    Candidatos a preço-alvo a partir do perfil: o nível (POC, limites da área de valor
+    ou HVN) mais próximo acima e abaixo do preço atual, ignorando os que estão a menos
+    de meia faixa dele. Retorna (alvo_alta, alvo_baixa), com None quando não houver nível
+    """
+    if not niveis:
+        return None, None
+    candidatos = [niveis['poc'], niveis['area_valor_alta'], niveis['area_valor_baixa']] + niveis['nos_alto_volume']
+    margem = niveis['largura_faixa'] / 2
+    acima = [p for p in candidatos if p > preco_atual + margem]
+    abaixo = [p for p in candidatos if p < preco_atual - margem]
+    return (min(acima) if acima else None), (max(abaixo) if abaixo else None)
+
+
+def exemplo_perfil_volume():
+    """Exemplo: perfil de 1 ano de um ativo e atualização incremental numa janela móvel"""
+    import time
+    from analise_preditiva import AnalisePreditiva
+
+    df = AnalisePreditiva().buscar_dados_completos('PETR4.SA', '2y')
+    if df is None:
+        return
+    perfil = PerfilVolume.de_historico(df, inicio=df.index[-1] - pd.DateOffset(years=1), n_faixas=60)
+    niveis = perfil.niveis()
+    print(f"POC {niveis['poc']:.2f} | área de valor {niveis['area_valor_baixa']:.2f}-{niveis['area_valor_alta']:.2f}")
+    print(f"HVN: {[round(p, 2) for p in niveis['nos_alto_volume']]} | LVN: {[round(p, 2) for p in niveis['nos_baixo_volume']]}")
+    print(f"Alvos (alta, baixa): {alvos_perfil_volume(niveis, df['close'].iloc[-1])}")
+
+    # Janela móvel de 252 pregões atualizada barra a barra
+    movel = PerfilVolume(largura=niveis['largura_faixa'], janela=252)
+    inicio = time.perf_counter()
+    for high, low, volume in zip(df['high'], df['low'], df['volume']):
+        movel.adicionar(high, low, volume)
+    print(f"{len(df)} atualizações incrementais em {(time.perf_counter() - inicio) * 1000:.1f} ms; "
+          f"POC atual {movel.niveis()['poc']:.2f}")
+
+
+if __name__ == "__main__":
+    exemplo_perfil_volume()
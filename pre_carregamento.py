@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Pré-carregamento em Segundo Plano
+Ao escolher uma categoria, aquece o cache compartilhado com os históricos
+(e a análise básica) dos símbolos sugeridos, cedendo a vez às análises pedidas
+pelo usuário da mesma sessão. As filas de todas as sessões são atendidas por um
+único executor do processo, com poucos workers, em rodízio. Trocar de categoria
+descarta a fila anterior; o símbolo selecionado passa à frente dos demais.
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from analise_preditiva import AnalisePreditiva
+
+# Workers do pré-carregamento no processo, somando todas as sessões
+MAX_WORKERS_PROCESSO = 2
+
+# Análises em primeiro plano em andamento no processo; trabalhos do processo em segundo
+# plano (ex.: fundamentos) aguardam zerar. O pré-carregamento de cada sessão pausa só
+# com as análises da própria sessão (PreCarregador.em_primeiro_plano)
+_PRIMEIRO_PLANO = 0
+_CONDICAO_PRIMEIRO_PLANO = threading.Condition()
+
+
+@contextmanager
+def em_primeiro_plano():
+    """Marca uma análise pedida pelo usuário: os trabalhos em segundo plano do processo cedem a vez"""
+    global _PRIMEIRO_PLANO
+    with _CONDICAO_PRIMEIRO_PLANO:
+        _PRIMEIRO_PLANO += 1
+    try:
+        yield
+    finally:
+        with _CONDICAO_PRIMEIRO_PLANO:
+            _PRIMEIRO_PLANO -= 1
+            _CONDICAO_PRIMEIRO_PLANO.notify_all()
+
+
+def aguardar_primeiro_plano(cancelado=None, intervalo=0.5, espera_maxima=None):
+    """
+    Bloqueia enquanto houver análise em primeiro plano no processo (para trabalhos em
+    segundo plano que devem ceder a vez), no máximo `espera_maxima` segundos, para não
+    parar de vez com sessões sempre ativas; False se `cancelado()` passar a ser verdadeiro
+    """
+    cancelado = cancelado or (lambda: False)
+    limite = None if espera_maxima is None else time.monotonic() + espera_maxima
+    with _CONDICAO_PRIMEIRO_PLANO:
+        while _PRIMEIRO_PLANO > 0 and (limite is None or time.monotonic() < limite):
+            if cancelado():
+                return False
+            _CONDICAO_PRIMEIRO_PLANO.wait(intervalo)
+    return not cancelado()
+
+
+_EXECUTOR = None
+_TRAVA_EXECUTOR = threading.Lock()
+
+
+def obter_executor():
+    """Executor do pré-carregamento compartilhado por todas as sessões (criado na primeira chamada)"""
+    global _EXECUTOR
+    with _TRAVA_EXECUTOR:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS_PROCESSO, thread_name_prefix='pre_carregamento')
+        return _EXECUTOR
+
+
+class PreCarregador:
+    """
+    Fila de pré-carregamento de uma sessão, atendida pelo executor do processo
+    Cada tarefa carrega um símbolo e volta ao fim da fila do executor, alternando
+    as sessões; `max_workers` limita as tarefas simultâneas desta sessão
+    """
+
+    def __init__(self, periodo_base='5y', max_workers=2, executor=None):
+        self.periodo_base = periodo_base
+        self.max_workers = max_workers
+        self.executor = executor or obter_executor()
+        self.categoria = None
+        self.periodo = None
+        self.calcular_analise = True
+        self._fila = deque()
+        self._geracao = 0
+        self._workers = 0
+        self._primeiro_plano = 0
+        self._trava = threading.Lock()
+        self._contagem = {'concluidos': 0, 'erros': 0, 'total': 0}
+
+    @contextmanager
+    def em_primeiro_plano(self):
+        """
+        Análise pedida pelo usuário desta sessão: a fila da sessão pausa até ela terminar
+        (as das demais sessões seguem) e os trabalhos do processo cedem a vez
+        """
+        with self._trava:
+            self._primeiro_plano += 1
+        try:
+            with em_primeiro_plano():
+                yield
+        finally:
+            with self._trava:
+                self._primeiro_plano -= 1
+            self._iniciar_workers()
+
+    def carregar(self, categoria, simbolos, periodo, prioritario=None, calcular_analise=True):
+        """
+        Enfileira os símbolos da categoria; chamadas repetidas com a mesma categoria,
+        período e modo apenas repriorizam (seguro a cada rerun do Streamlit)
+        """
+        with self._trava:
+            mesma_fila = (categoria, periodo, calcular_analise) == (self.categoria, self.periodo, self.calcular_analise)
+            if not mesma_fila:
+                self._geracao += 1
+                self.categoria, self.periodo, self.calcular_analise = categoria, periodo, calcular_analise
+                self._fila = deque(dict.fromkeys(simbolos))
+                self._contagem = {'concluidos': 0, 'erros': 0, 'total': len(self._fila)}
+            self._priorizar(prioritario)
+            geracao = self._geracao
+        self._iniciar_workers()
+        return geracao
+
+    def _iniciar_workers(self):
+        """Submete tarefas ao executor até `max_workers` (nenhuma durante o primeiro plano)"""
+        with self._trava:
+            if self._primeiro_plano:
+                return
+            novos = max(min(self.max_workers, len(self._fila)) - self._workers, 0)
+            self._workers += novos
+        for _ in range(novos):
+            self.executor.submit(self._trabalhar)
+
+    def _priorizar(self, simbolo):
+        if simbolo in self._fila:
+            self._fila.remove(simbolo)
+            self._fila.appendleft(simbolo)
+
+    def priorizar(self, simbolo):
+        """Move o símbolo para o início da fila (se ainda não foi carregado)"""
+        with self._trava:
+            self._priorizar(simbolo)
+
+    def cancelar(self):
+        """Descarta a fila; buscas já iniciadas terminam e permanecem no cache"""
+        with self._trava:
+            self._geracao += 1
+            self._fila.clear()
+            self.categoria = None
+
+    def status(self):
+        with self._trava:
+            return dict(self._contagem, na_fila=len(self._fila), categoria=self.categoria, workers=self._workers)
+
+    def _proximo(self):
+        """Próximo item, ou None (e a tarefa encerra) com a fila vazia ou a sessão em primeiro plano"""
+        with self._trava:
+            if not self._fila or self._primeiro_plano:
+                self._workers -= 1
+                return None
+            return self._fila.popleft(), self._geracao, self.periodo, self.calcular_analise
+
+    def _trabalhar(self):
+        """Carrega um símbolo e volta ao fim da fila do executor (rodízio entre sessões)"""
+        item = self._proximo()
+        if item is None:
+            return
+        simbolo, geracao, periodo, calcular_analise = item
+        cancelado = lambda: self._geracao != geracao
+        analisador = AnalisePreditiva()
+        try:
+            if not cancelado():
+                # Mesmas chaves usadas pelo app, para que o clique seja um acerto de cache
+                dados_base = analisador.obter_historico(simbolo, self.periodo_base)
+                if calcular_analise and not cancelado() and analisador.cache:
+                    analisador.cache.obter(
+                        ('basica', simbolo, periodo),
+                        lambda: analisador.gerar_recomendacao(simbolo, periodo=periodo, dados=dados_base)
+                    )
+            chave = 'concluidos'
+        except Exception:
+            # ErroDados ou falhas inesperadas não derrubam a tarefa; o clique as exibirá
+            chave = 'erros'
+        with self._trava:
+            if self._geracao == geracao:
+                self._contagem[chave] += 1
+        self.executor.submit(self._trabalhar)
+
+
+def exemplo_pre_carregamento():
+    """Exemplo: aquece os ETFs americanos e mede o acesso posterior"""
+    import time
+    from lista_ativos import obter_sugestoes_por_categoria
+
+    pre_carregador = PreCarregador()
+    simbolos = obter_sugestoes_por_categoria('etfs_americanos')
+    pre_carregador.carregar('etfs_americanos', simbolos, '1y', prioritario=simbolos[-1])
+    while pre_carregador.status()['workers']:
+        time.sleep(0.5)
+    print(pre_carregador.status())
+
+    inicio = time.perf_counter()
+    AnalisePreditiva().obter_historico(simbolos[-1], pre_carregador.periodo_base)
+    print(f"Histórico de {simbolos[-1]} após o pré-carregamento: {time.perf_counter() - inicio:.4f}s")
+
+
+if __name__ == "__main__":
+    exemplo_pre_carregamento()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Previsão de Direção com Machine Learning (opcional)
+Usa as saídas dos indicadores técnicos como features para estimar a
+probabilidade de alta do preço em N barras, com validação walk-forward
+estrita, cache de features por símbolo/barra e reajuste incremental
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import HistGradientBoostingClassifier
+from analise_preditiva import AnalisePreditiva
+
+# Barras de histórico recalculadas antes das barras novas: cobrem as janelas móveis e
+# deixam o resíduo das médias exponenciais (MACD, sinal) abaixo de TOLERANCIA_INCREMENTAL
+# em relação ao cálculo completo (com 100 barras a diferença chegava a ~5e-5)
+JANELA_AQUECIMENTO = 400
+TOLERANCIA_INCREMENTAL = 1e-9
+
+
+class CacheFeatures:
+    """
+    Cache de features indexado por símbolo e barra
+    Apenas barras ainda não vistas são calculadas (a partir de uma janela de aquecimento),
+    iguais ao cálculo completo a menos de TOLERANCIA_INCREMENTAL; com `diretorio`, o cache
+    é persistido em pickle por símbolo
+    """
+
+    def __init__(self, diretorio=None):
+        self.diretorio = diretorio
+        self._features = {}
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, symbol):
+        return os.path.join(self.diretorio, f'{symbol}.pkl')
+
+    def _carregar(self, symbol):
+        if symbol not in self._features and self.diretorio and os.path.exists(self._caminho(symbol)):
+            self._features[symbol] = pd.read_pickle(self._caminho(symbol))
+        return self._features.get(symbol)
+
+    def obter(self, symbol, df, calcular):
+        """Retorna as features de todas as barras de `df`, calculando só as barras novas"""
+        existentes = self._carregar(symbol)
+        if (existentes is not None and len(existentes) and existentes.index[-1] in df.index
+                and existentes.index[0] <= df.index[0]):
+            posicao = df.index.get_loc(existentes.index[-1]) + 1
+            if posicao == len(df):
+                return existentes.reindex(df.index)
+            inicio = max(0, posicao - JANELA_AQUECIMENTO)
+            novas = calcular(df.iloc[inicio:]).iloc[posicao - inicio:]
+            features = pd.concat([existentes, novas])
+        else:
+            features = calcular(df)
+
+        self._features[symbol] = features
+        if self.diretorio:
+            features.to_pickle(self._caminho(symbol))
+        return features.reindex(df.index)
+
+
+class PrevisorDirecao:
+    """Classificador da direção do retorno futuro em `horizonte` barras"""
+
+    MODELOS = ('linear', 'arvores')
+
+    def __init__(self, horizonte=5, modelo='linear', janela_minima=250, passo_retreino=20, cache=None):
+        if modelo not in self.MODELOS:
+            raise ValueError(f"Modelo inválido: {modelo}. Use um de {self.MODELOS}")
+        self.horizonte = horizonte
+        self.modelo = modelo
+        self.janela_minima = janela_minima
+        self.passo_retreino = passo_retreino
+        self.cache = cache or CacheFeatures()
+        self.analisador = AnalisePreditiva()
+        # symbol -> {'modelo', 'escalador', 'ultima_barra_rotulada'}
+        self.modelos = {}
+
+    # --- FEATURES E ALVO ---
+
+    def calcular_features(self, df):
+        """Features normalizadas derivadas de `calcular_todos_indicadores`"""
+        indicadores = self.analisador.calcular_todos_indicadores(df)
+        preco = df['close']
+        largura_bb = (indicadores['bb_superior'] - indicadores['bb_inferior']).replace(0, np.nan)
+        retornos = preco.pct_change()
+
+        features = pd.DataFrame({
+            'rsi': indicadores['rsi'] / 100,
+            'macd': indicadores['macd'] / preco,
+            'histograma': indicadores['histograma'] / preco,
+            'bb_percentual': (preco - indicadores['bb_inferior']) / largura_bb,
+            'dist_sma_20': preco / indicadores['sma_20'] - 1,
+            'dist_sma_50': preco / indicadores['sma_50'] - 1,
+            'estocastico_k': indicadores['estocastico_k'] / 100,
+            'williams_r': indicadores['williams_r'] / 100,
+            'retorno_1': retornos,
+            'retorno_5': preco.pct_change(5),
+            'retorno_20': preco.pct_change(20),
+            'volatilidade_20': retornos.rolling(20).std()
+        }, index=df.index)
+        return features.replace([np.inf, -np.inf], np.nan)
+
+    def calcular_alvo(self, df):
+        """1 se o fechamento em `horizonte` barras for maior que o atual; NaN onde ainda é desconhecido"""
+        futuro = df['close'].shift(-self.horizonte)
+        alvo = (futuro > df['close']).astype(float)
+        return alvo.where(futuro.notna())
+
+    def _dados_treino(self, symbol, df):
+        features = self.cache.obter(symbol, df, self.calcular_features)
+        alvo = self.calcular_alvo(df)
+        validos = features.notna().all(axis=1)
+        return features, alvo, validos
+
+    # --- MODELOS ---
+
+    def _novo_modelo(self):
+        if self.modelo == 'linear':
+            # Regressão logística regularizada (L2) treinável incrementalmente
+            return SGDClassifier(loss='log_loss', penalty='l2', alpha=0.01, learning_rate='constant', eta0=0.01, random_state=0)
+        return HistGradientBoostingClassifier(max_iter=100, max_depth=3, learning_rate=0.05, random_state=0)
+
+    def _ajustar_modelo(self, X, y):
+        escalador = StandardScaler().fit(X)
+        modelo = self._novo_modelo()
+        if self.modelo == 'linear':
+            modelo.partial_fit(escalador.transform(X), y, classes=np.array([0.0, 1.0]))
+            # Algumas épocas extras sobre a janela completa no ajuste inicial
+            for _ in range(4):
+                modelo.partial_fit(escalador.transform(X), y)
+        else:
+            modelo.fit(escalador.transform(X), y)
+        return modelo, escalador
+
+    @staticmethod
+    def _probabilidade(modelo, escalador, X):
+        return modelo.predict_proba(escalador.transform(X))[:, 1]
+
+    # --- WALK-FORWARD ---
+
+    def walk_forward(self, symbol, df):
+        """
+        Avaliação walk-forward estrita: a cada `passo_retreino` barras o modelo é
+        retreinado apenas com barras cujo alvo já era conhecido naquele momento
+        e prevê o bloco seguinte. Retorna as probabilidades fora da amostra e métricas.
+        """
+        features, alvo, validos = self._dados_treino(symbol, df)
+        probabilidades = pd.Series(np.nan, index=df.index, name='probabilidade_alta')
+
+        for inicio in range(self.janela_minima, len(df), self.passo_retreino):
+            # Na barra `inicio`, só são conhecidos os alvos das barras <= inicio - 1 - horizonte
+            limite_treino = inicio - self.horizonte
+            treino = validos.iloc[:limite_treino] & alvo.iloc[:limite_treino].notna()
+            if treino.sum() < self.janela_minima // 2 or alvo.iloc[:limite_treino][treino].nunique() < 2:
+                continue
+            modelo, escalador = self._ajustar_modelo(
+                features.iloc[:limite_treino][treino].to_numpy(), alvo.iloc[:limite_treino][treino].to_numpy()
+            )
+            bloco = slice(inicio, min(inicio + self.passo_retreino, len(df)))
+            prever = validos.iloc[bloco]
+            if prever.any():
+                X = features.iloc[bloco][prever].to_numpy()
+                probabilidades.loc[prever[prever].index] = self._probabilidade(modelo, escalador, X)
+
+        avaliadas = probabilidades.notna() & alvo.notna()
+        acertos = ((probabilidades[avaliadas] > 0.5) == (alvo[avaliadas] == 1)).mean() if avaliadas.any() else np.nan
+        brier = ((probabilidades[avaliadas] - alvo[avaliadas]) ** 2).mean() if avaliadas.any() else np.nan
+        return {
+            'probabilidades': probabilidades,
+            'acuracia': acertos,
+            'brier': brier,
+            'previsoes_avaliadas': int(avaliadas.sum())
+        }
+
+    # --- AJUSTE E ATUALIZAÇÃO ---
+
+    def ajustar(self, symbol, df):
+        """Ajusta o modelo do símbolo com todas as barras de alvo conhecido"""
+        features, alvo, validos = self._dados_treino(symbol, df)
+        treino = validos & alvo.notna()
+        if treino.sum() < self.janela_minima // 2 or alvo[treino].nunique() < 2:
+            return False
+        modelo, escalador = self._ajustar_modelo(features[treino].to_numpy(), alvo[treino].to_numpy())
+        self.modelos[symbol] = {
+            'modelo': modelo,
+            'escalador': escalador,
+            'ultima_barra_rotulada': alvo[treino].index[-1]
+        }
+        return True
+
+    def atualizar(self, symbol, df):
+        """
+        Reajuste incremental: o modelo linear recebe apenas as barras cujo alvo
+        tornou-se conhecido desde o último ajuste (partial_fit), na escala fixada
+        em `ajustar`: reescalar as features mudaria o significado dos pesos já
+        aprendidos. O modelo de árvores não suporta aprendizado incremental e é
+        reajustado por completo.
+        """
+        estado = self.modelos.get(symbol)
+        if estado is None or self.modelo != 'linear':
+            return self.ajustar(symbol, df)
+
+        features, alvo, validos = self._dados_treino(symbol, df)
+        novas = validos & alvo.notna() & (df.index > estado['ultima_barra_rotulada'])
+        if not novas.any():
+            return False
+        X, y = features[novas].to_numpy(), alvo[novas].to_numpy()
+        estado['modelo'].partial_fit(estado['escalador'].transform(X), y)
+        estado['ultima_barra_rotulada'] = alvo[novas].index[-1]
+        return True
+
+    def prever_probabilidade(self, symbol, df):
+        """Probabilidade de alta em `horizonte` barras a partir da última barra (ajusta se necessário)"""
+        if symbol not in self.modelos and not self.ajustar(symbol, df):
+            return None
+        features = self.cache.obter(symbol, df, self.calcular_features)
+        ultima = features.iloc[[-1]]
+        if ultima.isna().any(axis=1).iloc[0]:
+            return None
+        estado = self.modelos[symbol]
+        return float(self._probabilidade(estado['modelo'], estado['escalador'], ultima.to_numpy())[0])
+
+    @staticmethod
+    def combinar_score(score_final, probabilidade, peso=0.3):
+        """Combina o score técnico [-1, 1] com a probabilidade de alta mapeada para [-1, 1]"""
+        if probabilidade is None:
+            return score_final
+        return (1 - peso) * score_final + peso * (2 * probabilidade - 1)
+
+
+def _ajustar_simbolo(symbol, df, parametros):
+    """Executado no worker: ajusta um previsor isolado e devolve o estado do modelo"""
+    previsor = PrevisorDirecao(**parametros)
+    if not previsor.ajustar(symbol, df):
+        return symbol, None
+    return symbol, previsor.modelos[symbol]
+
+
+def ajustar_em_paralelo(previsor, dados_por_simbolo, max_workers=None):
+    """Ajusta os modelos de vários símbolos em processos separados e os registra em `previsor`"""
+    parametros = {
+        'horizonte': previsor.horizonte, 'modelo': previsor.modelo,
+        'janela_minima': previsor.janela_minima, 'passo_retreino': previsor.passo_retreino
+    }
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futuros = [executor.submit(_ajustar_simbolo, s, df, parametros) for s, df in dados_por_simbolo.items()]
+        for futuro in futuros:
+            symbol, estado = futuro.result()
+            if estado is not None:
+                previsor.modelos[symbol] = estado
+    return previsor
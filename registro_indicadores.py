@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Registro de Indicadores com Avaliação Preguiçosa
+Cada indicador declara as colunas de entrada, os parâmetros, as
+dependências (saídas de outros indicadores) e as saídas que produz.
+O motor resolve o grafo de dependências e calcula apenas o necessário
+para as saídas pedidas, compartilhando nós comuns.
+"""
+
+
+class Indicador:
+    """Declaração de um nó do grafo de indicadores"""
+
+    def __init__(self, nome, funcao, saidas=None, entradas=('close',), dependencias=(), parametros=None, interno=False):
+        self.nome = nome
+        self.funcao = funcao
+        self.saidas = list(saidas or [nome])
+        self.entradas = list(entradas)
+        self.dependencias = list(dependencias)
+        self.parametros = dict(parametros or {})
+        # Nós internos (blocos compartilhados) não aparecem em "todos os indicadores"
+        self.interno = interno
+
+    def calcular(self, df, valores):
+        argumentos = [df[coluna] for coluna in self.entradas] + [valores[d] for d in self.dependencias]
+        resultado = self.funcao(*argumentos, **self.parametros)
+        if not isinstance(resultado, dict):
+            if len(self.saidas) != 1:
+                raise ValueError(f"Indicador '{self.nome}' deve retornar um dict com as saídas {self.saidas}")
+            resultado = {self.saidas[0]: resultado}
+        return {saida: resultado[saida] for saida in self.saidas}
+
+
+class RegistroIndicadores:
+    """Registro de indicadores e motor de avaliação do grafo"""
+
+    def __init__(self):
+        self._indicadores = {}
+        self._produtor = {}
+
+    def registrar(self, nome, funcao, saidas=None, entradas=('close',), dependencias=(), parametros=None, interno=False):
+        """
+        Registra (ou substitui) um indicador
+        `funcao(*colunas_de_entrada, *dependencias, **parametros)` retorna uma Series
+        (saída única) ou um dict {saida: Series}
+        """
+        indicador = Indicador(nome, funcao, saidas, entradas, dependencias, parametros, interno)
+        # Conflitos verificados antes de qualquer alteração: um erro mantém o registro intacto
+        for saida in indicador.saidas:
+            dono = self._produtor.get(saida)
+            if dono is not None and dono != nome:
+                raise ValueError(f"A saída '{saida}' já é produzida pelo indicador '{dono}'")
+        anterior = self._indicadores.get(nome)
+        if anterior is not None:
+            for saida in anterior.saidas:
+                self._produtor.pop(saida, None)
+        self._indicadores[nome] = indicador
+        for saida in indicador.saidas:
+            self._produtor[saida] = nome
+        return indicador
+
+    def saidas_disponiveis(self):
+        """Saídas públicas na ordem de registro"""
+        return [s for ind in self._indicadores.values() if not ind.interno for s in ind.saidas]
+
+    def resolver(self, saidas):
+        """Ordem topológica dos indicadores necessários para produzir `saidas`"""
+        ordem, visitados, em_visita = [], set(), set()
+
+        def visitar(saida):
+            nome = self._produtor.get(saida)
+            if nome is None:
+                raise KeyError(f"Nenhum indicador registrado produz '{saida}'")
+            if nome in visitados:
+                return
+            if nome in em_visita:
+                raise ValueError(f"Dependência circular envolvendo o indicador '{nome}'")
+            em_visita.add(nome)
+            for dependencia in self._indicadores[nome].dependencias:
+                visitar(dependencia)
+            em_visita.discard(nome)
+            visitados.add(nome)
+            ordem.append(self._indicadores[nome])
+
+        for saida in saidas:
+            visitar(saida)
+        return ordem
+
+    def calcular(self, df, saidas=None):
+        """Calcula somente os indicadores necessários e retorna {saida: Series} das saídas pedidas"""
+        saidas = self.saidas_disponiveis() if saidas is None else list(saidas)
+        valores = {}
+        for indicador in self.resolver(saidas):
+            valores.update(indicador.calcular(df, valores))
+        return {saida: valores[saida] for saida in saidas}
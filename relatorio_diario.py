@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Relatório Matinal em HTML Estático
+Gera, a partir da versão atual do snapshot de recomendações, uma página por
+símbolo (resumo da recomendação avançada + gráfico de
+`criar_grafico_recomendacao` sobre as séries reduzidas do snapshot) e uma
+página de índice. As figuras são renderizadas em um pool de processos, cada
+worker grava as suas páginas, e todas referenciam um único plotly.min.js.
+Símbolos cujo conteúdo (hash do resumo e da série) não mudou desde a última
+execução não são renderizados de novo.
+"""
+
+import os
+import re
+import json
+import html
+import hashlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import plotly
+from plotly.offline import get_plotlyjs
+from snapshot_recomendacoes import SnapshotRecomendacoes
+from lista_ativos import obter_todos_ativos
+
+DIRETORIO_PADRAO = os.path.join('dados', 'relatorio')
+
+ARQUIVO_PLOTLY = 'plotly.min.js'
+ARQUIVO_MANIFESTO = 'manifesto.json'
+
+# Alterar ao mudar o modelo das páginas: invalida todas as páginas já geradas
+VERSAO_LAYOUT = 1
+
+# Classe de estilo de cada recomendação (as mesmas cores do app)
+CLASSES_RECOMENDACAO = {
+    "COMPRA MUITO FORTE": "strong-buy", "COMPRA FORTE": "strong-buy", "COMPRA": "buy",
+    "VENDA MUITO FORTE": "strong-sell", "VENDA FORTE": "strong-sell", "VENDA": "sell", "NEUTRO": "neutral"
+}
+
+ESTILO = """
+body { font-family: -apple-system, "Segoe UI", Roboto, sans-serif; margin: 2rem; color: #212529; }
+h1 { color: #1E88E5; }
+table { border-collapse: collapse; margin-bottom: 1.5rem; }
+th, td { padding: 0.35rem 0.8rem; border-bottom: 1px solid #dee2e6; text-align: left; }
+td.numero { text-align: right; font-variant-numeric: tabular-nums; }
+.recommendation-box { padding: 1rem; border-radius: 0.5rem; font-weight: bold; font-size: 1.2rem; margin-bottom: 1rem; }
+.strong-buy { background-color: #d4edda; color: #155724; border-left: 5px solid #28a745; }
+.buy { background-color: #e2f0d9; color: #38761d; border-left: 5px solid #6aa84f; }
+.neutral { background-color: #f8f9fa; color: #495057; border-left: 5px solid #6c757d; }
+.sell { background-color: #f8d7da; color: #721c24; border-left: 5px solid #dc3545; }
+.strong-sell { background-color: #f1c2c6; color: #a94442; border-left: 5px solid #cc0000; }
+"""
+
+# Sistema de recomendações de cada processo do pool (criado na primeira tarefa)
+_SISTEMA = None
+
+
+def nome_arquivo(symbol):
+    """Nome da página do símbolo (caracteres como ^ e = viram _)"""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', symbol) + '.html'
+
+
+def hash_conteudo(resumo, serie):
+    """Hash das entradas de uma página: resumo e série gravados no snapshot + versão do layout"""
+    digest = hashlib.sha256(f"{VERSAO_LAYOUT}|{plotly.__version__}|".encode())
+    digest.update(resumo.encode())
+    digest.update(serie.encode())
+    return digest.hexdigest()
+
+
+def _formatar(valor, formato):
+    return format(valor, formato) if valor is not None else "-"
+
+
+def _tabela(linhas):
+    """Tabela HTML de pares (rótulo, valor já formatado)"""
+    corpo = "".join(f"<tr><th>{html.escape(rotulo)}</th><td class=\"numero\">{html.escape(valor)}</td></tr>"
+                    for rotulo, valor in linhas)
+    return f"<table>{corpo}</table>"
+
+
+def _pagina(titulo, corpo, com_plotly=False):
+    script = f'<script src="{ARQUIVO_PLOTLY}" charset="utf-8"></script>' if com_plotly else ""
+    return (f"<!DOCTYPE html><html lang=\"pt-BR\"><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(titulo)}</title><style>{ESTILO}</style>{script}</head>"
+            f"<body>{corpo}</body></html>")
+
+
+def pagina_simbolo(resultado, figura_html, criado_em):
+    """HTML da página de um símbolo (resumo da recomendação e o gráfico já renderizado)"""
+    symbol = html.escape(resultado['symbol'])
+    classe = CLASSES_RECOMENDACAO.get(resultado['recomendacao'], 'neutral')
+    principal = _tabela([
+        ("Preço atual", _formatar(resultado['preco_atual'], '.2f')),
+        ("Score final", _formatar(resultado['score_final'], '+.3f')),
+        ("Alvo 1", _formatar(resultado['preco_alvo_1'], '.2f')),
+        ("Alvo 2", _formatar(resultado['preco_alvo_2'], '.2f')),
+        ("Stop loss", _formatar(resultado['stop_loss'], '.2f')),
+        ("Stop por ATR (3x)", _formatar(resultado.get('stop_loss_atr'), '.2f')),
+        ("RSI", _formatar(resultado['rsi_atual'], '.1f')),
+    ])
+    risco = resultado.get('risco') or {}
+    tabela_risco = _tabela([
+        ("VaR 95% (histórico)", _formatar(risco.get('var_historico'), '.2%')),
+        ("CVaR 95% (histórico)", _formatar(risco.get('cvar_historico'), '.2%')),
+        ("Volatilidade anual", _formatar(risco.get('volatilidade_anual'), '.1%')),
+        ("Drawdown máximo", _formatar(risco.get('max_drawdown'), '.1%')),
+        ("Sharpe", _formatar(risco.get('sharpe'), '.2f')),
+        ("Beta", _formatar(risco.get('beta'), '.2f')),
+    ])
+    analise = resultado.get('analise_detalhada') or {}
+    tabela_analise = _tabela([
+        ("RSI", analise.get('tendencia_rsi', '-')),
+        ("Bollinger Bands", analise.get('posicao_bb', '-')),
+        ("MACD", analise.get('momentum_macd', '-')),
+        ("Força da tendência", analise.get('forca_tendencia', '-')),
+        ("Volatilidade", analise.get('volatilidade', '-')),
+    ])
+    padroes = ", ".join(resultado.get('padroes_recentes') or []) or "Nenhum"
+    corpo = (
+        f"<p><a href=\"index.html\">&larr; Índice</a></p><h1>{symbol}</h1>"
+        f"<div class=\"recommendation-box {classe}\">{html.escape(resultado['recomendacao'])}"
+        f"<br><small>Confiança: {html.escape(resultado['confianca'])}</small></div>"
+        f"<div style=\"display: flex; gap: 2rem; flex-wrap: wrap\">"
+        f"<div><h3>Recomendação</h3>{principal}</div><div><h3>Risco</h3>{tabela_risco}</div>"
+        f"<div><h3>Análise técnica</h3>{tabela_analise}</div></div>"
+        f"<p><strong>Padrões de candlestick (últimos 5 pregões):</strong> {html.escape(padroes)}</p>"
+        f"{figura_html}<p><small>Gerado em {html.escape(criado_em)}</small></p>"
+    )
+    return _pagina(f"{resultado['symbol']} - {resultado['recomendacao']}", corpo, com_plotly=True)
+
+
+def _gravar(caminho, conteudo):
+    """Grava em arquivo temporário e substitui: leitores nunca veem uma página pela metade"""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+def _renderizar_bloco(bloco, diretorio, criado_em):
+    """Renderiza e grava as páginas de um bloco [(symbol, resumo, serie, hash)]; retorna [(symbol, hash, erro)]"""
+    global _SISTEMA
+    if _SISTEMA is None:
+        from sistema_recomendacoes import SistemaRecomendacoes
+        _SISTEMA = SistemaRecomendacoes()
+
+    gerados = []
+    for symbol, resumo, serie, digest in bloco:
+        try:
+            resultado = SnapshotRecomendacoes.montar_resultado(resumo, serie)
+            figura = _SISTEMA.criar_grafico_recomendacao(resultado)
+            figura_html = figura.to_html(full_html=False, include_plotlyjs=False, config={'responsive': True})
+            _gravar(os.path.join(diretorio, nome_arquivo(symbol)), pagina_simbolo(resultado, figura_html, criado_em))
+            gerados.append((symbol, digest, None))
+        except Exception as e:
+            gerados.append((symbol, None, str(e)))
+    return gerados
+
+
+class GeradorRelatorio:
+    """Relatório estático do universo a partir do snapshot, com renderização paralela e incremental"""
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, snapshot=None, max_workers=None, tamanho_bloco=8):
+        self.diretorio = diretorio
+        self.snapshot = snapshot or SnapshotRecomendacoes()
+        self.max_workers = max_workers
+        self.tamanho_bloco = tamanho_bloco
+
+    def _carregar_manifesto(self):
+        try:
+            with open(os.path.join(self.diretorio, ARQUIVO_MANIFESTO), encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return {}
+
+    def _garantir_plotly(self, manifesto):
+        """Um único plotly.min.js por diretório, regravado só quando a versão do plotly muda"""
+        caminho = os.path.join(self.diretorio, ARQUIVO_PLOTLY)
+        if manifesto.get('plotly') != plotly.__version__ or not os.path.exists(caminho):
+            _gravar(caminho, get_plotlyjs())
+
+    def gerar(self, simbolos=None, forcar=False):
+        """
+        Gera as páginas dos símbolos (todos os do snapshot, por padrão) e o índice
+        Retorna {'geradas', 'inalteradas', 'falhas', 'indice'}
+        """
+        os.makedirs(self.diretorio, exist_ok=True)
+        atual = self.snapshot.versao_atual()
+        if atual is None:
+            raise RuntimeError("O snapshot de recomendações ainda não foi materializado")
+        criado_em = datetime.now().isoformat(sep=' ', timespec='minutes')
+        manifesto = self._carregar_manifesto()
+        paginas = manifesto.get('paginas', {})
+        self._garantir_plotly(manifesto)
+
+        # O índice cobre sempre o snapshot inteiro; `simbolos` só escolhe as páginas a renderizar
+        todos = self.snapshot.listar_conteudos('avancada')
+        conteudos = todos
+        if simbolos is not None:
+            simbolos = set(simbolos)
+            conteudos = [conteudo for conteudo in todos if conteudo[0] in simbolos]
+        pendentes, inalteradas = [], 0
+        for symbol, resumo, serie in conteudos:
+            digest = hash_conteudo(resumo, serie)
+            if not forcar and paginas.get(symbol) == digest and \
+                    os.path.exists(os.path.join(self.diretorio, nome_arquivo(symbol))):
+                inalteradas += 1
+            else:
+                pendentes.append((symbol, resumo, serie, digest))
+
+        falhas = {}
+        blocos = [pendentes[i:i + self.tamanho_bloco] for i in range(0, len(pendentes), self.tamanho_bloco)]
+        if blocos:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futuros = [executor.submit(_renderizar_bloco, bloco, self.diretorio, criado_em) for bloco in blocos]
+                for futuro in as_completed(futuros):
+                    for symbol, digest, erro in futuro.result():
+                        if erro is None:
+                            paginas[symbol] = digest
+                        else:
+                            falhas[symbol] = erro
+                            paginas.pop(symbol, None)
+
+        com_pagina = {symbol for symbol in paginas if os.path.exists(os.path.join(self.diretorio, nome_arquivo(symbol)))}
+        indice = self.gerar_indice(todos, atual, criado_em, com_pagina)
+        _gravar(os.path.join(self.diretorio, ARQUIVO_MANIFESTO), json.dumps(
+            {'plotly': plotly.__version__, 'versao_snapshot': atual[0], 'paginas': paginas}, indent=1))
+        return {'geradas': len(pendentes) - len(falhas), 'inalteradas': inalteradas,
+                'falhas': falhas, 'indice': indice}
+
+    def gerar_indice(self, conteudos, versao, criado_em, com_pagina=None):
+        """
+        Página de índice: todos os símbolos do snapshot por score, com link para cada página
+        (só os de `com_pagina`, se informado; os demais aparecem sem link)
+        """
+        nomes = {symbol: (nome, categoria) for categoria, ativos in obter_todos_ativos().items()
+                 for symbol, nome in ativos.items()}
+        resumos = sorted((json.loads(resumo) for _, resumo, _ in conteudos),
+                         key=lambda r: r['score_final'] if r['score_final'] is not None else float('-inf'),
+                         reverse=True)
+        linhas = []
+        for resultado in resumos:
+            symbol = resultado['symbol']
+            nome, categoria = nomes.get(symbol, ("", ""))
+            classe = CLASSES_RECOMENDACAO.get(resultado['recomendacao'], 'neutral')
+            link = html.escape(symbol)
+            if com_pagina is None or symbol in com_pagina:
+                link = f"<a href=\"{nome_arquivo(symbol)}\">{link}</a>"
+            linhas.append(
+                f"<tr><td>{link}</td>"
+                f"<td>{html.escape(nome)}</td><td>{html.escape(categoria)}</td>"
+                f"<td class=\"{classe}\">{html.escape(resultado['recomendacao'])}</td>"
+                f"<td class=\"numero\">{_formatar(resultado['score_final'], '+.3f')}</td>"
+                f"<td class=\"numero\">{_formatar(resultado['preco_atual'], '.2f')}</td>"
+                f"<td class=\"numero\">{_formatar(resultado['preco_alvo_1'], '.2f')}</td>"
+                f"<td class=\"numero\">{_formatar(resultado['stop_loss'], '.2f')}</td></tr>"
+            )
+        corpo = (
+            f"<h1>Relatório Matinal</h1><p>Snapshot {versao[0]} de {html.escape(versao[2])} "
+            f"(período {html.escape(versao[1])}) | {len(resumos)} símbolos | gerado em {html.escape(criado_em)}</p>"
+            "<table><tr><th>Símbolo</th><th>Nome</th><th>Categoria</th><th>Recomendação</th><th>Score</th>"
+            f"<th>Preço</th><th>Alvo 1</th><th>Stop</th></tr>{''.join(linhas)}</table>"
+        )
+        caminho = os.path.join(self.diretorio, 'index.html')
+        _gravar(caminho, _pagina("Relatório Matinal", corpo))
+        return caminho
+
+
+def exemplo_relatorio_diario():
+    """Exemplo: relatório do snapshot atual; a segunda execução só regrava o índice"""
+    import time
+
+    gerador = GeradorRelatorio()
+    for execucao in ("Primeira", "Segunda"):
+        inicio = time.perf_counter()
+        relatorio = gerador.gerar()
+        print(f"{execucao} execução: {relatorio['geradas']} páginas geradas, {relatorio['inalteradas']} "
+              f"inalteradas em {time.perf_counter() - inicio:.1f}s -> {relatorio['indice']}")
+        if relatorio['falhas']:
+            print(f"Falhas: {', '.join(relatorio['falhas'])}")
+
+
+if __name__ == "__main__":
+    # Job matinal (após o snapshot noturno): python relatorio_diario.py
+    exemplo_relatorio_diario()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Scanner de Pares e Cointegração
+Testa pares candidatos do catálogo (dentro ou entre categorias de
+`lista_ativos`) em três etapas: pré-filtro barato pela correlação dos
+retornos, teste de Engle-Granger vetorizado em blocos de pares distribuídos
+em um pool de processos, e sinais de entrada/saída pelo z-score do spread
+"""
+
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from universo import simbolos_por_categoria, carregar_matriz_fechamentos
+
+# Valores críticos assintóticos de MacKinnon para o teste de Engle-Granger
+# com duas variáveis e constante na regressão de cointegração
+VALORES_CRITICOS_EG = {0.01: -3.90, 0.05: -3.34, 0.10: -3.04}
+
+# Matriz de log-preços compartilhada por cada processo do pool
+_LOG_PRECOS = None
+
+
+def engle_granger_em_bloco(y, x):
+    """
+    Engle-Granger vetorizado para um bloco de pares (colunas de `y` contra `x`, shape (T, B))
+    1) y = alfa + beta * x por MQO; 2) ADF com uma defasagem nos resíduos, sem constante:
+       Δe_t = gama * e_{t-1} + phi * Δe_{t-1}
+    Retorna arrays (B,) com alfa, beta, estatística t de gama e meia-vida (barras)
+    """
+    media_x, media_y = x.mean(axis=0), y.mean(axis=0)
+    dx, dy = x - media_x, y - media_y
+    beta = (dx * dy).sum(axis=0) / (dx * dx).sum(axis=0)
+    alfa = media_y - beta * media_x
+    residuos = y - alfa - beta * x
+
+    delta = np.diff(residuos, axis=0)
+    alvo, defasado, delta_defasado = delta[1:], residuos[1:-1], delta[:-1]
+    s11 = (defasado * defasado).sum(axis=0)
+    s12 = (defasado * delta_defasado).sum(axis=0)
+    s22 = (delta_defasado * delta_defasado).sum(axis=0)
+    r1 = (defasado * alvo).sum(axis=0)
+    r2 = (delta_defasado * alvo).sum(axis=0)
+    determinante = s11 * s22 - s12 * s12
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gama = (s22 * r1 - s12 * r2) / determinante
+        phi = (s11 * r2 - s12 * r1) / determinante
+        erro = alvo - gama * defasado - phi * delta_defasado
+        variancia = (erro * erro).sum(axis=0) / (len(alvo) - 2)
+        estatistica = gama / np.sqrt(variancia * s22 / determinante)
+        meia_vida = np.where(gama < 0, -np.log(2) / np.log1p(gama), np.inf)
+
+    return {'alfa': alfa, 'beta': beta, 'estatistica': estatistica, 'meia_vida': meia_vida}
+
+
+def _inicializar_worker(log_precos):
+    global _LOG_PRECOS
+    _LOG_PRECOS = log_precos
+
+
+def _testar_bloco(indices_y, indices_x):
+    """
+    Executado no worker: testa o bloco nas duas direções e mantém os parâmetros da
+    mais estacionária; a estatística da outra direção é devolvida para o critério conservador
+    """
+    y, x = _LOG_PRECOS[:, indices_y], _LOG_PRECOS[:, indices_x]
+    direto = engle_granger_em_bloco(y, x)
+    inverso = engle_granger_em_bloco(x, y)
+    usar_inverso = inverso['estatistica'] < direto['estatistica']
+    resultado = {chave: np.where(usar_inverso, inverso[chave], direto[chave]) for chave in direto}
+    resultado['estatistica_oposta'] = np.where(usar_inverso, direto['estatistica'], inverso['estatistica'])
+    resultado['invertido'] = usar_inverso
+    return resultado
+
+
+def zscore_movel(spread, janela=20):
+    """Z-score móvel de um spread (Series) ou de vários spreads (colunas de um DataFrame)"""
+    media = spread.rolling(window=janela).mean()
+    desvio = spread.rolling(window=janela).std()
+    return (spread - media) / desvio.mask(desvio == 0)
+
+
+def posicao_por_zscore(zscore, entrada=2.0, saida=0.5):
+    """
+    Posição no spread (int8) a partir do z-score, com histerese
+    z > entrada: vende o spread (-1); z < -entrada: compra (1); |z| < saida: zera.
+    Entre os limiares a posição anterior é mantida.
+    """
+    posicao = zscore * np.nan
+    posicao[zscore > entrada] = -1
+    posicao[zscore < -entrada] = 1
+    posicao[zscore.abs() < saida] = 0
+    return posicao.ffill().fillna(0).astype(np.int8)
+
+
+def sinais_zscore(spread, janela=20, entrada=2.0, saida=0.5):
+    """Spread, z-score móvel e posição de um par"""
+    zscore = zscore_movel(spread, janela)
+    return pd.DataFrame({'spread': spread, 'zscore': zscore, 'posicao': posicao_por_zscore(zscore, entrada, saida)})
+
+
+class ScannerPares:
+    """Varredura de pares cointegrados sobre uma matriz de fechamentos"""
+
+    def __init__(self, janela=500, limiar_correlacao=0.7, nivel_significancia=0.05,
+                 tamanho_bloco=256, max_workers=None, janela_zscore=20, entrada_z=2.0, saida_z=0.5):
+        if nivel_significancia not in VALORES_CRITICOS_EG:
+            raise ValueError(f"Nível inválido: {nivel_significancia}. Use um de {sorted(VALORES_CRITICOS_EG)}")
+        self.janela = janela
+        self.limiar_correlacao = limiar_correlacao
+        self.nivel_significancia = nivel_significancia
+        self.tamanho_bloco = tamanho_bloco
+        self.max_workers = max_workers
+        self.janela_zscore = janela_zscore
+        self.entrada_z = entrada_z
+        self.saida_z = saida_z
+
+    # --- CANDIDATOS E PRÉ-FILTRO ---
+
+    @staticmethod
+    def pares_candidatos(categorias, entre_categorias=False):
+        """Pares (a, b) dentro de cada categoria ou, com `entre_categorias`, entre todos os símbolos"""
+        if entre_categorias:
+            simbolos = list(dict.fromkeys(s for ativos in categorias.values() for s in ativos))
+            return list(combinations(simbolos, 2))
+        pares = []
+        for ativos in categorias.values():
+            pares.extend(combinations(list(dict.fromkeys(ativos)), 2))
+        return list(dict.fromkeys(pares))
+
+    def preparar_matriz(self, matriz):
+        """Últimas `janela` barras, apenas símbolos completos e positivos nessa janela"""
+        recorte = matriz.iloc[-self.janela:]
+        completos = recorte.columns[recorte.notna().all() & (recorte > 0).all()]
+        return recorte[completos]
+
+    def pre_filtrar(self, matriz, pares):
+        """Mantém os pares cuja correlação dos log-retornos atinge `limiar_correlacao`"""
+        posicao = {symbol: i for i, symbol in enumerate(matriz.columns)}
+        pares = [(a, b) for a, b in pares if a in posicao and b in posicao]
+        if not pares:
+            return [], np.array([])
+
+        retornos = np.diff(np.log(matriz.to_numpy()), axis=0)
+        correlacoes = np.corrcoef(retornos, rowvar=False)
+        a = np.array([posicao[p[0]] for p in pares])
+        b = np.array([posicao[p[1]] for p in pares])
+        valores = correlacoes[a, b]
+        mantidos = valores >= self.limiar_correlacao
+        return [par for par, manter in zip(pares, mantidos) if manter], valores[mantidos]
+
+    # --- VARREDURA ---
+
+    def escanear(self, matriz, categorias=None, entre_categorias=False):
+        """
+        Varre os pares candidatos e retorna um DataFrame ordenado pela estatística de
+        Engle-Granger (mais negativa primeiro), com beta, meia-vida, cointegração e
+        o z-score / posição atuais dos pares cointegrados
+        `categorias`: {categoria: [símbolos]}; padrão: todas as categorias do catálogo
+        """
+        matriz = self.preparar_matriz(matriz)
+        categorias = categorias if categorias is not None else simbolos_por_categoria()
+        pares, correlacoes = self.pre_filtrar(matriz, self.pares_candidatos(categorias, entre_categorias))
+        if not pares:
+            return pd.DataFrame()
+
+        log_precos = np.log(matriz.to_numpy())
+        posicao = {symbol: i for i, symbol in enumerate(matriz.columns)}
+        indices_a = np.array([posicao[a] for a, _ in pares])
+        indices_b = np.array([posicao[b] for _, b in pares])
+        blocos = [slice(i, i + self.tamanho_bloco) for i in range(0, len(pares), self.tamanho_bloco)]
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_inicializar_worker,
+                                 initargs=(log_precos,)) as executor:
+            futuros = [executor.submit(_testar_bloco, indices_a[bloco], indices_b[bloco]) for bloco in blocos]
+            partes = [futuro.result() for futuro in futuros]
+        testes = {chave: np.concatenate([parte[chave] for parte in partes]) for chave in partes[0]}
+
+        # Na direção invertida, o primeiro símbolo do par passa a ser a variável explicativa
+        invertido = testes['invertido']
+        resultado = pd.DataFrame({
+            'simbolo_y': np.where(invertido, [b for _, b in pares], [a for a, _ in pares]),
+            'simbolo_x': np.where(invertido, [a for a, _ in pares], [b for _, b in pares]),
+            'correlacao': correlacoes,
+            'alfa': testes['alfa'],
+            'beta': testes['beta'],
+            'estatistica_eg': testes['estatistica'],
+            'estatistica_eg_oposta': testes['estatistica_oposta'],
+            'meia_vida': testes['meia_vida'],
+        })
+        # Escolher a melhor direção infla o erro tipo I: exige rejeição nas duas direções
+        critico = VALORES_CRITICOS_EG[self.nivel_significancia]
+        resultado['cointegrado'] = resultado[['estatistica_eg', 'estatistica_eg_oposta']].max(axis=1) < critico
+
+        # Z-score e posição atuais de todos os pares cointegrados de uma vez
+        resultado['zscore_atual'] = np.nan
+        resultado['posicao'] = np.zeros(len(resultado), dtype=np.int8)
+        cointegrados = resultado['cointegrado'].to_numpy()
+        if cointegrados.any():
+            selecionados = resultado[cointegrados]
+            log_matriz = np.log(matriz)
+            spreads = pd.DataFrame(
+                log_matriz[selecionados['simbolo_y']].to_numpy() - selecionados['alfa'].to_numpy()
+                - selecionados['beta'].to_numpy() * log_matriz[selecionados['simbolo_x']].to_numpy(),
+                index=matriz.index
+            )
+            zscores = zscore_movel(spreads, self.janela_zscore)
+            posicoes = posicao_por_zscore(zscores, self.entrada_z, self.saida_z)
+            resultado.loc[cointegrados, 'zscore_atual'] = zscores.iloc[-1].to_numpy()
+            resultado.loc[cointegrados, 'posicao'] = posicoes.iloc[-1].to_numpy()
+
+        return resultado.sort_values('estatistica_eg').reset_index(drop=True)
+
+    def sinais_par(self, matriz, simbolo_y, simbolo_x, alfa, beta):
+        """Spread log(y) - alfa - beta * log(x) com z-score e sinais de entrada/saída"""
+        spread = np.log(matriz[simbolo_y]) - alfa - beta * np.log(matriz[simbolo_x])
+        return sinais_zscore(spread, self.janela_zscore, self.entrada_z, self.saida_z)
+
+
+def exemplo_scanner_pares():
+    """Exemplo: pares cointegrados entre ações brasileiras e ETFs brasileiros"""
+    categorias = simbolos_por_categoria(['acoes_brasileiras', 'etfs_brasileiros'])
+    simbolos = [s for ativos in categorias.values() for s in ativos]
+    matriz, falhas = carregar_matriz_fechamentos(simbolos, periodo='2y')
+    if falhas:
+        print(f"Símbolos ignorados: {', '.join(sorted(falhas))}")
+
+    resultado = ScannerPares().escanear(matriz, categorias, entre_categorias=True)
+    if resultado.empty:
+        print("Nenhum par passou pelo pré-filtro de correlação")
+        return
+
+    cointegrados = resultado[resultado['cointegrado']]
+    print(f"=== {len(cointegrados)} PARES COINTEGRADOS ({len(resultado)} testados) ===")
+    for linha in cointegrados.head(10).itertuples():
+        print(f"{linha.simbolo_y} ~ {linha.simbolo_x}: EG={linha.estatistica_eg:.2f} "
+              f"beta={linha.beta:.2f} meia-vida={linha.meia_vida:.1f} z={linha.zscore_atual:.2f} "
+              f"posição={linha.posicao}")
+
+
+if __name__ == "__main__":
+    exemplo_scanner_pares()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Simulador de Carteira Multiativos
+Aloca uma cesta de ativos segundo o histórico de scores das recomendações
+(top-k, ponderado pelo score ou paridade de volatilidade), com frequência
+de rebalanceamento, custos de transação e de câmbio e caixa em BRL ou USD.
+Toda a simulação opera sobre matrizes datas x símbolos, sem laços por data.
+"""
+
+import numbers
+import numpy as np
+import pandas as pd
+from analise_risco import AnaliseRisco
+from universo import alinhar_serie, carregar_cambio, matriz_fechamentos, moeda_do_simbolo
+
+PERIODOS_ANO = 252
+
+# Barras anteriores recalculadas ao estender os scores: cobrem as janelas dos indicadores
+# e deixam o resíduo das médias exponenciais (MACD, ADX) abaixo de 1e-12
+AQUECIMENTO_SCORES = 400
+
+
+def _score_final(df, sistema):
+    indicadores = sistema.analisador.calcular_todos_indicadores(df)
+    if indicadores is None:
+        return None
+    return sistema.calcular_score_detalhado(df, indicadores)['score_final']
+
+
+def estender_scores(anteriores, df, sistema=None, aquecimento=AQUECIMENTO_SCORES):
+    """
+    Score final do histórico `df` reaproveitando a série `anteriores` de um cálculo anterior:
+    só a última data conhecida (pode ter sido parcial) e as posteriores são calculadas,
+    sobre as `aquecimento` barras que as antecedem. Sem `anteriores`, calcula tudo
+    """
+    from sistema_recomendacoes import SistemaRecomendacoes
+
+    sistema = sistema or SistemaRecomendacoes()
+    if anteriores is None or anteriores.empty:
+        return _score_final(df, sistema)
+    novas = int((df.index >= anteriores.index[-1]).sum())
+    if len(df) - novas < aquecimento:
+        return _score_final(df, sistema)
+    recentes = _score_final(df.iloc[-(novas + aquecimento):], sistema)
+    if recentes is None:
+        return _score_final(df, sistema)
+    mantidos = anteriores[(anteriores.index >= df.index[0]) & (anteriores.index < anteriores.index[-1])]
+    return pd.concat([mantidos, recentes.iloc[-novas:]])
+
+
+def historico_scores(historicos, sistema=None, anteriores=None):
+    """
+    Matriz datas x símbolos do score final de `calcular_score_detalhado`
+    `historicos`: {symbol: DataFrame OHLCV}, como em universo.carregar_historicos
+    `anteriores`: {symbol: Series} de uma chamada anterior; é atualizado com as séries
+    estendidas, de modo que chamadas seguintes só calculam os pregões novos
+    """
+    from sistema_recomendacoes import SistemaRecomendacoes
+
+    sistema = sistema or SistemaRecomendacoes()
+    anteriores = {} if anteriores is None else anteriores
+    scores = {}
+    for symbol, df in historicos.items():
+        serie = estender_scores(anteriores.get(symbol), df, sistema)
+        if serie is not None:
+            scores[symbol] = anteriores[symbol] = serie
+    return matriz_fechamentos(scores)
+
+
+class SimuladorCarteira:
+    """Backtest vetorizado de alocação por scores"""
+
+    REGRAS = ('top_k', 'ponderado_score', 'paridade_vol')
+
+    def __init__(self, regra='top_k', k=10, limiar_score=0.0, frequencia='M', custo_transacao=0.001,
+                 custo_cambio=0.0, moeda_base='BRL', moeda_caixa='BRL', taxa_caixa=0.0, janela_vol=63,
+                 peso_maximo=None, capital_inicial=100000.0):
+        if regra not in self.REGRAS:
+            raise ValueError(f"Regra inválida: {regra}. Use uma de {self.REGRAS}")
+        self.regra = regra
+        self.k = k
+        self.limiar_score = limiar_score
+        # 'D', 'W', 'M' ou um número de pregões entre rebalanceamentos
+        self.frequencia = frequencia
+        self.custo_transacao = custo_transacao
+        # Custo adicional sobre o giro em ativos de moeda diferente da base
+        self.custo_cambio = custo_cambio
+        self.moeda_base = moeda_base
+        self.moeda_caixa = moeda_caixa
+        # Rendimento anual do caixa na moeda do caixa
+        self.taxa_caixa = taxa_caixa
+        self.janela_vol = janela_vol
+        self.peso_maximo = peso_maximo
+        self.capital_inicial = capital_inicial
+
+    # --- PREPARAÇÃO ---
+
+    def _retornos_fx(self, indice, cambio):
+        """Retorno do USD medido em BRL (zero se não há câmbio, isto é, nenhuma conversão de moeda)"""
+        if cambio is None:
+            return pd.Series(0.0, index=indice)
+        return alinhar_serie(cambio, indice).pct_change(fill_method=None).fillna(0.0)
+
+    def retornos_moeda_base(self, precos, cambio=None, moedas=None):
+        """
+        Retornos dos ativos convertidos para a moeda base e o retorno diário do câmbio
+        Sem `cambio`, a cotação é carregada (universo.carregar_cambio) se algum ativo ou o caixa
+        estiver em moeda diferente da base
+        """
+        moedas = moedas or {s: moeda_do_simbolo(s) for s in precos.columns}
+        retornos = precos.pct_change(fill_method=None)
+        conversao = self.moeda_caixa != self.moeda_base or \
+            any(moedas.get(s, self.moeda_base) != self.moeda_base for s in precos.columns)
+        if cambio is None and conversao:
+            dias = (pd.Timestamp.today() - pd.Timestamp(precos.index[0]).tz_localize(None)).days if len(precos) else 0
+            cambio = carregar_cambio('5y' if dias < 1800 else 'max')
+        fx = self._retornos_fx(precos.index, cambio)
+        # cambio = BRL por USD: ativos em USD ganham o câmbio numa base BRL e perdem numa base USD
+        fator = {('USD', 'BRL'): 1 + fx, ('BRL', 'USD'): 1 / (1 + fx)}
+        for symbol in precos.columns:
+            chave = (moedas.get(symbol, self.moeda_base), self.moeda_base)
+            if chave in fator:
+                retornos[symbol] = (1 + retornos[symbol]) * fator[chave] - 1
+        return retornos, fx, moedas
+
+    def datas_rebalanceamento(self, indice):
+        """Máscara das barras de rebalanceamento (última barra de cada período)"""
+        if isinstance(self.frequencia, numbers.Integral):
+            return pd.Series(np.arange(len(indice)) % self.frequencia == 0, index=indice)
+        if self.frequencia == 'D':
+            return pd.Series(True, index=indice)
+        periodos = pd.Series(indice, index=indice).dt.to_period({'W': 'W-FRI', 'M': 'M'}[self.frequencia])
+        return periodos != periodos.shift(-1)
+
+    # --- REGRAS DE ALOCAÇÃO ---
+
+    def pesos_alvo(self, scores, retornos, elegiveis):
+        """Matriz de pesos alvo (datas x símbolos) segundo a regra, antes do rebalanceamento"""
+        valores = scores.to_numpy(dtype=float)
+        candidatos = elegiveis.to_numpy() & np.isfinite(valores) & (valores > self.limiar_score)
+
+        if self.k is not None and self.k < valores.shape[1]:
+            ordenados = np.where(candidatos, valores, -np.inf)
+            # Posições dos k maiores scores de cada linha
+            topo = np.argpartition(-ordenados, self.k - 1, axis=1)[:, :self.k]
+            selecao = np.zeros_like(candidatos)
+            np.put_along_axis(selecao, topo, True, axis=1)
+            candidatos &= selecao
+
+        if self.regra == 'top_k':
+            brutos = candidatos.astype(float)
+        elif self.regra == 'ponderado_score':
+            brutos = np.where(candidatos, valores, 0.0)
+        else:
+            volatilidade = retornos.rolling(window=self.janela_vol).std().to_numpy()
+            with np.errstate(divide='ignore'):
+                brutos = np.where(candidatos & (volatilidade > 0), 1 / volatilidade, 0.0)
+        brutos = np.nan_to_num(brutos)
+
+        soma = brutos.sum(axis=1, keepdims=True)
+        pesos = np.divide(brutos, soma, out=np.zeros_like(brutos), where=soma > 0)
+        if self.peso_maximo is not None:
+            # O excedente acima do teto permanece em caixa
+            pesos = np.minimum(pesos, self.peso_maximo)
+        return pd.DataFrame(pesos, index=scores.index, columns=scores.columns)
+
+    # --- SIMULAÇÃO ---
+
+    def simular(self, precos, scores, cambio=None, moedas=None):
+        """
+        Simula a carteira: na barra de rebalanceamento `d` os pesos alvo são definidos
+        com os scores de `d` e passam a valer a partir de `d + 1`; entre
+        rebalanceamentos os pesos derivam com os retornos dos ativos.
+        `precos` e `scores`: matrizes datas x símbolos; `cambio`: BRL por USD
+        (carregado automaticamente se omitido e houver ativos ou caixa em outra moeda).
+        """
+        scores = scores.reindex(index=precos.index, columns=precos.columns)
+        retornos, fx, moedas = self.retornos_moeda_base(precos, cambio, moedas)
+        elegiveis = precos.notna() & scores.notna()
+        rebalancear = self.datas_rebalanceamento(precos.index).to_numpy()
+
+        alvo = self.pesos_alvo(scores, retornos, elegiveis).to_numpy()
+        R = retornos.fillna(0.0).to_numpy()
+        n, m = R.shape
+
+        # Segmento de cada barra: pesos do último rebalanceamento estritamente anterior
+        segmento = np.concatenate([[0], np.cumsum(rebalancear)[:-1]])
+        barras_reb = np.flatnonzero(rebalancear)
+        pesos_segmento = np.vstack([np.zeros((1, m)), alvo[barras_reb]])[segmento]
+        caixa_segmento = 1 - pesos_segmento.sum(axis=1)
+
+        # Crescimento acumulado desde o início do segmento (via log-retornos acumulados)
+        inicio = np.concatenate([[0], barras_reb + 1])[segmento]
+        log_acum = np.vstack([np.zeros((1, m)), np.cumsum(np.log1p(R), axis=0)])
+        crescimento = np.exp(log_acum[1:] - log_acum[inicio])
+
+        retorno_caixa = (1 + self.taxa_caixa) ** (1 / PERIODOS_ANO) - 1
+        fx_caixa = {('USD', 'BRL'): 1 + fx.to_numpy(), ('BRL', 'USD'): 1 / (1 + fx.to_numpy())}
+        fator_caixa = (1 + retorno_caixa) * fx_caixa.get((self.moeda_caixa, self.moeda_base), np.ones(n))
+        log_caixa = np.concatenate([[0.0], np.cumsum(np.log(fator_caixa))])
+        crescimento_caixa = np.exp(log_caixa[1:] - log_caixa[inicio])
+
+        # Valor relativo ao início do segmento e pesos após a deriva
+        relativo = (pesos_segmento * crescimento).sum(axis=1) + caixa_segmento * crescimento_caixa
+        pesos_derivados = pesos_segmento * crescimento / relativo[:, None]
+        relativo_anterior = np.where(np.arange(n) == inicio, 1.0, np.concatenate([[1.0], relativo[:-1]]))
+
+        # Giro e custos nas barras de rebalanceamento
+        variacao = np.abs(alvo - pesos_derivados) * rebalancear[:, None]
+        giro = variacao.sum(axis=1)
+        estrangeiros = np.array([moedas.get(s, self.moeda_base) != self.moeda_base for s in precos.columns])
+        custo = self.custo_transacao * giro + self.custo_cambio * variacao[:, estrangeiros].sum(axis=1)
+
+        fator = relativo / relativo_anterior * (1 - custo)
+        patrimonio = pd.Series(self.capital_inicial * np.cumprod(fator), index=precos.index, name='patrimonio')
+        retornos_carteira = patrimonio.pct_change().fillna(fator[0] - 1)
+
+        # Pesos efetivos em cada barra: alvo logo após o rebalanceamento, derivados nas demais
+        pesos = pd.DataFrame(np.where(rebalancear[:, None], alvo, pesos_derivados), index=precos.index, columns=precos.columns)
+        exposicao = pd.DataFrame({
+            'bruta': pesos.sum(axis=1),
+            'moeda_base': pesos.loc[:, ~estrangeiros].sum(axis=1),
+            'moeda_estrangeira': pesos.loc[:, estrangeiros].sum(axis=1),
+            'caixa': 1 - pesos.sum(axis=1),
+            'posicoes': (pesos > 0).sum(axis=1)
+        })
+        giro = pd.Series(giro, index=precos.index)[rebalancear]
+        custos = (patrimonio / (1 - custo) * custo)[rebalancear]
+
+        return {
+            'patrimonio': patrimonio,
+            'retornos': retornos_carteira,
+            'pesos': pesos,
+            'pesos_alvo': pd.DataFrame(alvo, index=precos.index, columns=precos.columns)[rebalancear],
+            'giro': giro,
+            'custos': custos,
+            'exposicao': exposicao,
+            'metricas': self._metricas(patrimonio, retornos_carteira, giro, custos, exposicao)
+        }
+
+    def _metricas(self, patrimonio, retornos, giro, custos, exposicao):
+        anos = len(patrimonio) / PERIODOS_ANO
+        risco = AnaliseRisco().resumo(patrimonio)
+        crescimento = float(patrimonio.iloc[-1] / self.capital_inicial)
+        return {
+            'retorno_total': crescimento - 1,
+            'cagr': crescimento ** (1 / anos) - 1 if anos > 0 else None,
+            'volatilidade_anual': risco['volatilidade_anual'],
+            'sharpe': risco['sharpe'],
+            'max_drawdown': risco['max_drawdown'],
+            'giro_anual': float(giro.sum() / anos) if anos > 0 else None,
+            'custo_total': float(custos.sum()),
+            'exposicao_media': float(exposicao['bruta'].mean()),
+            'posicoes_medias': float(exposicao['posicoes'].mean())
+        }
+
+
+def exemplo_simulacao_carteira():
+    """Exemplo: top-5 mensal entre ações brasileiras e BDRs"""
+    from universo import carregar_historicos, simbolos_por_categoria
+
+    categorias = simbolos_por_categoria(['acoes_brasileiras', 'bdrs'])
+    historicos, _ = carregar_historicos([s for ativos in categorias.values() for s in ativos], periodo='5y')
+    precos = matriz_fechamentos(historicos)
+    scores = historico_scores(historicos)
+
+    for regra in SimuladorCarteira.REGRAS:
+        resultado = SimuladorCarteira(regra=regra, k=5).simular(precos, scores)
+        metricas = resultado['metricas']
+        print(f"{regra:>16}: retorno {metricas['retorno_total']:.1%} | Sharpe {metricas['sharpe']:.2f} | "
+              f"drawdown {metricas['max_drawdown']:.1%} | giro anual {metricas['giro_anual']:.1f}x")
+
+
+if __name__ == "__main__":
+    exemplo_simulacao_carteira()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Simulador Monte Carlo de Trajetórias de Preço
+Estima a probabilidade de atingir cada preço-alvo antes do stop loss dentro
+de um horizonte, via GBM calibrado nos retornos de `df['close']` ou
+bootstrap em blocos dos retornos históricos. Totalmente vetorizado,
+processado em lotes de tamanho fixo (memória limitada) e reprodutível.
+"""
+
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+
+class SimuladorMonteCarlo:
+    """Simulação de trajetórias futuras e probabilidades de primeira passagem"""
+
+    METODOS = ('gbm', 'bootstrap')
+
+    def __init__(self, n_caminhos=20000, horizonte=20, tamanho_lote=4096, metodo='gbm',
+                 tamanho_bloco=5, semente=None):
+        if metodo not in self.METODOS:
+            raise ValueError(f"Método inválido: {metodo}. Use um de {self.METODOS}")
+        self.n_caminhos = n_caminhos
+        self.horizonte = horizonte
+        self.tamanho_lote = tamanho_lote
+        self.metodo = metodo
+        self.tamanho_bloco = tamanho_bloco
+        self.semente = semente
+
+    def _geradores(self, symbol):
+        """Um gerador independente por lote, derivado da semente e do símbolo"""
+        n_lotes = -(-self.n_caminhos // self.tamanho_lote)
+        entropia = None if self.semente is None else [self.semente, zlib.crc32(symbol.encode())]
+        sementes = np.random.SeedSequence(entropia).spawn(n_lotes)
+        return [np.random.default_rng(s) for s in sementes]
+
+    def _incrementos(self, retornos_log, n, rng):
+        """Matriz (n, horizonte) de log-retornos simulados"""
+        if self.metodo == 'gbm':
+            mu, sigma = retornos_log.mean(), retornos_log.std(ddof=1)
+            return rng.normal(mu, sigma, size=(n, self.horizonte))
+
+        # Bootstrap circular em blocos: preserva a autocorrelação de curto prazo
+        n_blocos = -(-self.horizonte // self.tamanho_bloco)
+        inicios = rng.integers(0, len(retornos_log), size=(n, n_blocos, 1))
+        posicoes = (inicios + np.arange(self.tamanho_bloco)) % len(retornos_log)
+        return retornos_log[posicoes.reshape(n, -1)[:, :self.horizonte]]
+
+    @staticmethod
+    def _primeira_passagem(caminhos, nivel, acima):
+        """Índice da primeira barra em que o nível é atingido (horizonte se nunca)"""
+        atingiu = caminhos >= nivel if acima else caminhos <= nivel
+        primeira = atingiu.argmax(axis=1)
+        primeira[~atingiu.any(axis=1)] = caminhos.shape[1]
+        return primeira
+
+    def simular(self, precos, alvos, stop, symbol='', comprado=True):
+        """
+        Simula as trajetórias a partir do último preço e retorna, para cada alvo,
+        a probabilidade de atingi-lo antes do stop dentro do horizonte.
+        `precos`: fechamentos diários completos (séries reduzidas distorcem a volatilidade)
+        `comprado`: direção da posição (True para compras, False para vendas)
+        Alvos que o preço atual já ultrapassou contam como atingidos (probabilidade 1)
+        """
+        precos = np.asarray(precos, dtype=float)
+        precos = precos[np.isfinite(precos) & (precos > 0)]
+        retornos_log = np.diff(np.log(precos))
+        if len(retornos_log) < 2:
+            return None
+
+        preco_atual = precos[-1]
+        alvos = {nome: float(valor) for nome, valor in alvos.items() if valor is not None and np.isfinite(valor)}
+        # Alvos já ultrapassados no sentido da posição não precisam ser simulados
+        ja_atingidos = {nome for nome, valor in alvos.items()
+                        if (valor <= preco_atual if comprado else valor >= preco_atual)}
+        stop_valido = bool(stop is not None and np.isfinite(stop) and ((stop < preco_atual) if comprado else (stop > preco_atual)))
+
+        # Acumuladores: apenas contagens, independentes do número de lotes
+        antes_stop = dict.fromkeys(alvos, 0)
+        soma_barras_alvo = dict.fromkeys(alvos, 0)
+        atingiu_stop = 0
+        precos_finais = []
+
+        restantes = self.n_caminhos
+        for rng in self._geradores(symbol):
+            n = min(self.tamanho_lote, restantes)
+            restantes -= n
+            caminhos = preco_atual * np.exp(np.cumsum(self._incrementos(retornos_log, n, rng), axis=1))
+            precos_finais.append(caminhos[:, -1])
+            if not stop_valido:
+                continue
+
+            barra_stop = self._primeira_passagem(caminhos, stop, acima=not comprado)
+            atingiu_stop += int((barra_stop < self.horizonte).sum())
+            for nome, valor in alvos.items():
+                if nome in ja_atingidos:
+                    continue
+                barra_alvo = self._primeira_passagem(caminhos, valor, acima=comprado)
+                venceu = barra_alvo < barra_stop
+                antes_stop[nome] += int(venceu.sum())
+                soma_barras_alvo[nome] += int(barra_alvo[venceu].sum()) + int(venceu.sum())
+
+        precos_finais = np.concatenate(precos_finais)
+        return {
+            'preco_atual': preco_atual,
+            'horizonte': self.horizonte,
+            'n_caminhos': self.n_caminhos,
+            'metodo': self.metodo,
+            'comprado': comprado,
+            # Stop do mesmo lado dos alvos (já rompido): probabilidades não se aplicam
+            'stop_valido': stop_valido,
+            'alvos_ja_atingidos': sorted(ja_atingidos),
+            'probabilidades_alvo': {
+                nome: 1.0 if nome in ja_atingidos else (antes_stop[nome] / self.n_caminhos) if stop_valido else None
+                for nome in alvos
+            },
+            'barras_medias_ate_alvo': {
+                nome: 0.0 if nome in ja_atingidos else
+                (soma_barras_alvo[nome] / antes_stop[nome]) if antes_stop[nome] else None
+                for nome in alvos
+            },
+            'probabilidade_stop': (atingiu_stop / self.n_caminhos) if stop_valido else None,
+            'percentis_preco_final': dict(zip((5, 25, 50, 75, 95), np.percentile(precos_finais, [5, 25, 50, 75, 95])))
+        }
+
+
+def _simular_simbolo(symbol, precos, alvos, stop, comprado, parametros):
+    return symbol, SimuladorMonteCarlo(**parametros).simular(precos, alvos, stop, symbol, comprado)
+
+
+def simular_em_paralelo(entradas, max_workers=None, **parametros):
+    """
+    Simula vários símbolos em processos separados
+    `entradas`: {symbol: (precos, {nome_alvo: preco}, stop, comprado)}
+    Os resultados são reprodutíveis com `semente`, independentemente da ordem de execução.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futuros = [
+            executor.submit(_simular_simbolo, symbol, np.asarray(precos, dtype=float), alvos, stop, comprado, parametros)
+            for symbol, (precos, alvos, stop, comprado) in entradas.items()
+        ]
+        return dict(futuro.result() for futuro in futuros)
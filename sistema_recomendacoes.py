@@ -10,94 +10,152 @@ from datetime import datetime, timedelta
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from analise_preditiva import AnalisePreditiva, IndicadoresTecnicos
+from simulacao_monte_carlo import SimuladorMonteCarlo
+from analise_risco import AnaliseRisco
+from amplitude_mercado import score_amplitude
+from fundamentos import score_fundamentalista, atende_filtros
 import warnings
 warnings.filterwarnings('ignore')
 
+def score_por_faixas(regras):
+    """
+    Score por faixas a partir de [(condicao, valor), ...] (float64, 0.0 fora das faixas)
+    Como em atribuições sucessivas, a última regra verdadeira prevalece
+    """
+    condicoes = [np.asarray(condicao) for condicao, _ in reversed(regras)]
+    valores = [valor for _, valor in reversed(regras)]
+    return np.select(condicoes, valores, 0.0)
+
 class SistemaRecomendacoes:
     """Sistema avançado de recomendações de investimento"""
     
+    # Pesos de cada indicador no score final (somam 1)
+    PESOS_SCORE = {
+        'score_rsi': 0.15,
+        'score_macd': 0.20,
+        'score_bb': 0.15,
+        'score_sma': 0.15,
+        'score_estocastico': 0.05,
+        'score_williams': 0.05,
+        'score_mfi': 0.10,
+        'score_cmf': 0.05,
+        'score_adx': 0.10
+    }
+    
     def __init__(self):
         self.analisador = AnalisePreditiva()
         self.indicadores = IndicadoresTecnicos()
     
     def calcular_score_detalhado(self, df, indicadores):
-        """Calcula score detalhado com pesos diferentes para cada indicador"""
+        """
+        Calcula score detalhado com pesos diferentes para cada indicador
+        Scores por indicador em float32 (valores de faixa); o score final,
+        comparado com limiares exatos, permanece em float64
+        """
         if df is None or indicadores is None:
             return None
         
-        scores = pd.DataFrame(index=df.index)
+        preco = df['close']
+        componentes = {}
         
-        # RSI Score (peso: 20%)
+        # RSI Score (peso: 15%)
         rsi = indicadores['rsi']
-        scores['score_rsi'] = 0.0
-        scores.loc[rsi < 30, 'score_rsi'] = 1.0  # Forte compra
-        scores.loc[(rsi >= 30) & (rsi < 40), 'score_rsi'] = 0.5
-        scores.loc[(rsi > 60) & (rsi <= 70), 'score_rsi'] = -0.5
-        scores.loc[rsi > 70, 'score_rsi'] = -1.0  # Forte venda
-        
-        # MACD Score (peso: 25%)
+        componentes['score_rsi'] = score_por_faixas([
+            (rsi < 30, 1.0),  # Forte compra
+            ((rsi >= 30) & (rsi < 40), 0.5),
+            ((rsi > 60) & (rsi <= 70), -0.5),
+            (rsi > 70, -1.0)  # Forte venda
+        ])
+        
+        # MACD Score (peso: 20%)
         macd = indicadores['macd']
         sinal = indicadores['sinal']
         histograma = indicadores['histograma']
-        
-        scores['score_macd'] = 0.0
-        scores.loc[(macd > sinal) & (histograma > 0), 'score_macd'] = 1.0
-        scores.loc[(macd > sinal) & (histograma <= 0), 'score_macd'] = 0.3
-        scores.loc[(macd <= sinal) & (histograma > 0), 'score_macd'] = -0.3
-        scores.loc[(macd <= sinal) & (histograma <= 0), 'score_macd'] = -1.0
-        
-        # Bollinger Bands Score (peso: 20%)
+        componentes['score_macd'] = score_por_faixas([
+            ((macd > sinal) & (histograma > 0), 1.0),
+            ((macd > sinal) & (histograma <= 0), 0.3),
+            ((macd <= sinal) & (histograma > 0), -0.3),
+            ((macd <= sinal) & (histograma <= 0), -1.0)
+        ])
+        
+        # Bollinger Bands Score (peso: 15%)
         bb_superior = indicadores['bb_superior']
         bb_inferior = indicadores['bb_inferior']
         bb_media = indicadores['bb_media']
-        preco = df['close']
-        
-        scores['score_bb'] = 0.0
-        scores.loc[preco <= bb_inferior, 'score_bb'] = 1.0
-        scores.loc[(preco > bb_inferior) & (preco < bb_media), 'score_bb'] = 0.5
-        scores.loc[(preco >= bb_media) & (preco < bb_superior), 'score_bb'] = -0.5
-        scores.loc[preco >= bb_superior, 'score_bb'] = -1.0
+        componentes['score_bb'] = score_por_faixas([
+            (preco <= bb_inferior, 1.0),
+            ((preco > bb_inferior) & (preco < bb_media), 0.5),
+            ((preco >= bb_media) & (preco < bb_superior), -0.5),
+            (preco >= bb_superior, -1.0)
+        ])
         
         # Médias Móveis Score (peso: 15%)
         sma_20 = indicadores['sma_20']
         sma_50 = indicadores['sma_50']
-        
-        scores['score_sma'] = 0.0
-        scores.loc[(preco > sma_20) & (preco > sma_50) & (sma_20 > sma_50), 'score_sma'] = 1.0
-        scores.loc[(preco > sma_20) & (preco < sma_50), 'score_sma'] = 0.3
-        scores.loc[(preco < sma_20) & (preco > sma_50), 'score_sma'] = -0.3
-        scores.loc[(preco < sma_20) & (preco < sma_50) & (sma_20 < sma_50), 'score_sma'] = -1.0
-        
-        # Estocástico Score (peso: 10%)
+        componentes['score_sma'] = score_por_faixas([
+            ((preco > sma_20) & (preco > sma_50) & (sma_20 > sma_50), 1.0),
+            ((preco > sma_20) & (preco < sma_50), 0.3),
+            ((preco < sma_20) & (preco > sma_50), -0.3),
+            ((preco < sma_20) & (preco < sma_50) & (sma_20 < sma_50), -1.0)
+        ])
+        
+        # Estocástico Score (peso: 5%)
         k_percent = indicadores['estocastico_k']
-        scores['score_estocastico'] = 0.0
-        scores.loc[k_percent < 20, 'score_estocastico'] = 1.0
-        scores.loc[(k_percent >= 20) & (k_percent < 40), 'score_estocastico'] = 0.5
-        scores.loc[(k_percent >= 60) & (k_percent < 80), 'score_estocastico'] = -0.5
-        scores.loc[k_percent >= 80, 'score_estocastico'] = -1.0
-        
-        # Williams %R Score (peso: 10%)
+        componentes['score_estocastico'] = score_por_faixas([
+            (k_percent < 20, 1.0),
+            ((k_percent >= 20) & (k_percent < 40), 0.5),
+            ((k_percent >= 60) & (k_percent < 80), -0.5),
+            (k_percent >= 80, -1.0)
+        ])
+        
+        # Williams %R Score (peso: 5%)
         williams_r = indicadores['williams_r']
-        scores['score_williams'] = 0.0
-        scores.loc[williams_r < -80, 'score_williams'] = 1.0
-        scores.loc[(williams_r >= -80) & (williams_r < -60), 'score_williams'] = 0.5
-        scores.loc[(williams_r >= -40) & (williams_r < -20), 'score_williams'] = -0.5
-        scores.loc[williams_r >= -20, 'score_williams'] = -1.0
+        componentes['score_williams'] = score_por_faixas([
+            (williams_r < -80, 1.0),
+            ((williams_r >= -80) & (williams_r < -60), 0.5),
+            ((williams_r >= -40) & (williams_r < -20), -0.5),
+            (williams_r >= -20, -1.0)
+        ])
+        
+        # MFI Score (peso: 10%) - extremos ponderados pelo volume
+        mfi = indicadores['mfi']
+        componentes['score_mfi'] = score_por_faixas([
+            (mfi < 20, 1.0),
+            ((mfi >= 20) & (mfi < 40), 0.5),
+            ((mfi >= 60) & (mfi < 80), -0.5),
+            (mfi >= 80, -1.0)
+        ])
+        
+        # Chaikin Money Flow Score (peso: 5%) - pressão compradora/vendedora
+        cmf = indicadores['cmf']
+        componentes['score_cmf'] = score_por_faixas([
+            (cmf > 0, 0.5),
+            (cmf > 0.1, 1.0),
+            (cmf < 0, -0.5),
+            (cmf < -0.1, -1.0)
+        ])
+        
+        # ADX/DMI Score (peso: 10%) - direção, mais forte com tendência definida (ADX > 25)
+        adx, di_mais, di_menos = indicadores['adx'], indicadores['di_mais'], indicadores['di_menos']
+        componentes['score_adx'] = score_por_faixas([
+            (di_mais > di_menos, 0.3),
+            (di_mais < di_menos, -0.3),
+            ((adx > 25) & (di_mais > di_menos), 1.0),
+            ((adx > 25) & (di_mais < di_menos), -1.0)
+        ])
         
         # Score final ponderado
-        pesos = {
-            'score_rsi': 0.20,
-            'score_macd': 0.25,
-            'score_bb': 0.20,
-            'score_sma': 0.15,
-            'score_estocastico': 0.10,
-            'score_williams': 0.10
-        }
+        pesos = self.PESOS_SCORE
         
-        scores['score_final'] = 0.0
+        score_final = np.zeros(len(df))
         for indicador, peso in pesos.items():
-            scores['score_final'] += scores[indicador] * peso
+            score_final += componentes[indicador] * peso
         
+        scores = pd.DataFrame(
+            {indicador: valores.astype(np.float32) for indicador, valores in componentes.items()},
+            index=df.index
+        )
+        scores['score_final'] = score_final
         return scores
     
     def identificar_padroes_candlestick(self, df):
@@ -135,9 +193,26 @@ class SistemaRecomendacoes:
             'fib_100': low_min
         }
     
-    def gerar_recomendacao_avancada(self, symbol, periodo='6mo'):
-        """Gera recomendação avançada com análise completa"""
-        df = self.analisador.buscar_dados_completos(symbol, periodo)
+    def gerar_recomendacao_avancada(self, symbol, periodo='6mo', dados=None, previsor=None, peso_ml=0.3,
+                                    benchmark=None, amplitude=None, peso_amplitude=0.2,
+                                    fundamentos=None, peso_fundamentos=0.2, filtros_fundamentos=None,
+                                    cambio=None):
+        """
+        Gera recomendação avançada com análise completa (`dados`: histórico base opcional)
+        Com `previsor` (previsao_ml.PrevisorDirecao), a probabilidade de alta do modelo
+        é combinada ao score final com peso `peso_ml`
+        `benchmark`: fechamentos do benchmark (ex.: BOVA11.SA ou SPY) para o beta das métricas de risco
+        `amplitude`: métricas atuais da categoria do ativo (AmplitudeMercado.metricas_categoria),
+        combinadas ao score final com peso `peso_amplitude`
+        `fundamentos`: fundamentos do ativo (fundamentos.BaseFundamentos.obter_simbolo), cujo score
+        entra com peso `peso_fundamentos`; se o ativo não atender a `filtros_fundamentos`
+        (ver fundamentos.FILTROS), sinais de compra são rebaixados a NEUTRO; `cambio` (BRL por USD)
+        converte o valor de mercado de ativos em USD para os limites em BRL (sem ele, não atendem)
+        """
+        if dados is not None:
+            df = self.analisador.recortar_periodo(dados, periodo)
+        else:
+            df = self.analisador.buscar_dados_completos(symbol, periodo)
         if df is None: return None
         
         indicadores = self.analisador.calcular_todos_indicadores(df)
@@ -149,8 +224,25 @@ class SistemaRecomendacoes:
         
         preco_atual = df['close'].iloc[-1]
         score_atual = scores['score_final'].iloc[-1]
+        score_tecnico = score_atual
         rsi_atual = indicadores['rsi'].iloc[-1]
         
+        probabilidade_alta = None
+        if previsor is not None:
+            probabilidade_alta = previsor.prever_probabilidade(symbol, df)
+            score_atual = previsor.combinar_score(score_tecnico, probabilidade_alta, peso_ml)
+        
+        score_categoria = score_amplitude(amplitude)
+        if score_categoria is not None:
+            score_atual = (1 - peso_amplitude) * score_atual + peso_amplitude * score_categoria
+        
+        score_fundamentos = score_fundamentalista(fundamentos)
+        if score_fundamentos is not None:
+            score_atual = (1 - peso_fundamentos) * score_atual + peso_fundamentos * score_fundamentos
+        aprovado_fundamentos = atende_filtros(fundamentos, filtros_fundamentos, symbol, cambio=cambio) if filtros_fundamentos else None
+        if aprovado_fundamentos is False:
+            score_atual = min(score_atual, 0.1)
+        
         if score_atual > 0.6: recomendacao, cor, confianca = "COMPRA MUITO FORTE", "darkgreen", "Muito Alta"
         elif score_atual > 0.3: recomendacao, cor, confianca = "COMPRA FORTE", "green", "Alta"
         elif score_atual > 0.1: recomendacao, cor, confianca = "COMPRA", "lightgreen", "Moderada"
@@ -168,15 +260,25 @@ class SistemaRecomendacoes:
             preco_alvo_2 = indicadores['bb_superior'].iloc[-1] * 1.05
             stop_loss = indicadores['bb_inferior'].iloc[-1]
             
+        # Stop dimensionado pela volatilidade (Chandelier Exit), no lado da recomendação
+        atr_atual = indicadores['atr'].iloc[-1]
+        stop_loss_atr = indicadores['stop_atr_comprado' if score_atual > 0 else 'stop_atr_vendido'].iloc[-1]
+            
         padroes_recentes = [p.replace('_', ' ').title() for p in padroes.columns if padroes[p].tail(5).any()] if padroes is not None else []
 
         return {
             'symbol': symbol, 'preco_atual': preco_atual, 'recomendacao': recomendacao,
             'cor_recomendacao': cor, 'confianca': confianca, 'score_final': score_atual,
+            'score_tecnico': score_tecnico, 'probabilidade_alta_ml': probabilidade_alta,
+            'score_amplitude': score_categoria, 'amplitude_categoria': amplitude,
+            'score_fundamentos': score_fundamentos, 'fundamentos': fundamentos,
+            'aprovado_filtros_fundamentos': aprovado_fundamentos,
             'rsi_atual': rsi_atual, 'preco_alvo_1': preco_alvo_1, 'preco_alvo_2': preco_alvo_2,
-            'stop_loss': stop_loss, 'padroes_recentes': padroes_recentes,
+            'stop_loss': stop_loss, 'stop_loss_atr': stop_loss_atr, 'atr_atual': atr_atual,
+            'padroes_recentes': padroes_recentes,
             'dados_historicos': df, 'indicadores': indicadores, 'scores_detalhados': scores,
             'padroes_candlestick': padroes, 'niveis_fibonacci': fibonacci,
+            'risco': AnaliseRisco().resumo(df['close'], benchmark),
             'analise_detalhada': {
                 'tendencia_rsi': self._classificar_rsi(rsi_atual),
                 'posicao_bb': self._analisar_bollinger(preco_atual, indicadores),
@@ -186,6 +288,23 @@ class SistemaRecomendacoes:
             }
         }
 
+    def calcular_probabilidades_alvos(self, resultado, simulador=None, precos=None):
+        """
+        Probabilidade (Monte Carlo) de atingir cada preço-alvo antes do stop loss
+        `precos`: fechamentos diários completos; por padrão, os do resultado (que no
+        snapshot vêm reduzidos para o gráfico e não servem para calibrar a volatilidade)
+        A direção segue o sinal do score final, como na escolha dos alvos
+        """
+        if resultado is None:
+            return None
+        simulador = simulador or SimuladorMonteCarlo()
+        alvos = {'preco_alvo_1': resultado['preco_alvo_1'], 'preco_alvo_2': resultado['preco_alvo_2']}
+        if precos is None:
+            precos = resultado['dados_historicos']['close']
+        return simulador.simular(
+            precos, alvos, resultado['stop_loss'], resultado['symbol'], comprado=resultado['score_final'] > 0
+        )
+
     def _classificar_rsi(self, rsi):
         if rsi > 80: return "Extremamente Sobrecomprado"
         if rsi > 70: return "Sobrecomprado"
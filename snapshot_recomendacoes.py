@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Snapshot Pré-Calculado de Recomendações
+Job de materialização (ex.: noturno) que calcula as recomendações básica e
+avançada de todo o universo de `lista_ativos` e grava resumos e séries
+reduzidas para gráficos em um banco SQLite versionado e indexado
+"""
+
+import os
+import io
+import json
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from sistema_recomendacoes import SistemaRecomendacoes
+from analise_risco import benchmark_padrao
+from lista_ativos import obter_todos_ativos
+from historico_recomendacoes import HistoricoRecomendacoes
+from banco_sqlite import conectar, inicializar_banco
+
+CAMINHO_PADRAO = os.path.join('dados', 'snapshot_recomendacoes.db')
+
+# Número máximo de pontos por série gravada para os gráficos
+MAX_PONTOS_GRAFICO = 500
+
+# Benchmarks buscados uma vez por materialização, para o beta das métricas de risco
+BENCHMARKS = ('BOVA11.SA', 'SPY')
+
+# Versões concluídas mantidas no banco
+VERSOES_MANTIDAS = 3
+
+# Colunas de indicadores usadas pelos gráficos das duas visões
+COLUNAS_INDICADORES = ['rsi', 'macd', 'sinal', 'histograma', 'bb_media', 'bb_superior', 'bb_inferior']
+
+# Chaves de cada resultado que contêm séries (gravadas à parte, reduzidas)
+CHAVES_SERIES = {
+    'dados_historicos', 'indicadores', 'sinais', 'scores_detalhados',
+    'padroes_candlestick', 'niveis_fibonacci'
+}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS versoes (
+    versao INTEGER PRIMARY KEY AUTOINCREMENT,
+    criada_em TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    concluida INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS resumos (
+    versao INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    recomendacao TEXT,
+    score REAL,
+    preco_atual REAL,
+    resumo TEXT NOT NULL,
+    PRIMARY KEY (versao, symbol, tipo)
+);
+CREATE INDEX IF NOT EXISTS idx_resumos_symbol ON resumos (symbol, tipo, versao);
+CREATE INDEX IF NOT EXISTS idx_resumos_recomendacao ON resumos (versao, tipo, recomendacao);
+CREATE TABLE IF NOT EXISTS series (
+    versao INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    serie TEXT NOT NULL,
+    PRIMARY KEY (versao, symbol)
+);
+"""
+
+
+def reduzir_serie_grafico(quadro, max_pontos=MAX_PONTOS_GRAFICO):
+    """
+    Reduz um quadro OHLCV + indicadores para no máximo `max_pontos` linhas
+    agregando blocos consecutivos (OHLC preservado; demais colunas pelo último valor)
+    """
+    if len(quadro) <= max_pontos:
+        return quadro
+
+    tamanho_bloco = int(np.ceil(len(quadro) / max_pontos))
+    blocos = np.arange(len(quadro)) // tamanho_bloco
+    agregacoes = {coluna: 'last' for coluna in quadro.columns}
+    agregacoes.update({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+    reduzido = quadro.groupby(blocos).agg(agregacoes)
+    reduzido.index = quadro.index.to_series().groupby(blocos).last().values
+    return reduzido
+
+
+def _para_json(valor):
+    """Converte escalares numpy/pandas em tipos serializáveis"""
+    if isinstance(valor, dict):
+        return {chave: _para_json(v) for chave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_para_json(v) for v in valor]
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and np.isnan(valor):
+        return None
+    return valor
+
+
+class SnapshotRecomendacoes:
+    """Leitura e escrita do snapshot versionado de recomendações"""
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        inicializar_banco(caminho, ESQUEMA)
+
+    def _conectar(self):
+        """Conexão fechada ao sair do bloco; o bloco é uma transação (commit ou rollback)"""
+        return conectar(self.caminho, ESQUEMA)
+
+    def versao_atual(self):
+        """Retorna (versao, periodo, criada_em) da última versão concluída, ou None"""
+        with self._conectar() as conexao:
+            return conexao.execute(
+                "SELECT versao, periodo, criada_em FROM versoes WHERE concluida = 1 "
+                "ORDER BY versao DESC LIMIT 1"
+            ).fetchone()
+
+    # --- ESCRITA ---
+
+    def _calcular_simbolo(self, symbol, periodo, benchmarks=None, historico=None):
+        """Busca o histórico uma vez e calcula as duas recomendações (registradas em `historico`)"""
+        sistema = SistemaRecomendacoes()
+        analisador = sistema.analisador
+        df = analisador.buscar_dados_completos(symbol, periodo)
+        if df is None:
+            return None
+
+        basica = analisador.gerar_recomendacao(symbol, periodo=None, dados=df)
+        benchmark = (benchmarks or {}).get(benchmark_padrao(symbol))
+        avancada = sistema.gerar_recomendacao_avancada(symbol, periodo=None, dados=df, benchmark=benchmark)
+        if basica is None or avancada is None:
+            return None
+        if historico is not None:
+            historico.registrar(basica, 'basica', periodo, origem='snapshot')
+            historico.registrar(avancada, 'avancada', periodo, origem='snapshot')
+
+        quadro = df[['open', 'high', 'low', 'close', 'volume']].copy()
+        for coluna in COLUNAS_INDICADORES:
+            quadro[coluna] = avancada['indicadores'][coluna]
+        quadro['score_consolidado'] = basica['sinais']['score_consolidado']
+        quadro['score_final'] = avancada['scores_detalhados']['score_final']
+
+        resumos = {
+            tipo: {chave: _para_json(valor) for chave, valor in resultado.items() if chave not in CHAVES_SERIES}
+            for tipo, resultado in (('basica', basica), ('avancada', avancada))
+        }
+        return resumos, reduzir_serie_grafico(quadro)
+
+    def materializar(self, simbolos=None, periodo='1y', max_workers=4, historico=None):
+        """
+        Calcula e grava uma nova versão do snapshot
+        A versão só se torna visível para leitura ao final (concluida = 1)
+        Cada recomendação também entra no histórico (ledger) de acertos;
+        `historico=False` desativa o registro
+        """
+        if simbolos is None:
+            simbolos = sorted({s for ativos in obter_todos_ativos().values() for s in ativos})
+
+        with self._conectar() as conexao:
+            versao = conexao.execute(
+                "INSERT INTO versoes (criada_em, periodo) VALUES (?, ?)",
+                (datetime.now().isoformat(timespec='seconds'), periodo)
+            ).lastrowid
+
+        analisador = SistemaRecomendacoes().analisador
+        benchmarks = {}
+        for benchmark in BENCHMARKS:
+            df = analisador.buscar_dados_completos(benchmark, periodo)
+            if df is not None:
+                benchmarks[benchmark] = df['close']
+
+        if historico is None:
+            historico = HistoricoRecomendacoes()
+        historico = historico or None
+
+        falhas = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = {
+                executor.submit(self._calcular_simbolo, s, periodo, benchmarks, historico): s for s in simbolos
+            }
+            with self._conectar() as conexao:
+                for futuro in as_completed(futuros):
+                    symbol = futuros[futuro]
+                    try:
+                        calculado = futuro.result()
+                    except Exception as e:
+                        print(f"Erro ao materializar {symbol}: {e}")
+                        calculado = None
+                    if calculado is None:
+                        falhas.append(symbol)
+                        continue
+
+                    resumos, quadro = calculado
+                    for tipo, resumo in resumos.items():
+                        score = resumo.get('score_final', resumo.get('score_consolidado'))
+                        conexao.execute(
+                            "INSERT INTO resumos VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (versao, symbol, tipo, resumo['recomendacao'], score,
+                             resumo['preco_atual'], json.dumps(resumo))
+                        )
+                    conexao.execute(
+                        "INSERT INTO series VALUES (?, ?, ?)",
+                        (versao, symbol, quadro.to_json(orient='split', date_format='iso'))
+                    )
+                conexao.execute("UPDATE versoes SET concluida = 1 WHERE versao = ?", (versao,))
+
+        self.podar()
+        return {'versao': versao, 'simbolos': len(simbolos) - len(falhas), 'falhas': falhas}
+
+    def podar(self, manter=VERSOES_MANTIDAS):
+        """Remove versões concluídas antigas e versões abandonadas por jobs interrompidos"""
+        with self._conectar() as conexao:
+            versoes = [v for (v,) in conexao.execute(
+                "SELECT versao FROM versoes WHERE concluida = 1 ORDER BY versao DESC"
+            )]
+            if not versoes:
+                return
+            remover = "versao < ? AND (concluida = 0 OR versao NOT IN (%s))" % ",".join("?" * len(versoes[:manter]))
+            parametros = [versoes[0]] + versoes[:manter]
+            for tabela in ('resumos', 'series'):
+                conexao.execute(
+                    f"DELETE FROM {tabela} WHERE versao IN (SELECT versao FROM versoes WHERE {remover})",
+                    parametros
+                )
+            conexao.execute(f"DELETE FROM versoes WHERE {remover}", parametros)
+
+    # --- LEITURA ---
+
+    def obter_resultado(self, symbol, tipo='basica', periodo=None):
+        """
+        Reconstrói o resultado no formato de `gerar_recomendacao` (tipo='basica')
+        ou `gerar_recomendacao_avancada` (tipo='avancada') a partir da versão atual.
+        Retorna None se o símbolo não estiver no snapshot ou se o período diferir.
+        """
+        atual = self.versao_atual()
+        if atual is None or (periodo is not None and atual[1] != periodo):
+            return None
+        versao = atual[0]
+
+        with self._conectar() as conexao:
+            linha_resumo = conexao.execute(
+                "SELECT resumo FROM resumos WHERE versao = ? AND symbol = ? AND tipo = ?",
+                (versao, symbol, tipo)
+            ).fetchone()
+            linha_serie = conexao.execute(
+                "SELECT serie FROM series WHERE versao = ? AND symbol = ?", (versao, symbol)
+            ).fetchone()
+        if linha_resumo is None or linha_serie is None:
+            return None
+
+        resultado = self.montar_resultado(linha_resumo[0], linha_serie[0])
+        resultado['snapshot'] = {'versao': versao, 'criada_em': atual[2]}
+        return resultado
+
+    @staticmethod
+    def montar_resultado(resumo, serie):
+        """Resultado completo a partir do resumo e da série reduzida gravados (textos JSON)"""
+        resultado = json.loads(resumo)
+        quadro = pd.read_json(io.StringIO(serie), orient='split')
+
+        resultado['dados_historicos'] = quadro[['open', 'high', 'low', 'close', 'volume']]
+        resultado['indicadores'] = {coluna: quadro[coluna] for coluna in COLUNAS_INDICADORES}
+        resultado['sinais'] = quadro[['close', 'score_consolidado']].rename(columns={'close': 'preco'})
+        resultado['scores_detalhados'] = quadro[['score_final']]
+        return resultado
+
+    def listar_conteudos(self, tipo='avancada', simbolos=None):
+        """
+        (symbol, resumo, serie) da versão atual, com os textos JSON como gravados
+        (entrada de `montar_resultado`, sem desserializar)
+        """
+        atual = self.versao_atual()
+        if atual is None:
+            return []
+        with self._conectar() as conexao:
+            linhas = conexao.execute(
+                "SELECT r.symbol, r.resumo, s.serie FROM resumos r "
+                "JOIN series s ON s.versao = r.versao AND s.symbol = r.symbol "
+                "WHERE r.versao = ? AND r.tipo = ? ORDER BY r.symbol",
+                (atual[0], tipo)
+            ).fetchall()
+        if simbolos is not None:
+            simbolos = set(simbolos)
+            linhas = [linha for linha in linhas if linha[0] in simbolos]
+        return linhas
+
+    def listar_resumos(self, tipo='avancada'):
+        """Resumo (símbolo, recomendação, score, preço) de todos os símbolos da versão atual"""
+        atual = self.versao_atual()
+        if atual is None:
+            return pd.DataFrame(columns=['symbol', 'recomendacao', 'score', 'preco_atual'])
+        with self._conectar() as conexao:
+            return pd.read_sql_query(
+                "SELECT symbol, recomendacao, score, preco_atual FROM resumos "
+                "WHERE versao = ? AND tipo = ? ORDER BY score DESC",
+                conexao, params=(atual[0], tipo)
+            )
+
+
+if __name__ == "__main__":
+    # Execução do job de materialização (agendar via cron / Agendador de Tarefas)
+    snapshot = SnapshotRecomendacoes()
+    relatorio = snapshot.materializar()
+    print(f"Snapshot versão {relatorio['versao']}: {relatorio['simbolos']} símbolos materializados")
+    if relatorio['falhas']:
+        print(f"Falhas: {', '.join(relatorio['falhas'])}")
@@ -0,0 +1,123 @@
+"""Amplitude incremental contra o cálculo do zero em pandas e extensão incremental dos scores"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from amplitude_mercado import METRICAS, AmplitudeMercado
+from dados_sinteticos import GeradorOHLCV
+from simulacao_carteira import _score_final, estender_scores, historico_scores
+
+
+def _universo(n=160, semente=3):
+    rng = np.random.default_rng(semente)
+    indice = pd.bdate_range('2023-01-02', periods=n)
+    simbolos = ['A', 'B', 'C', 'D', 'E', 'F']
+    matriz = pd.DataFrame(50 * np.exp(np.cumsum(rng.normal(0, 0.02, (n, len(simbolos))), axis=0)),
+                          index=indice, columns=simbolos)
+    matriz.iloc[:25, 1] = np.nan   # começa a negociar depois
+    matriz.iloc[70:74, 3] = np.nan  # lacuna no meio da série
+    matriz.iloc[100, 4] = matriz.iloc[99, 4]  # sem variação
+    scores = pd.DataFrame(rng.uniform(-1, 1, matriz.shape), index=indice, columns=simbolos)
+    scores.iloc[:40, 0] = np.nan
+    categorias = {'x': ['A', 'B', 'C'], 'y': ['C', 'D', 'E', 'F']}  # C nas duas
+    return matriz, scores, categorias
+
+
+def _referencia(matriz, scores, categorias, media_curta, media_longa, periodo_rsi, janela_maximas):
+    """Métricas por categoria calculadas do zero, com as operações vetorizadas do pandas"""
+    delta = matriz.diff()
+    validos = matriz.notna()
+    ganhos = delta.where(delta > 0, 0.0).rolling(periodo_rsi).sum()
+    perdas = (-delta).where(delta < 0, 0.0).rolling(periodo_rsi).sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + ganhos / perdas)
+    sma_curta, sma_longa = matriz.rolling(media_curta).mean(), matriz.rolling(media_longa).mean()
+    maximas, minimas = matriz.rolling(janela_maximas).max(), matriz.rolling(janela_maximas).min()
+
+    def fracao(condicao, base):
+        return (condicao & base).sum(axis=1) / base.sum(axis=1).replace(0, np.nan)
+
+    quadros = {}
+    for categoria, membros in categorias.items():
+        m = lambda quadro: quadro[membros]
+        avancos, declinios = (m(delta) > 0).sum(axis=1), (m(delta) < 0).sum(axis=1)
+        quadros[categoria] = pd.DataFrame({
+            'membros': m(validos).sum(axis=1),
+            'avancos': avancos,
+            'declinios': declinios,
+            'linha_ad': (avancos - declinios).cumsum(),
+            'pct_acima_sma50': fracao(m(matriz) > m(sma_curta), m(sma_curta).notna() & m(validos)),
+            'pct_acima_sma200': fracao(m(matriz) > m(sma_longa), m(sma_longa).notna() & m(validos)),
+            'pct_rsi_acima_70': fracao(m(rsi) > 70, m(rsi).notna() & m(validos)),
+            'pct_rsi_abaixo_30': fracao(m(rsi) < 30, m(rsi).notna() & m(validos)),
+            'novas_maximas': (m(maximas).notna() & (m(matriz) >= m(maximas))).sum(axis=1),
+            'novas_minimas': (m(minimas).notna() & (m(matriz) <= m(minimas))).sum(axis=1),
+            'score_medio': m(scores).mean(axis=1)
+        }, columns=METRICAS).astype(float)
+    return quadros
+
+
+@pytest.mark.parametrize('media_longa,janela_maximas', [(20, 30), (30, 15)])
+def test_amplitude_incremental_igual_ao_calculo_completo(media_longa, janela_maximas):
+    matriz, scores, categorias = _universo()
+    parametros = dict(media_curta=5, media_longa=media_longa, periodo_rsi=14, janela_maximas=janela_maximas)
+    amplitude = AmplitudeMercado(categorias, **parametros)
+    # Em partes, como no app: apenas as barras novas são processadas a cada chamada
+    assert amplitude.acompanhar(matriz.iloc[:90], scores) == 90
+    assert amplitude.acompanhar(matriz.iloc[:90], scores) == 0
+    assert amplitude.acompanhar(matriz, scores) == len(matriz) - 90
+
+    referencia = _referencia(matriz, scores, categorias, **parametros)
+    for categoria in categorias:
+        historico = amplitude.historico(categoria)
+        pd.testing.assert_frame_equal(historico, referencia[categoria], check_names=False, check_freq=False,
+                                      check_index_type=False, rtol=1e-9)
+
+
+def test_barra_parcial_refeita_quando_o_fechamento_muda():
+    matriz, scores, categorias = _universo()
+    parametros = dict(media_curta=5, media_longa=20, periodo_rsi=14, janela_maximas=30)
+    amplitude = AmplitudeMercado(categorias, **parametros)
+
+    # Última barra ainda em formação: fechamentos e scores provisórios
+    parcial, scores_parciais = matriz.iloc[:91].copy(), scores.iloc[:91].copy()
+    parcial.iloc[-1] *= 1.03
+    scores_parciais.iloc[-1] = 0.0
+    assert amplitude.acompanhar(parcial, scores_parciais) == 91
+    assert amplitude.acompanhar(parcial, scores_parciais) == 0
+    # O fechamento definitivo substitui a barra parcial em vez de se somar a ela
+    assert amplitude.acompanhar(matriz, scores) == len(matriz) - 90
+
+    referencia = _referencia(matriz, scores, categorias, **parametros)
+    for categoria in categorias:
+        pd.testing.assert_frame_equal(amplitude.historico(categoria), referencia[categoria], check_names=False,
+                                      check_freq=False, check_index_type=False, rtol=1e-9)
+
+
+def test_scores_estendidos_iguais_ao_calculo_completo():
+    # Colunas em minúsculas, como entregues pelo ClienteDados
+    gerados = GeradorOHLCV(anos=3, semente=11).gerar(['AAA', 'BBB.SA'])
+    historicos = {s: df.rename(columns=str.lower) for s, df in gerados.items()}
+    completos = {s: _score_final(df, _sistema()) for s, df in historicos.items()}
+
+    anteriores = {}
+    historico_scores({s: df.iloc[:-5] for s, df in historicos.items()}, _sistema(), anteriores)
+    matriz = historico_scores(historicos, _sistema(), anteriores)
+    for symbol, df in historicos.items():
+        assert anteriores[symbol].index.equals(df.index)
+        pd.testing.assert_series_equal(anteriores[symbol], completos[symbol], check_freq=False)
+        np.testing.assert_array_equal(matriz[symbol].dropna().to_numpy(), completos[symbol].dropna().to_numpy())
+
+    # Sem barras novas a série é reaproveitada; com histórico curto tudo é recalculado
+    df = historicos['AAA']
+    pd.testing.assert_series_equal(estender_scores(completos['AAA'], df, _sistema()), completos['AAA'],
+                                   check_freq=False)
+    curto = df.iloc[:300]
+    pd.testing.assert_series_equal(estender_scores(completos['AAA'].iloc[:290], curto, _sistema()),
+                                   _score_final(curto, _sistema()), check_freq=False)
+
+
+def _sistema():
+    from sistema_recomendacoes import SistemaRecomendacoes
+    return SistemaRecomendacoes()
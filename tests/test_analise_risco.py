@@ -0,0 +1,63 @@
+"""VaR/CVaR móveis da JanelaCauda contra a ordenação de cada janela"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analise_risco import AnaliseRisco, JanelaCauda
+
+
+def _referencia(retornos, janela, k):
+    """VaR e CVaR de cada janela de `janela` observações válidas, reordenando-a do zero"""
+    var = pd.DataFrame(np.nan, index=retornos.index, columns=retornos.columns)
+    cvar = var.copy()
+    for coluna in retornos.columns:
+        serie = retornos[coluna].dropna()
+        for i in range(janela - 1, len(serie)):
+            ordenados = np.sort(serie.iloc[i - janela + 1:i + 1].to_numpy())
+            var.loc[serie.index[i], coluna] = -ordenados[k - 1]
+            cvar.loc[serie.index[i], coluna] = -ordenados[:k].sum() / k
+    return var, cvar
+
+
+def _retornos(n=300, semente=7):
+    rng = np.random.default_rng(semente)
+    indice = pd.bdate_range('2022-01-03', periods=n)
+    # Retornos arredondados a 0,5%: muitos empates entre valores iguais dentro da janela
+    retornos = pd.DataFrame(np.round(rng.normal(0, 0.02, (n, 3)) / 0.005) * 0.005, index=indice,
+                            columns=['A', 'B', 'C'])
+    retornos.iloc[:30, 1] = np.nan      # começa a negociar depois
+    retornos.iloc[100:112, 2] = np.nan  # lacuna no meio da série
+    retornos.iloc[200::7, 0] = np.nan   # falhas esparsas
+    return retornos
+
+
+@pytest.mark.parametrize('janela,nivel', [(20, 0.95), (63, 0.95), (50, 0.99)])
+def test_var_cvar_moveis_igual_a_janela_ordenada(janela, nivel):
+    retornos = _retornos()
+    risco = AnaliseRisco(nivel=nivel, janela=janela)
+    var, cvar = risco.var_cvar_moveis(retornos)
+
+    k = max(int(np.ceil(janela * (1 - nivel))), 1)
+    var_ref, cvar_ref = _referencia(retornos, janela, k)
+    pd.testing.assert_frame_equal(var, var_ref, rtol=1e-12)
+    pd.testing.assert_frame_equal(cvar, cvar_ref, rtol=1e-10)
+
+    # Series de entrada devolve Series, iguais à coluna correspondente
+    var_a, cvar_a = risco.var_cvar_moveis(retornos['A'])
+    pd.testing.assert_series_equal(var_a, var['A'].rename('var'))
+    pd.testing.assert_series_equal(cvar_a, cvar['A'].rename('cvar'))
+
+
+def test_janela_cauda_com_valores_repetidos():
+    # Todos os valores iguais: remover um deles não pode levar a posição errada
+    valores = [0.01] * 6 + [-0.02] * 6 + [0.01] * 6
+    cauda, janela, k = JanelaCauda(3), 5, 3
+    for i, valor in enumerate(valores):
+        cauda.adicionar(valor, i)
+        if i >= janela:
+            cauda.remover(valores[i - janela], i - janela)
+        if i >= janela - 1:
+            ordenados = sorted(valores[i - janela + 1:i + 1])
+            assert cauda.maior_da_cauda == ordenados[k - 1]
+            assert cauda.soma_inferior == pytest.approx(sum(ordenados[:k]), abs=1e-15)
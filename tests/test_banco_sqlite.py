@@ -0,0 +1,24 @@
+"""Esquema criado uma vez por processo e banco recriado se o arquivo for removido"""
+
+import os
+
+from banco_sqlite import conectar, inicializar_banco
+
+ESQUEMA = "CREATE TABLE IF NOT EXISTS itens (id INTEGER PRIMARY KEY, valor TEXT);"
+
+
+def test_banco_removido_em_execucao_e_recriado(tmp_path):
+    caminho = str(tmp_path / 'sub' / 'banco.db')
+    inicializar_banco(caminho, ESQUEMA)
+    with conectar(caminho, ESQUEMA) as conexao:
+        conexao.execute("INSERT INTO itens (valor) VALUES ('a')")
+    with conectar(caminho, ESQUEMA) as conexao:
+        assert conexao.execute("SELECT COUNT(*) FROM itens").fetchone() == (1,)
+
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+    # Sem o arquivo, a próxima conexão recria o esquema em vez de falhar por tabela ausente
+    with conectar(caminho, ESQUEMA) as conexao:
+        assert conexao.execute("SELECT COUNT(*) FROM itens").fetchone() == (0,)
+        assert conexao.execute("PRAGMA journal_mode").fetchone() == ('wal',)
@@ -0,0 +1,51 @@
+"""Isolamento dos valores do cache compartilhado entre leitores e limpeza do diretório"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache_compartilhado import CacheCompartilhado
+
+
+def _valor():
+    return {'df': pd.DataFrame({'close': [1.0, 2.0, 3.0]}), 'scores': np.arange(3.0), 'itens': [1, 2]}
+
+
+def test_leitores_nao_alteram_o_valor_em_cache():
+    cache = CacheCompartilhado()
+    primeiro = cache.obter('k', _valor)
+    primeiro['df'].loc[0, 'close'] = -1.0
+    primeiro['df']['nova'] = 0.0
+    primeiro['itens'].append(3)
+    primeiro['extra'] = True
+
+    segundo = cache.obter('k', _valor)
+    assert segundo['df']['close'].tolist() == [1.0, 2.0, 3.0]
+    assert list(segundo['df'].columns) == ['close']
+    assert segundo['itens'] == [1, 2] and 'extra' not in segundo
+    assert cache.metricas()['calculos'] == 1
+
+
+def test_arrays_congelados():
+    valor = CacheCompartilhado().obter('k', _valor)
+    with pytest.raises(ValueError):
+        valor['scores'][0] = 10.0
+
+
+def test_invalidar_mantem_travas(tmp_path):
+    cache = CacheCompartilhado(diretorio=str(tmp_path))
+    cache.obter(('a', 1), _valor)
+    cache.obter(('b', 2), _valor)
+    assert sorted(nome.rsplit('.', 1)[1] for nome in os.listdir(tmp_path)) == ['lock', 'lock', 'pkl', 'pkl']
+
+    # Os .pkl saem; as travas ficam, para que processos aguardando usem o mesmo inode
+    cache.invalidar(('a', 1))
+    assert sorted(nome.rsplit('.', 1)[1] for nome in os.listdir(tmp_path)) == ['lock', 'lock', 'pkl']
+    cache.invalidar()
+    assert sorted(nome.rsplit('.', 1)[1] for nome in os.listdir(tmp_path)) == ['lock', 'lock']
+
+    # Depois da invalidação o valor é recalculado
+    cache.obter(('a', 1), _valor)
+    assert cache.metricas()['calculos'] == 3
@@ -0,0 +1,60 @@
+"""Retentativas e disjuntor do cliente de dados: só erros transitórios são repetidos"""
+
+import pandas as pd
+import pytest
+
+from cliente_dados import (ClienteDados, DisjuntorCircuito, ErroProvedor, ErroSemDados, LimitadorTaxa,
+                           erro_transitorio)
+
+
+class YFTickerMissingError(Exception):
+    pass
+
+
+class ProvedorFalho:
+    nome = 'teste'
+
+    def __init__(self, erros):
+        self.erros = list(erros)
+        self.chamadas = 0
+
+    def buscar(self, symbol, periodo='1y', interval='1d'):
+        self.chamadas += 1
+        if self.erros:
+            raise self.erros.pop(0)
+        return pd.DataFrame({'Close': [1.0, 2.0]})
+
+
+def _cliente(provedor, disjuntor=None):
+    return ClienteDados(provedor, limitador=LimitadorTaxa(taxa=1000, capacidade=1000),
+                        disjuntor=disjuntor or DisjuntorCircuito(), atraso_base=0.0)
+
+
+def test_erro_transitorio_e_repetido():
+    provedor = ProvedorFalho([ConnectionError('reset'), TimeoutError('timeout')])
+    df = _cliente(provedor).buscar_historico('AAPL')
+    assert provedor.chamadas == 3 and list(df.columns) == ['close']
+
+
+@pytest.mark.parametrize('erro,tipo', [(ValueError('x'), ErroProvedor), (KeyError('x'), ErroProvedor),
+                                       (TypeError('x'), ErroProvedor), (YFTickerMissingError('x'), ErroSemDados)])
+def test_erro_deterministico_nao_e_repetido(erro, tipo):
+    provedor, disjuntor = ProvedorFalho([erro] * 4), DisjuntorCircuito(limiar_falhas=1)
+    with pytest.raises(tipo):
+        _cliente(provedor, disjuntor).buscar_historico('XXXX')
+    assert provedor.chamadas == 1
+    assert disjuntor.estado == DisjuntorCircuito.FECHADO
+
+
+def test_erro_http_com_status():
+    class Resposta:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    class ErroHTTP(OSError):
+        def __init__(self, status_code):
+            super().__init__(f"HTTP {status_code}")
+            self.response = Resposta(status_code)
+
+    assert erro_transitorio(ErroHTTP(503)) and erro_transitorio(ErroHTTP(429))
+    assert not erro_transitorio(ErroHTTP(404))
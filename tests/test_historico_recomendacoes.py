@@ -0,0 +1,62 @@
+"""Apuração de desfechos: retorno no horizonte, acerto e alvo/stop no sentido da recomendação"""
+
+import numpy as np
+import pandas as pd
+
+from historico_recomendacoes import HistoricoRecomendacoes
+
+DATAS = pd.bdate_range('2024-01-01', periods=10)
+
+
+def _historico():
+    # Fechamentos 100 -> 109; máximas 2 acima e mínimas 2 abaixo do fechamento
+    close = 100.0 + np.arange(len(DATAS))
+    return pd.DataFrame({'open': close, 'high': close + 2, 'low': close - 2, 'close': close,
+                         'volume': 1000.0}, index=DATAS)
+
+
+def _pendentes(*recomendacoes):
+    """Recomendações de 2024-01-01 a preço 100: (direcao, alvo_1, stop)"""
+    return pd.DataFrame([
+        {'id': i, 'data_referencia': '2024-01-01', 'preco': 100.0, 'direcao': direcao,
+         'alvo_1': alvo, 'stop': stop, 'apurados': ''}
+        for i, (direcao, alvo, stop) in enumerate(recomendacoes, start=1)
+    ])
+
+
+def _desfechos(*recomendacoes, horizontes=(3,)):
+    linhas = HistoricoRecomendacoes.calcular_desfechos(_historico(), _pendentes(*recomendacoes), horizontes)
+    # Retorno arredondado para comparar com o valor exato
+    return {linha[0]: linha[1:4] + (round(linha[4], 12),) + linha[5:] for linha in linhas}
+
+
+def test_alvo_e_stop_no_sentido_da_recomendacao():
+    desfechos = _desfechos(
+        (1, 104.0, 97.0),    # compra: máxima da janela 105 toca o alvo; mínima 99 não toca o stop
+        (-1, 95.0, 104.0),   # venda: preço sobe, toca o stop e não o alvo
+        (1, 110.0, None),    # compra sem stop: alvo fora de alcance
+    )
+    assert desfechos[1] == (3, '2024-01-04', 103.0, 0.03, 1, 1, 0)
+    assert desfechos[2] == (3, '2024-01-04', 103.0, 0.03, 0, 0, 1)
+    assert desfechos[3] == (3, '2024-01-04', 103.0, 0.03, 1, 0, None)
+
+
+def test_niveis_do_lado_errado_nao_contam():
+    desfechos = _desfechos(
+        (1, 95.0, 90.0),     # alvo de compra abaixo da entrada
+        (1, 103.0, 105.0),   # stop de compra acima da entrada
+        (-1, 105.0, 95.0),   # venda com alvo acima e stop abaixo
+        (0, 105.0, 95.0),    # NEUTRO não tem alvo nem stop
+    )
+    assert desfechos[1][-2:] == (None, 0)
+    assert desfechos[2][-2:] == (1, None)
+    assert desfechos[3][-2:] == (None, None)
+    # NEUTRO acerta só com variação abaixo do limiar (3% > 2%)
+    assert desfechos[4][-3:] == (0, None, None)
+
+
+def test_horizontes_nao_decorridos_ou_ja_apurados_ficam_de_fora():
+    pendentes = _pendentes((1, 104.0, 97.0))
+    pendentes.loc[0, 'apurados'] = '3'
+    linhas = HistoricoRecomendacoes.calcular_desfechos(_historico(), pendentes, (3, 5, 21))
+    assert [linha[1] for linha in linhas] == [5]
@@ -0,0 +1,70 @@
+"""Agregação de ticks em barras: atrasados, marca d'água e OHLCV contra o resample do pandas"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ingestao_ticks import TIMEFRAMES_INTRADIARIOS, AgregadorBarras, Tick, gravar_ticks_sinteticos, ler_tick
+
+INICIO = 1_700_000_100.0  # múltiplo de 300 s
+
+
+def _aceitos(ticks, timeframe, atraso_maximo):
+    """Ticks que chegaram antes de a marca d'água fechar a barra deles, na ordem de chegada"""
+    duracao = TIMEFRAMES_INTRADIARIOS[timeframe]
+    marca, aceitos = float('-inf'), []
+    for tick in ticks:
+        marca = max(marca, tick.timestamp)
+        if tick.timestamp - tick.timestamp % duracao + duracao > marca - atraso_maximo:
+            aceitos.append(tick)
+    return aceitos
+
+
+def _referencia(ticks, symbol, timeframe):
+    """OHLCV por resample dos ticks ordenados pelo horário do negócio (empates na ordem de chegada)"""
+    quadro = pd.DataFrame([t for t in ticks if t.symbol == symbol], columns=Tick._fields)
+    quadro.index = pd.to_datetime(quadro['timestamp'], unit='s', utc=True)
+    quadro = quadro.sort_index(kind='stable')
+    regra = f"{TIMEFRAMES_INTRADIARIOS[timeframe]}s"
+    barras = quadro['preco'].resample(regra).ohlc()
+    barras['volume'] = quadro['volume'].resample(regra).sum()
+    return barras[quadro['preco'].resample(regra).count() > 0]
+
+
+def test_atrasado_dentro_da_tolerancia_atualiza_a_barra():
+    agregador = AgregadorBarras(timeframes=('1m',), atraso_maximo=2.0)
+    agregador.processar(Tick(INICIO + 10, 'AAA', 10.0, 100))
+    agregador.processar(Tick(INICIO + 20, 'AAA', 11.0, 100))
+    # Atrasado, mas dentro da tolerância: vira o open por ser o negócio mais antigo da barra
+    agregador.processar(Tick(INICIO + 5, 'AAA', 9.0, 50))
+    # A marca d'água passa de INICIO + 62 e fecha a primeira barra
+    assert agregador.processar(Tick(INICIO + 63, 'AAA', 12.0, 10)) == [('AAA', '1m', INICIO)]
+    # Atrasado além da tolerância: a barra já foi fechada, o tick é descartado
+    assert agregador.processar(Tick(INICIO + 59, 'AAA', 20.0, 10)) == []
+    assert agregador.ticks_descartados == 1
+
+    barra = agregador.buffer('AAA', '1m').ultimas()
+    np.testing.assert_array_equal(barra, [[INICIO, 9.0, 11.0, 9.0, 11.0, 250.0]])
+
+
+@pytest.mark.parametrize('timeframe', ['1m', '5m'])
+def test_barras_iguais_ao_resample_dos_ticks_aceitos(tmp_path, timeframe):
+    caminho = tmp_path / 'ticks.csv'
+    simbolos = ['AAA', 'BBB']
+    # Atraso médio acima da tolerância: parte dos atrasados é descartada
+    gravar_ticks_sinteticos(str(caminho), simbolos, duracao=1800, ticks_por_segundo=20, fracao_atrasada=0.05,
+                            atraso_medio=3.0, inicio=INICIO, semente=4)
+    with open(caminho) as arquivo:
+        ticks = [ler_tick(linha) for linha in arquivo]
+
+    agregador = AgregadorBarras(timeframes=(timeframe,), atraso_maximo=2.0)
+    for tick in ticks:
+        agregador.processar(tick)
+    agregador.fechar_todas()
+
+    aceitos = _aceitos(ticks, timeframe, 2.0)
+    assert 0 < agregador.ticks_descartados == len(ticks) - len(aceitos)
+    for symbol in simbolos:
+        barras = agregador.buffer(symbol, timeframe).para_dataframe()
+        pd.testing.assert_frame_equal(barras, _referencia(aceitos, symbol, timeframe), check_names=False,
+                                      check_index_type=False, check_freq=False)
@@ -0,0 +1,61 @@
+"""Histograma por bincount contra a distribuição barra a barra e janela incremental contra o perfil novo"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dados_sinteticos import GeradorOHLCV
+from perfil_volume import PerfilVolume, histograma_volume
+
+
+def _referencia(high, low, volume, largura, origem):
+    """Volume por faixa distribuindo cada barra pela fração da amplitude que cai em cada faixa"""
+    faixas = {}
+    for h, l, v in zip(high, low, volume):
+        if not (np.isfinite(h) and np.isfinite(l) and np.isfinite(v)) or v <= 0:
+            continue
+        a, b = (min(h, l) - origem) / largura, (max(h, l) - origem) / largura
+        ka, kb = int(np.floor(a)), max(int(np.ceil(b)) - 1, int(np.floor(a)))
+        for k in range(ka, kb + 1):
+            fracao = 1.0 if ka == kb else (min(b, k + 1) - max(a, k)) / (b - a)
+            faixas[k] = faixas.get(k, 0.0) + v * fracao
+    return faixas
+
+
+@pytest.fixture(scope='module')
+def historico():
+    df = GeradorOHLCV(anos=2, semente=9).gerar(['AAA'])['AAA'].rename(columns=str.lower)
+    df.iloc[10, df.columns.get_loc('high')] = df['low'].iloc[10]  # barra sem amplitude
+    df.iloc[20, df.columns.get_loc('volume')] = 0                 # barra sem volume
+    df.iloc[30, df.columns.get_loc('low')] = np.nan               # preço ausente
+    return df
+
+
+@pytest.mark.parametrize('largura,origem', [(0.5, 0.0), (1.0, 0.25), (3.0, 1.0)])
+def test_histograma_igual_a_distribuicao_por_barra(historico, largura, origem):
+    high, low, volume = historico['high'].to_numpy(), historico['low'].to_numpy(), historico['volume'].to_numpy()
+    # Máxima exatamente na borda de uma faixa: não abre uma faixa a mais
+    high = high.copy()
+    high[40] = origem + largura * np.ceil((high[40] - origem) / largura)
+
+    k_inicial, volumes = histograma_volume(high, low, volume, largura, origem)
+    referencia = _referencia(high, low, volume, largura, origem)
+    esperado = np.zeros(len(volumes))
+    for k, v in referencia.items():
+        esperado[k - k_inicial] += v
+    np.testing.assert_allclose(volumes, esperado, rtol=1e-9, atol=1e-6)
+    assert volumes.sum() == pytest.approx(np.nansum(np.where(np.isnan(low), 0, volume)), rel=1e-12)
+
+
+@pytest.mark.parametrize('janela,passo', [(60, 1), (120, 7)])
+def test_janela_incremental_igual_ao_perfil_novo(historico, janela, passo):
+    largura = 0.5
+    incremental = PerfilVolume(largura, janela=janela)
+    for inicio in range(0, len(historico), passo):
+        parte = historico.iloc[inicio:inicio + passo]
+        incremental.adicionar(parte['high'], parte['low'], parte['volume'])
+
+        fim = inicio + len(parte)
+        novo = PerfilVolume.de_historico(historico.iloc[max(fim - janela, 0):fim], largura=largura)
+        pd.testing.assert_series_equal(incremental.serie(), novo.serie(), rtol=1e-9, atol=1e-6)
+    assert incremental.niveis() == pytest.approx(novo.niveis())
@@ -0,0 +1,47 @@
+"""Features do cache incremental contra o recálculo completo e reajuste incremental do modelo"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('sklearn')
+
+from dados_sinteticos import GeradorOHLCV
+from previsao_ml import TOLERANCIA_INCREMENTAL, CacheFeatures, PrevisorDirecao
+
+
+@pytest.fixture(scope='module')
+def historico():
+    df = GeradorOHLCV(anos=4, semente=5).gerar(['AAA'])['AAA']
+    return df.rename(columns=str.lower)
+
+
+@pytest.mark.parametrize('novas', [1, 5, 60])
+def test_incremental_igual_ao_completo(historico, novas, tmp_path):
+    previsor = PrevisorDirecao()
+    cache = CacheFeatures(str(tmp_path))
+    cache.obter('AAA', historico.iloc[:-novas], previsor.calcular_features)
+    incremental = cache.obter('AAA', historico, previsor.calcular_features)
+    completo = previsor.calcular_features(historico)
+
+    assert incremental.index.equals(completo.index)
+    pd.testing.assert_frame_equal(incremental.isna(), completo.isna())
+    diferenca = (incremental - completo).abs().to_numpy()
+    assert np.nanmax(diferenca) < TOLERANCIA_INCREMENTAL
+
+    # O cache persistido devolve as mesmas features sem recalcular
+    relido = CacheFeatures(str(tmp_path)).obter('AAA', historico, lambda df: pytest.fail('recalculou'))
+    pd.testing.assert_frame_equal(relido, incremental)
+
+
+def test_atualizar_mantem_a_escala_do_ajuste(historico):
+    previsor = PrevisorDirecao()
+    assert previsor.ajustar('AAA', historico.iloc[:-30])
+    escalador = previsor.modelos['AAA']['escalador']
+    media, escala = escalador.mean_.copy(), escalador.scale_.copy()
+
+    assert previsor.atualizar('AAA', historico)
+    # Só os pesos avançam: a escala dos pesos já aprendidos continua valendo
+    assert previsor.modelos['AAA']['escalador'] is escalador
+    np.testing.assert_array_equal(escalador.mean_, media)
+    np.testing.assert_array_equal(escalador.scale_, escala)
@@ -0,0 +1,91 @@
+"""Simulação vetorizada da carteira contra um laço data a data de referência"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import simulacao_carteira
+from simulacao_carteira import SimuladorCarteira
+
+
+def _mercado(n=300, semente=7):
+    rng = np.random.default_rng(semente)
+    indice = pd.bdate_range('2022-01-03', periods=n)
+    simbolos = ['PETR4.SA', 'VALE3.SA', 'ITUB4.SA', 'AAPL', 'MSFT']
+    precos = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.015, (n, len(simbolos))), axis=0)),
+                          index=indice, columns=simbolos)
+    precos.iloc[:40, 2] = np.nan  # ativo que começa a negociar depois
+    scores = pd.DataFrame(rng.uniform(-1, 1, precos.shape), index=indice, columns=simbolos)
+    cambio = pd.Series(5 * np.exp(np.cumsum(rng.normal(0, 0.01, n))), index=indice, name='BRL/USD')
+    return precos, scores, cambio
+
+
+def _simular_em_laco(simulador, precos, scores, cambio):
+    """Referência: carteira atualizada barra a barra"""
+    scores = scores.reindex(index=precos.index, columns=precos.columns)
+    retornos, fx, moedas = simulador.retornos_moeda_base(precos, cambio)
+    elegiveis = precos.notna() & scores.notna()
+    alvo = simulador.pesos_alvo(scores, retornos, elegiveis).to_numpy()
+    rebalancear = simulador.datas_rebalanceamento(precos.index).to_numpy()
+    R = retornos.fillna(0.0).to_numpy()
+    estrangeiros = np.array([moedas[s] != simulador.moeda_base for s in precos.columns])
+
+    retorno_caixa = (1 + simulador.taxa_caixa) ** (1 / simulacao_carteira.PERIODOS_ANO) - 1
+    fx_caixa = {('USD', 'BRL'): 1 + fx.to_numpy(), ('BRL', 'USD'): 1 / (1 + fx.to_numpy())}
+    fator_caixa = (1 + retorno_caixa) * fx_caixa.get((simulador.moeda_caixa, simulador.moeda_base), np.ones(len(R)))
+
+    valor, pesos, caixa = simulador.capital_inicial, np.zeros(R.shape[1]), 1.0
+    patrimonio, pesos_efetivos = [], []
+    for t in range(len(R)):
+        ativos = pesos * (1 + R[t])
+        caixa_t = caixa * fator_caixa[t]
+        total = ativos.sum() + caixa_t
+        valor *= total
+        pesos, caixa = ativos / total, caixa_t / total
+        if rebalancear[t]:
+            variacao = np.abs(alvo[t] - pesos)
+            valor *= 1 - (simulador.custo_transacao * variacao.sum() +
+                          simulador.custo_cambio * variacao[estrangeiros].sum())
+            pesos = alvo[t].copy()
+            caixa = 1 - pesos.sum()
+        patrimonio.append(valor)
+        pesos_efetivos.append(pesos)
+    return np.array(patrimonio), np.array(pesos_efetivos)
+
+
+@pytest.mark.parametrize('regra', SimuladorCarteira.REGRAS)
+@pytest.mark.parametrize('frequencia', ['D', 'W', 'M', np.int64(10)])
+@pytest.mark.parametrize('moeda_base,moeda_caixa', [('BRL', 'BRL'), ('BRL', 'USD'), ('USD', 'BRL')])
+def test_vetorizado_igual_ao_laco(regra, frequencia, moeda_base, moeda_caixa):
+    precos, scores, cambio = _mercado()
+    simulador = SimuladorCarteira(regra=regra, k=3, frequencia=frequencia, custo_transacao=0.002,
+                                  custo_cambio=0.001, moeda_base=moeda_base, moeda_caixa=moeda_caixa,
+                                  taxa_caixa=0.1, janela_vol=20, peso_maximo=0.5)
+    resultado = simulador.simular(precos, scores, cambio)
+    patrimonio, pesos = _simular_em_laco(simulador, precos, scores, cambio)
+
+    np.testing.assert_allclose(resultado['patrimonio'].to_numpy(), patrimonio, rtol=1e-10)
+    np.testing.assert_allclose(resultado['pesos'].to_numpy(), pesos, atol=1e-12)
+
+
+def test_frequencia_inteira_numpy():
+    indice = pd.bdate_range('2024-01-01', periods=25)
+    mascara = SimuladorCarteira(frequencia=np.int64(5)).datas_rebalanceamento(indice)
+    assert mascara.sum() == 5 and mascara.iloc[0]
+
+
+def test_cambio_carregado_quando_ha_ativos_estrangeiros(monkeypatch):
+    precos, scores, cambio = _mercado()
+    chamadas = []
+    monkeypatch.setattr(simulacao_carteira, 'carregar_cambio', lambda periodo='5y': chamadas.append(periodo) or cambio)
+
+    simulador = SimuladorCarteira(k=3)
+    automatico = simulador.simular(precos, scores)
+    explicito = simulador.simular(precos, scores, cambio)
+    assert len(chamadas) == 1
+    pd.testing.assert_series_equal(automatico['patrimonio'], explicito['patrimonio'])
+
+    # Só ativos e caixa na moeda base: nenhuma cotação é buscada
+    locais = [s for s in precos.columns if s.endswith('.SA')]
+    simulador.simular(precos[locais], scores[locais])
+    assert len(chamadas) == 1
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Universo de Ativos
+Carrega os históricos do catálogo de `lista_ativos` em paralelo e os alinha
+em uma matriz de fechamentos (datas x símbolos) para análises que operam
+sobre o universo inteiro de uma vez. A matriz pode ser alinhada à união ou
+à interseção dos calendários (B3 e NYSE) e convertida para uma moeda base
+com a cotação BRL/USD, buscada uma vez por dia.
+"""
+
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from cliente_dados import ClienteDados, ErroDados
+from lista_ativos import obter_todos_ativos
+from cache_compartilhado import obter_cache_padrao
+
+# Pregões consecutivos sem negociação preenchidos com o último fechamento
+MAX_PREENCHIMENTO = 5
+
+# Cotação do dólar em reais (BRL por USD) no Yahoo Finance
+SIMBOLO_CAMBIO = 'BRL=X'
+
+# Calendários aceitos por matriz_fechamentos (além de um DatetimeIndex explícito)
+CALENDARIOS = ('uniao', 'intersecao')
+
+
+def moeda_do_simbolo(symbol):
+    """Moeda de negociação: BRL para ativos da B3 (sufixo .SA), USD para os demais"""
+    return 'BRL' if symbol.upper().endswith('.SA') else 'USD'
+
+
+def simbolos_por_categoria(categorias=None):
+    """{categoria: [símbolos]} do catálogo, opcionalmente restrito a `categorias`"""
+    todos = obter_todos_ativos()
+    if categorias is not None:
+        todos = {categoria: todos[categoria] for categoria in categorias}
+    return {categoria: list(ativos) for categoria, ativos in todos.items()}
+
+
+def carregar_historicos(simbolos, periodo='2y', cliente=None, max_workers=8):
+    """
+    Busca os históricos em paralelo (o cliente aplica limite de taxa e retentativas)
+    Retorna ({symbol: df}, {symbol: ErroDados}) com os símbolos que falharam à parte
+    """
+    cliente = cliente or ClienteDados()
+    historicos, falhas = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {executor.submit(cliente.buscar_historico, s, periodo): s for s in dict.fromkeys(simbolos)}
+        for futuro in as_completed(futuros):
+            symbol = futuros[futuro]
+            try:
+                historicos[symbol] = futuro.result()
+            except ErroDados as e:
+                falhas[symbol] = e
+    return historicos, falhas
+
+
+def normalizar_indice(indice):
+    """Datas de pregão sem fuso e sem horário, para alinhar bolsas de fusos diferentes"""
+    if indice.tz is not None:
+        indice = indice.tz_localize(None)
+    return indice.normalize()
+
+
+def alinhar_serie(serie, indice, max_preenchimento=None):
+    """Valor vigente da série em cada data de `indice` (último valor conhecido até a data)"""
+    serie = pd.Series(serie.to_numpy(), index=normalizar_indice(serie.index), name=serie.name)
+    serie = serie[~serie.index.duplicated(keep='last')].sort_index()
+    return serie.reindex(indice, method='ffill', limit=max_preenchimento)
+
+
+def matriz_fechamentos(historicos, coluna='close', max_preenchimento=MAX_PREENCHIMENTO, calendario='uniao'):
+    """
+    Alinha as séries em um calendário comum (datas de pregão, sem fuso)
+    `historicos`: {symbol: DataFrame OHLCV ou Series de preços}
+    `calendario`: 'uniao' (feriados de uma bolsa são preenchidos com o último
+    fechamento por até `max_preenchimento` pregões), 'intersecao' (apenas datas
+    em que todos negociaram, sem preenchimento) ou um DatetimeIndex explícito
+    (ex.: o calendário da B3). Antes da primeira cotação o valor fica NaN.
+    """
+    if isinstance(calendario, str) and calendario not in CALENDARIOS:
+        raise ValueError(f"Calendário inválido: {calendario}. Use um de {CALENDARIOS} ou um DatetimeIndex")
+
+    series = {}
+    for symbol, df in historicos.items():
+        if df is None or df.empty:
+            continue
+        serie = df[coluna] if isinstance(df, pd.DataFrame) else df
+        serie = pd.Series(serie.to_numpy(), index=normalizar_indice(serie.index), name=symbol)
+        series[symbol] = serie[~serie.index.duplicated(keep='last')]
+
+    if not series:
+        return pd.DataFrame()
+    if isinstance(calendario, str) and calendario == 'intersecao':
+        return pd.concat(series, axis=1, join='inner').sort_index()
+    matriz = pd.concat(series, axis=1).sort_index().ffill(limit=max_preenchimento)
+    if not isinstance(calendario, str):
+        matriz = matriz.reindex(normalizar_indice(calendario), method='ffill', limit=max_preenchimento)
+    return matriz
+
+
+def carregar_matriz_fechamentos(simbolos, periodo='2y', cliente=None, max_workers=8,
+                                max_preenchimento=MAX_PREENCHIMENTO, calendario='uniao'):
+    """Atalho: busca os históricos e retorna (matriz de fechamentos, falhas)"""
+    historicos, falhas = carregar_historicos(simbolos, periodo, cliente, max_workers)
+    return matriz_fechamentos(historicos, max_preenchimento=max_preenchimento, calendario=calendario), falhas
+
+
+# --- CÂMBIO E MOEDA BASE ---
+
+def carregar_cambio(periodo='5y', cliente=None):
+    """
+    Fechamentos de BRL por USD (datas sem fuso), buscados no máximo uma vez por dia
+    no cache compartilhado do processo
+    """
+    cliente = cliente or ClienteDados()
+    chave = ('cambio', cliente.provedor.nome, SIMBOLO_CAMBIO, periodo, date.today().isoformat())
+
+    def buscar():
+        fechamentos = cliente.buscar_historico(SIMBOLO_CAMBIO, periodo)['close']
+        cambio = pd.Series(fechamentos.to_numpy(), index=normalizar_indice(fechamentos.index), name='BRL/USD')
+        return cambio[~cambio.index.duplicated(keep='last')]
+
+    return obter_cache_padrao().obter(chave, buscar, ttl=24 * 3600)
+
+
+def fator_conversao(moeda, moeda_base, cambio):
+    """Multiplicador de preços em `moeda` para `moeda_base` (`cambio`: BRL por USD, escalar ou Series)"""
+    if moeda == moeda_base:
+        return 1.0
+    if (moeda, moeda_base) == ('USD', 'BRL'):
+        return cambio
+    if (moeda, moeda_base) == ('BRL', 'USD'):
+        return 1 / cambio
+    raise ValueError(f"Conversão não suportada: {moeda} -> {moeda_base}")
+
+
+def converter_moeda_base(matriz, moeda_base='BRL', cambio=None, moedas=None):
+    """
+    Converte a matriz de preços (datas x símbolos) para `moeda_base`
+    O câmbio é alinhado uma única vez ao índice da matriz e aplicado a
+    todas as colunas de cada moeda de uma vez
+    """
+    moedas = moedas or {}
+    moedas = pd.Series({s: moedas.get(s, moeda_do_simbolo(s)) for s in matriz.columns})
+    estrangeiras = moedas[moedas != moeda_base]
+    if estrangeiras.empty:
+        return matriz
+    if cambio is None:
+        cambio = carregar_cambio()
+    cambio_alinhado = alinhar_serie(cambio, matriz.index).to_numpy()
+
+    convertida = matriz.copy()
+    for moeda, colunas in estrangeiras.groupby(estrangeiras).groups.items():
+        fator = fator_conversao(moeda, moeda_base, cambio_alinhado)
+        convertida[list(colunas)] = matriz[list(colunas)].to_numpy() * fator[:, None]
+    return convertida
+
+
+def matriz_normalizada(historicos, moeda_base='BRL', calendario='uniao', cambio=None, coluna='close',
+                       max_preenchimento=MAX_PREENCHIMENTO):
+    """Matriz de preços de mercados diferentes em um calendário e uma moeda comuns"""
+    matriz = matriz_fechamentos(historicos, coluna, max_preenchimento, calendario)
+    return converter_moeda_base(matriz, moeda_base, cambio)